@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do ShadowReq sem rede.
+
+Sobe um servidor de destino local (latência, tamanho da resposta e taxa de
+falhas configuráveis) e servidores intermediários locais (RelayStub ou o
+servidor do 'shadowreq serve', ambos com o protocolo do api.php) em um processo separado, e mede o ShadowReq em outro
+processo por cenário, para que CPU e pico de memória sejam só do cliente.
+
+Uso:
+    python benchmarks/bench.py run --output resultado.json
+    python benchmarks/bench.py compare base.json resultado.json --threshold 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shadowreq import ShadowReq  # noqa: E402
+from shadowreq.testing import RelayStub  # noqa: E402
+
+# Métricas comparadas e se o valor maior é melhor
+COMPARED_METRICS = {
+    'throughput': True,
+    'p50': False,
+    'p95': False,
+    'p99': False,
+    'cpu_per_request_ms': False,
+    'peak_rss_mb': False,
+}
+
+
+class MockOrigin:
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 1):
+        """
+        Servidor de destino local.
+
+        Responde a GET e POST com um JSON de 'size' bytes (query param, default 1024),
+        depois de 'latency' segundos. Uma fração fail_rate das respostas tem status 500.
+
+        Args:
+            latency (float): Latência de cada resposta em segundos
+            fail_rate (float): Fração das respostas com status 500 (0 a 1)
+            seed (int): Semente do sorteio das falhas, para resultados reproduzíveis
+        """
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockOrigin':
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def _fails(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.fail_rate
+
+    def _make_handler_class(self):
+        origin = self
+
+        class OriginHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers e corpo saem em escritas separadas; sem isso o Nagle segura o corpo
+            # até o ACK atrasado do cliente (~40 ms em clientes que não usam TCP_NODELAY)
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                query = parse_qs(urlparse(self.path).query)
+                size = int(query.get('size', ['1024'])[0])
+                if origin.latency:
+                    time.sleep(origin.latency)
+
+                status = 500 if origin._fails() else 200
+                body = json.dumps({'data': 'x' * max(0, size - 12)}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('content-length', 0)))
+                self._respond()
+
+            def log_message(self, format, *args):
+                pass
+
+        return OriginHandler
+
+
+def _serve(options: dict, ready):
+    """Processo dos servidores locais: destino e intermediários."""
+    origin = MockOrigin(options['latency'], options['fail_rate'], options['seed']).start()
+    if options['relay'] == 'serve':
+        # Servidor do 'shadowreq serve' (aiohttp) no lugar do RelayStub
+        from shadowreq.relay import RelayServer
+        relays = [RelayServer(port=0).start() for _ in range(options['relays'])]
+    else:
+        relays = [RelayStub().start() for _ in range(options['relays'])]
+
+    config = {f"relay{i + 1}": {'urls': [relay.url], 'headers': {}} for i, relay in enumerate(relays)}
+    for i in range(options['dead_relays']):
+        # Porta sem servidor: conexão recusada
+        config[f"dead{i + 1}"] = {'urls': ['http://127.0.0.1:9'], 'headers': {}}
+    with open(options['config'], 'w') as f:
+        json.dump(config, f, indent=4)
+
+    ready.put(origin.url)
+    threading.Event().wait()
+
+
+def _percentile(samples, percentile):
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def _run_scenario(scenario: dict, result_queue):
+    """Processo de um cenário: mede só o cliente."""
+    shadow = ShadowReq(scenario['config'], passthrough=scenario['passthrough'], timeout=(2, 30))
+    url = f"{scenario['origin']}/bench?size={scenario['payload']}"
+    data = {'payload': 'y' * scenario['payload']} if scenario['method'] == 'POST' else None
+
+    def one():
+        started = time.perf_counter()
+        try:
+            if scenario['method'] == 'POST':
+                response = shadow.post(url, data=data)
+            else:
+                response = shadow.get(url)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    # Aquecimento: abre as conexões e preenche as estatísticas da estratégia
+    with ThreadPoolExecutor(max_workers=scenario['concurrency']) as executor:
+        list(executor.map(lambda _: one(), range(min(scenario['requests'], scenario['concurrency'] * 2))))
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario['concurrency']) as executor:
+        results = list(executor.map(lambda _: one(), range(scenario['requests'])))
+    wall = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    shadow.close()
+
+    cpu = ((usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime))
+    latencies = sorted(latency for latency, _ in results)
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    rss_divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+
+    result_queue.put({
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'wall_s': wall,
+        'throughput': len(results) / wall if wall else None,
+        'mean': sum(latencies) / len(latencies),
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+        'cpu_s': cpu,
+        'cpu_per_request_ms': cpu / len(results) * 1000,
+        'peak_rss_mb': usage_after.ru_maxrss / rss_divisor,
+    })
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    """Executa todos os cenários e grava os resultados em JSON."""
+    context = multiprocessing.get_context('spawn')
+    config = os.path.join(tempfile.mkdtemp(prefix='shadowreq-bench-'), 'servers.json')
+    options = {
+        'latency': args.latency, 'fail_rate': args.fail_rate, 'seed': args.seed,
+        'relays': args.relays, 'dead_relays': args.dead_relays, 'config': config,
+        'relay': args.relay,
+    }
+
+    ready = context.Queue()
+    servers = context.Process(target=_serve, args=(options, ready), daemon=True)
+    servers.start()
+    origin = ready.get(timeout=30)
+
+    results = []
+    try:
+        for method in args.methods.split(','):
+            for payload in [int(size) for size in args.sizes.split(',')]:
+                for concurrency in [int(level) for level in args.concurrency.split(',')]:
+                    scenario = {
+                        'name': f"{method.lower()}-{payload}b-c{concurrency}",
+                        'method': method.upper(), 'payload': payload, 'concurrency': concurrency,
+                        'requests': args.requests, 'passthrough': args.passthrough,
+                        'config': config, 'origin': origin,
+                    }
+                    result_queue = context.Queue()
+                    process = context.Process(target=_run_scenario, args=(scenario, result_queue))
+                    process.start()
+                    measured = result_queue.get(timeout=args.scenario_timeout)
+                    process.join()
+
+                    entry = {k: v for k, v in scenario.items() if k not in ('config', 'origin')}
+                    entry.update(measured)
+                    results.append(entry)
+                    print(f"{entry['name']:<24} {entry['throughput']:8.1f} req/s  "
+                          f"p50 {entry['p50'] * 1000:7.1f} ms  p95 {entry['p95'] * 1000:7.1f} ms  "
+                          f"p99 {entry['p99'] * 1000:7.1f} ms  cpu {entry['cpu_per_request_ms']:6.2f} ms/req  "
+                          f"rss {entry['peak_rss_mb']:6.1f} MB  erros {entry['errors']}")
+    finally:
+        servers.terminate()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'options': {k: v for k, v in options.items() if k != 'config'},
+            'passthrough': args.passthrough,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {args.output}")
+
+
+def compare(args) -> int:
+    """Compara dois resultados; retorna 1 se houver regressão acima do limite."""
+    with open(args.base) as f:
+        base = {entry['name']: entry for entry in json.load(f)['results']}
+    with open(args.new) as f:
+        new = {entry['name']: entry for entry in json.load(f)['results']}
+
+    regressions = 0
+    for name in sorted(set(base) & set(new)):
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = base[name].get(metric), new[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > args.threshold:
+                flag = '  <-- REGRESSÃO'
+                regressions += 1
+            print(f"{name:<24} {metric:<20} {before:12.4f} -> {after:12.4f}  {change:+7.1f}%{flag}")
+
+    for name in sorted(set(base) ^ set(new)):
+        print(f"{name:<24} presente em apenas um dos arquivos")
+
+    if regressions:
+        print(f"{regressions} regressões acima de {args.threshold}%")
+        return 1
+    print(f"Nenhuma regressão acima de {args.threshold}%")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do ShadowReq sem rede')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='Executa os cenários')
+    run_parser.add_argument('--output', default='benchmark.json', help='Arquivo JSON de resultados')
+    run_parser.add_argument('--requests', type=int, default=500, help='Requisições medidas por cenário')
+    run_parser.add_argument('--concurrency', default='1,8,32', help='Níveis de concorrência')
+    run_parser.add_argument('--sizes', default='1024,65536', help='Tamanhos da resposta do destino em bytes')
+    run_parser.add_argument('--methods', default='GET,POST', help='Métodos HTTP')
+    run_parser.add_argument('--latency', type=float, default=0.005, help='Latência do destino em segundos')
+    run_parser.add_argument('--fail-rate', type=float, default=0.0, help='Fração de respostas 500 do destino')
+    run_parser.add_argument('--relays', type=int, default=2, help='Servidores intermediários locais')
+    run_parser.add_argument('--relay', choices=['stub', 'serve'], default='stub',
+                            help="Servidor intermediário local: RelayStub ou o servidor do 'shadowreq serve'")
+    run_parser.add_argument('--dead-relays', type=int, default=0, help='Servidores que recusam conexões')
+    run_parser.add_argument('--passthrough', action='store_true', help='Usa o modo raw do api.php')
+    run_parser.add_argument('--seed', type=int, default=1, help='Semente da injeção de falhas')
+    run_parser.add_argument('--scenario-timeout', type=float, default=600.0, help='Tempo máximo por cenário')
+
+    compare_parser = subparsers.add_parser('compare', help='Compara dois resultados')
+    compare_parser.add_argument('base', help='Resultado de referência')
+    compare_parser.add_argument('new', help='Resultado novo')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='Piora percentual que conta como regressão')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        sys.exit(compare(args))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,94 @@
 <?php
 header('Content-Type: application/json');
 
-// Função para realizar a requisição HTTP
-function makeRequest($url, $method, $params = []) {
+// Comprime a resposta quando o cliente aceita gzip
+if (!ini_get('zlib.output_compression')) {
+    ob_start('ob_gzhandler');
+}
+
+// Número máximo de requisições aceitas em um único lote
+define('MAX_BATCH_SIZE', 50);
+
+// Content-Type das requisições com corpo: uma linha com o envelope em JSON seguida do corpo
+define('STREAM_CONTENT_TYPE', 'application/x-shadowreq-stream');
+
+// Tamanho máximo da linha do envelope nas requisições com corpo
+define('MAX_ENVELOPE_SIZE', 1048576);
+
+// Headers do destino que não são repassados no modo raw
+$SKIPPED_HEADERS = ['connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length',
+                    'proxy-authenticate', 'proxy-authorization', 'te', 'trailer', 'upgrade'];
+
+// Lê o corpo da requisição, descomprimindo se vier com gzip
+function readInput() {
+    $input = file_get_contents('php://input');
+    if (isset($_SERVER['HTTP_CONTENT_ENCODING']) && strtolower($_SERVER['HTTP_CONTENT_ENCODING']) === 'gzip') {
+        $input = gzdecode($input);
+    }
+    return $input;
+}
+
+// Verifica se a requisição traz um corpo a repassar depois do envelope
+function isStreamRequest() {
+    $contentType = isset($_SERVER['CONTENT_TYPE']) ? $_SERVER['CONTENT_TYPE'] : '';
+    return strtolower(trim(explode(';', $contentType)[0])) === STREAM_CONTENT_TYPE;
+}
+
+// Lê o envelope (primeira linha) de uma requisição com corpo. O resto de php://input
+// é o corpo, lido em partes pelo curl durante o envio ao destino
+function readStreamEnvelope() {
+    $input = fopen('php://input', 'rb');
+    $line = fgets($input, MAX_ENVELOPE_SIZE);
+    $data = $line === false ? null : json_decode($line, true);
+    if (is_array($data)) {
+        if (!isset($data['body']) || !is_array($data['body'])) {
+            $data['body'] = [];
+        }
+        $data['body']['stream'] = $input;
+    }
+    return $data;
+}
+
+// Cria o handle curl que envia o corpo da requisição em partes, com o Content-Type original.
+// Os params vão na query string
+function createBodyHandle($url, $method, $params, $body) {
+    if (!in_array($method, ['GET', 'POST', 'PUT', 'DELETE'])) {
+        return null;
+    }
+    if (!empty($params)) {
+        $url .= (strpos($url, '?') === false ? '?' : '&') . http_build_query($params);
+    }
+
+    $ch = curl_init();
+    curl_setopt($ch, CURLOPT_URL, $url);
+    curl_setopt($ch, CURLOPT_UPLOAD, true);
+    curl_setopt($ch, CURLOPT_CUSTOMREQUEST, $method);
+
+    $stream = $body['stream'];
+    curl_setopt($ch, CURLOPT_READFUNCTION, function ($ch, $fd, $length) use ($stream) {
+        $chunk = fread($stream, $length);
+        return $chunk === false ? '' : $chunk;
+    });
+    // Sem tamanho conhecido o curl envia com Transfer-Encoding: chunked
+    if (isset($body['length'])) {
+        curl_setopt($ch, CURLOPT_INFILESIZE, (int) $body['length']);
+    }
+
+    $headers = ['Expect:'];
+    if (!empty($body['content_type'])) {
+        $headers[] = 'Content-Type: ' . str_replace(["\r", "\n"], '', $body['content_type']);
+    }
+    curl_setopt($ch, CURLOPT_HTTPHEADER, $headers);
+    curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    return $ch;
+}
+
+// Cria o handle curl para a requisição HTTP
+function createHandle($url, $method, $params = [], $body = null) {
+    if ($body !== null) {
+        return createBodyHandle($url, $method, $params, $body);
+    }
+
     $ch = curl_init();
 
     switch ($method) {
@@ -30,22 +116,216 @@ function makeRequest($url, $method, $params = []) {
             }
             break;
         default:
-            return ['error' => 'Invalid HTTP method'];
+            curl_close($ch);
+            return null;
     }
 
     curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    return $ch;
+}
+
+// Tempos da requisição ao destino medidos pelo curl, em segundos
+function curlTiming($ch) {
+    return [
+        'namelookup' => curl_getinfo($ch, CURLINFO_NAMELOOKUP_TIME),
+        'connect' => curl_getinfo($ch, CURLINFO_CONNECT_TIME),
+        'starttransfer' => curl_getinfo($ch, CURLINFO_STARTTRANSFER_TIME),
+        'total' => curl_getinfo($ch, CURLINFO_TOTAL_TIME)
+    ];
+}
+
+// Função para realizar a requisição HTTP
+function makeRequest($url, $method, $params = [], $body = null) {
+    $ch = createHandle($url, $method, $params, $body);
+    if ($ch === null) {
+        return ['error' => 'Invalid HTTP method'];
+    }
+
+    $response = curl_exec($ch);
+    $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    $timing = curlTiming($ch);
+    curl_close($ch);
+
+    return ['status' => $httpCode, 'response' => json_decode($response, true), 'timing' => $timing];
+}
+
+// Coleta os headers do destino em $headers, sem os headers de conexão
+function collectHeaders($ch, &$headers) {
+    global $SKIPPED_HEADERS;
+
+    curl_setopt($ch, CURLOPT_HEADERFUNCTION, function ($ch, $line) use (&$headers, $SKIPPED_HEADERS) {
+        $length = strlen($line);
+        $line = trim($line);
+
+        // Nova linha de status (redirecionamento ou 100-continue): descarta os headers anteriores
+        if (stripos($line, 'HTTP/') === 0) {
+            $headers = [];
+            return $length;
+        }
+
+        $parts = explode(':', $line, 2);
+        if (count($parts) == 2) {
+            $name = strtolower(trim($parts[0]));
+            $value = trim($parts[1]);
+            if (!in_array($name, $SKIPPED_HEADERS)) {
+                $headers[$name] = isset($headers[$name]) ? $headers[$name] . ', ' . $value : $value;
+            }
+        }
+        return $length;
+    });
+}
+
+// Envia status, headers e tempos do destino nos headers X-Shadow-*
+function sendShadowHeaders($httpCode, $headers, $timing) {
+    header('Content-Type: application/octet-stream');
+    header('X-Shadow-Status: ' . $httpCode);
+    header('X-Shadow-Headers: ' . json_encode((object) $headers));
+    header('X-Shadow-Timing: ' . json_encode($timing));
+}
+
+// Função para realizar a requisição HTTP repassando status, headers e corpo sem conversão.
+// O corpo da resposta é o corpo do destino; status e headers vão nos headers X-Shadow-*
+function makeRawRequest($url, $method, $params = [], $body = null) {
+    $ch = createHandle($url, $method, $params, $body);
+    if ($ch === null) {
+        echo json_encode(['error' => 'Invalid HTTP method']);
+        return;
+    }
+
+    $headers = [];
+    curl_setopt($ch, CURLOPT_ENCODING, '');
+    collectHeaders($ch, $headers);
+
     $response = curl_exec($ch);
+    if ($response === false) {
+        echo json_encode(['status' => 0, 'error' => curl_error($ch)]);
+        curl_close($ch);
+        return;
+    }
+
     $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    $timing = curlTiming($ch);
+    curl_close($ch);
+
+    sendShadowHeaders($httpCode, $headers, $timing);
+    echo $response;
+}
+
+// Função para realizar a requisição HTTP repassando o corpo do destino em partes,
+// à medida que chega, sem guardar a resposta inteira na memória
+function makeStreamRequest($url, $method, $params = [], $body = null) {
+    $ch = createHandle($url, $method, $params, $body);
+    if ($ch === null) {
+        echo json_encode(['error' => 'Invalid HTTP method']);
+        return;
+    }
+
+    // Desativa os buffers de saída (incluindo o gzip) para enviar cada parte imediatamente
+    while (ob_get_level() > 0) {
+        ob_end_clean();
+    }
+    header('X-Accel-Buffering: no');
+
+    $headers = [];
+    $started = false;
+    curl_setopt($ch, CURLOPT_ENCODING, '');
+    curl_setopt($ch, CURLOPT_RETURNTRANSFER, false);
+    collectHeaders($ch, $headers);
+    curl_setopt($ch, CURLOPT_WRITEFUNCTION, function ($ch, $chunk) use (&$headers, &$started) {
+        if (!$started) {
+            // O corpo ainda não terminou: 'total' é o tempo até a primeira parte
+            sendShadowHeaders(curl_getinfo($ch, CURLINFO_HTTP_CODE), $headers, curlTiming($ch));
+            $started = true;
+        }
+        echo $chunk;
+        flush();
+        return strlen($chunk);
+    });
+
+    $ok = curl_exec($ch);
+    if (!$started) {
+        if ($ok === false) {
+            echo json_encode(['status' => 0, 'error' => curl_error($ch)]);
+        } else {
+            // Resposta sem corpo
+            sendShadowHeaders(curl_getinfo($ch, CURLINFO_HTTP_CODE), $headers, curlTiming($ch));
+        }
+    }
     curl_close($ch);
+}
+
+// Função para realizar várias requisições HTTP em paralelo com curl_multi
+function makeBatchRequest($items) {
+    $results = [];
+    $handles = [];
+    $mh = curl_multi_init();
 
-    return ['status' => $httpCode, 'response' => json_decode($response, true)];
+    foreach ($items as $index => $item) {
+        if (!is_array($item) || !isset($item['url']) || !isset($item['method'])) {
+            $results[$index] = ['error' => 'URL and method are required'];
+            continue;
+        }
+
+        $params = isset($item['params']) ? $item['params'] : [];
+        $ch = createHandle($item['url'], strtoupper($item['method']), $params);
+        if ($ch === null) {
+            $results[$index] = ['error' => 'Invalid HTTP method'];
+            continue;
+        }
+
+        $handles[$index] = $ch;
+        curl_multi_add_handle($mh, $ch);
+    }
+
+    // Executa todas as requisições até que terminem
+    do {
+        $status = curl_multi_exec($mh, $active);
+        if ($active) {
+            curl_multi_select($mh);
+        }
+    } while ($active && $status == CURLM_OK);
+
+    foreach ($handles as $index => $ch) {
+        $error = curl_error($ch);
+        if ($error !== '') {
+            $results[$index] = ['status' => curl_getinfo($ch, CURLINFO_HTTP_CODE), 'error' => $error];
+        } else {
+            $results[$index] = [
+                'status' => curl_getinfo($ch, CURLINFO_HTTP_CODE),
+                'response' => json_decode(curl_multi_getcontent($ch), true),
+                'timing' => curlTiming($ch)
+            ];
+        }
+        curl_multi_remove_handle($mh, $ch);
+        curl_close($ch);
+    }
+    curl_multi_close($mh);
+
+    ksort($results);
+    return ['batch' => array_values($results)];
 }
 
 // Verifica se a requisição é do tipo POST
 if ($_SERVER['REQUEST_METHOD'] === 'POST') {
     // Recupera os dados da requisição
-    $data = json_decode(file_get_contents('php://input'), true);
-    
+    $stream = isStreamRequest();
+    $data = $stream ? readStreamEnvelope() : json_decode(readInput(), true);
+
+    // Modo lote: várias requisições em uma única chamada
+    if (!$stream && isset($data['batch'])) {
+        if (!is_array($data['batch'])) {
+            echo json_encode(['error' => 'Batch must be a list of requests']);
+            exit;
+        }
+        if (count($data['batch']) > MAX_BATCH_SIZE) {
+            echo json_encode(['error' => 'Batch too large (max ' . MAX_BATCH_SIZE . ')']);
+            exit;
+        }
+
+        echo json_encode(makeBatchRequest($data['batch']));
+        exit;
+    }
+
     // Valida os dados
     if (!isset($data['url']) || !isset($data['method'])) {
         echo json_encode(['error' => 'URL and method are required']);
@@ -55,9 +335,22 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
     $url = $data['url'];
     $method = strtoupper($data['method']);
     $params = isset($data['params']) ? $data['params'] : [];
+    $body = $stream ? $data['body'] : null;
+
+    // Modo raw: repassa o corpo do destino sem decodificar
+    if (isset($data['mode']) && $data['mode'] === 'raw') {
+        makeRawRequest($url, $method, $params, $body);
+        exit;
+    }
+
+    // Modo stream: repassa o corpo do destino em partes
+    if (isset($data['mode']) && $data['mode'] === 'stream') {
+        makeStreamRequest($url, $method, $params, $body);
+        exit;
+    }
 
     // Realiza a requisição
-    $result = makeRequest($url, $method, $params);
+    $result = makeRequest($url, $method, $params, $body);
 
     // Retorna o resultado
     echo json_encode($result);
@@ -34,9 +34,12 @@ setup(
     python_requires=">=3.7",
     install_requires=[
         "requests>=2.25.0",
-        "selenium>=4.0.0",
-        "webdriver-manager>=3.8.0",
     ],
+    extras_require={
+        "async": ["aiohttp>=3.8.0"],
+        "server": ["aiohttp>=3.8.0"],
+        "browser": ["selenium>=4.0.0", "webdriver-manager>=3.8.0"],
+    },
     package_data={
         'shadowreq': ['servers.json'],
     },
@@ -3,6 +3,7 @@ ShadowReq - Uma biblioteca Python para fazer requisições HTTP através de serv
 """
 
 from .client import ShadowReq
+from .async_client import AsyncShadowReq
 from .version import __version__
 
-__all__ = ['ShadowReq']
+__all__ = ['ShadowReq', 'AsyncShadowReq']
@@ -0,0 +1,512 @@
+"""
+Cliente assíncrono (asyncio) do ShadowReq.
+
+Requer o pacote opcional aiohttp: pip install shadowreq[async]
+"""
+
+import asyncio
+import json
+import time
+from typing import Optional, Dict, Any, List, NamedTuple, Union, Tuple
+from urllib.parse import urlsplit
+import requests
+from .logger import ShadowLogger
+from .protocol import build_payload, build_response, build_raw_response, is_challenge_page
+from .selection import SelectionStrategy, get_strategy
+from .metrics import Metrics
+from .config import ServerEntry, ServerTable, load_config, start_watcher
+from .connections import MirrorSet
+from .ratelimit import RateLimiter
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - dependência opcional
+    aiohttp = None
+
+
+async def _mark_connected(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx['connected'] = True
+
+
+class _AsyncState(NamedTuple):
+    """Tabela de servidores e recursos de cada servidor; trocada inteira quando a configuração muda."""
+    table: ServerTable
+    sessions: Dict[str, 'aiohttp.ClientSession']
+    semaphores: Dict[str, asyncio.Semaphore]
+    headers: Dict[str, Dict[str, str]]
+    mirrors: Dict[str, MirrorSet]
+
+
+class AsyncShadowReq:
+    def __init__(self, server_config_file: str = 'servers.json',
+                 timeout: Optional[Union[float, tuple]] = None,
+                 enable_logging: Optional[bool] = None,
+                 log_file: Optional[str] = None,
+                 max_concurrency: int = 10,
+                 keep_alive: bool = True,
+                 dns_ttl: Optional[float] = 300.0,
+                 mirror_cooldown: float = 30.0,
+                 strategy: Union[str, SelectionStrategy] = 'p2c',
+                 rate_limit: Optional[RateLimiter] = None,
+                 watch_config: bool = False,
+                 watch_interval: float = 1.0,
+                 snapshot_file: Optional[str] = None,
+                 metrics: Union[bool, Metrics] = True):
+        """
+        Inicializa o AsyncShadowReq com as configurações do servidor.
+
+        Args:
+            server_config_file (str): Caminho para o arquivo de configuração dos servidores
+            timeout (float, tuple, optional): Timeout para as requisições em segundos.
+                                           Pode ser um número (timeout total) ou uma tupla (connect timeout, read timeout)
+            enable_logging (bool, optional): Se True, ativa o logging para um arquivo; se False, desativa.
+                                             Se None, mantém a configuração atual do logger,
+                                             que é compartilhado pelo processo
+            log_file (str, optional): Caminho para o arquivo de log. Se None, mantém o atual
+            max_concurrency (int): Número máximo de requisições simultâneas por servidor.
+                                   Pode ser sobrescrito por servidor com a chave 'max_concurrency'
+                                   ou, se ela não existir, 'pool_size'
+            keep_alive (bool): Se True, reutiliza as conexões com os servidores.
+                               Pode ser sobrescrito por servidor com a chave 'keep_alive'
+            dns_ttl (float, optional): Tempo em segundos que os endereços dos servidores ficam em cache.
+                                       Se None, resolve o nome a cada nova conexão
+            mirror_cooldown (float): Tempo em segundos que uma URL de servidor ('urls') fica fora do
+                                     rodízio depois de recusar uma conexão
+            strategy (str, SelectionStrategy): Estratégia de seleção de servidores: 'p2c' (default),
+                                               'least_latency', 'round_robin', 'random' ou uma instância
+            rate_limit (RateLimiter, optional): Limites de taxa por servidor e por destino, como no
+                                                ShadowReq. Criado automaticamente se algum servidor tiver
+                                                'rate_limit' no servers.json
+            watch_config (bool): Se True, observa o arquivo de configuração (ou o snapshot) e aplica
+                                 as mudanças sem interromper requisições em andamento
+            watch_interval (float): Intervalo entre as verificações do arquivo em segundos
+            snapshot_file (str, optional): Snapshot binário da configuração (veja shadowreq.config) a usar
+                                           no lugar do JSON. Se não existir, é criado a partir do JSON
+            metrics (bool, Metrics): Se True, registra métricas por servidor (veja stats()).
+                                     Aceita uma instância de Metrics compartilhada
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncShadowReq requer o pacote aiohttp: pip install shadowreq[async]")
+
+        # Configurar logging
+        self.logger = ShadowLogger()
+        self.logger.setup(enabled=enable_logging, log_file=log_file)
+
+        self.timeout = timeout or (5, 30)  # Default: 5s para conexão, 30s para leitura
+        self.strategy = get_strategy(strategy)
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.dns_ttl = dns_ttl
+        self.mirror_cooldown = mirror_cooldown
+        self.rate_limit = rate_limit
+        if isinstance(metrics, Metrics):
+            self.metrics = metrics
+        else:
+            self.metrics = Metrics() if metrics else None
+
+        # Carregar configuração, pelo mesmo caminho do ShadowReq (validação, snapshot e recarga)
+        try:
+            self._table = load_config(server_config_file, snapshot_file)
+        except Exception as e:
+            self.logger.error("Erro ao carregar arquivo de configuração: %s", e)
+            raise
+        self._configure_rate_limit(self._table)
+
+        # Sessões e semáforos são criados dentro do event loop, no primeiro uso
+        self._state = None
+        self._loop = None
+        self._retired = []  # Sessões de servidores alterados, fechadas em close()
+
+        self._watcher = None
+        if watch_config:
+            self._watcher = start_watcher(server_config_file, self._on_table_change, snapshot_file, watch_interval)
+
+    @property
+    def servers(self) -> Dict[str, Dict[str, Any]]:
+        """Configuração atual dos servidores (somente leitura)."""
+        return self._table.servers
+
+    @property
+    def server_names(self) -> List[str]:
+        """Nomes dos servidores da configuração atual."""
+        return self._table.names
+
+    @property
+    def sessions(self) -> Dict[str, 'aiohttp.ClientSession']:
+        """Sessão de cada servidor; vazio antes do primeiro uso."""
+        return self._state.sessions if self._state is not None else {}
+
+    @property
+    def mirrors(self) -> Dict[str, MirrorSet]:
+        """Espelhos de cada servidor; vazio antes do primeiro uso."""
+        return self._state.mirrors if self._state is not None else {}
+
+    def _configure_rate_limit(self, table: ServerTable):
+        """Aplica os limites de taxa dos servidores da tabela (veja ShadowReq._apply_table)."""
+        limits = {name: entry.rate_limit for name, entry in table.entries.items()}
+        if self.rate_limit is None and any(limit is not None for limit in limits.values()):
+            self.rate_limit = RateLimiter()
+        if self.rate_limit is not None:
+            self.rate_limit.configure_relays(limits)
+
+    def _limit(self, entry: ServerEntry) -> int:
+        """Requisições simultâneas aceitas pelo servidor."""
+        if 'max_concurrency' in entry.config:
+            return entry.config['max_concurrency']
+        return self.max_concurrency if entry.pool_size is None else entry.pool_size
+
+    def _keep_alive(self, entry: ServerEntry) -> bool:
+        return self.keep_alive if entry.keep_alive is None else entry.keep_alive
+
+    def _create_session(self, server_name: str, entry: ServerEntry) -> 'aiohttp.ClientSession':
+        """
+        Cria a sessão de um servidor.
+
+        Os headers do servidor são enviados em cada requisição (veja _AsyncState.headers),
+        para que uma recarga da configuração não precise recriar a sessão.
+
+        Args:
+            server_name (str): Nome do servidor
+            entry (ServerEntry): Configuração compilada do servidor
+
+        Returns:
+            aiohttp.ClientSession: Sessão com o limite de conexões do servidor
+        """
+        limit = self._limit(entry)
+        keep_alive = self._keep_alive(entry)
+        connector = aiohttp.TCPConnector(limit=limit, ssl=False, force_close=not keep_alive,
+                                         use_dns_cache=bool(self.dns_ttl), ttl_dns_cache=self.dns_ttl)
+        # Marca quando a conexão foi obtida, para distinguir timeouts de conexão dos de leitura
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(_mark_connected)
+        trace.on_connection_reuseconn.append(_mark_connected)
+        self.logger.debug("Servidor %s: até %s requisições simultâneas", server_name, limit)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+
+    def _apply_table(self, table: ServerTable):
+        """
+        Troca a tabela de servidores em uso; roda no event loop.
+
+        Sessões e semáforos de servidores sem mudança de limite ou keep-alive são
+        reaproveitados. Requisições em andamento continuam com o estado que já tinham;
+        as sessões substituídas são fechadas em close().
+
+        Args:
+            table (ServerTable): Nova tabela de servidores
+        """
+        old = self._state
+        sessions, semaphores, headers, mirrors = {}, {}, {}, {}
+        for name, entry in table.entries.items():
+            previous = old.table.entries.get(name) if old else None
+            if previous is not None and ((self._limit(previous), self._keep_alive(previous))
+                                         == (self._limit(entry), self._keep_alive(entry))):
+                sessions[name] = old.sessions[name]
+                semaphores[name] = old.semaphores[name]
+            else:
+                sessions[name] = self._create_session(name, entry)
+                semaphores[name] = asyncio.Semaphore(self._limit(entry))
+
+            headers[name] = dict(entry.headers)
+            if not self._keep_alive(entry):
+                headers[name]['connection'] = 'close'
+
+            mirror_set = old.mirrors.get(name) if old else None
+            if mirror_set is None or mirror_set.urls != entry.api_urls:
+                mirror_set = MirrorSet(entry.api_urls, self.mirror_cooldown)
+            mirrors[name] = mirror_set
+
+        if old is not None:
+            self._retired.extend(session for name, session in old.sessions.items()
+                                 if sessions.get(name) is not session)
+        self._table = table
+        self._configure_rate_limit(table)
+        self._state = _AsyncState(table, sessions, semaphores, headers, mirrors)
+
+    def _on_table_change(self, table: ServerTable):
+        """Recebe a nova tabela do ConfigWatcher (em outra thread) e a aplica no event loop."""
+        loop = self._loop
+        if loop is not None and self._state is not None:
+            try:
+                loop.call_soon_threadsafe(self._apply_table, table)
+                return
+            except RuntimeError:
+                pass  # Event loop encerrado: a tabela é aplicada no próximo _start
+        self._table = table
+        self._configure_rate_limit(table)
+
+    async def _start(self):
+        """Cria as sessões e os limites de concorrência de cada servidor."""
+        if self._state is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._apply_table(self._table)
+
+    async def close(self):
+        """Fecha as sessões de todos os servidores e para a observação da configuração."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        sessions = list(self.sessions.values()) + self._retired
+        self._state = None
+        self._retired = []
+        for session in sessions:
+            await session.close()
+        self.logger.debug("Sessões assíncronas fechadas")
+
+    async def __aenter__(self):
+        await self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _client_timeout(self, timeout: Union[float, tuple]) -> 'aiohttp.ClientTimeout':
+        """
+        Converte o timeout no formato do ShadowReq para o formato do aiohttp.
+
+        Args:
+            timeout (float, tuple): Timeout total ou tupla (connect timeout, read timeout)
+
+        Returns:
+            aiohttp.ClientTimeout: Timeout equivalente
+        """
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def _make_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Faz a requisição através do servidor intermediário.
+
+        Aguarda uma vaga no limite de concorrência do servidor escolhido antes de enviar.
+
+        Args:
+            method (str): Método HTTP (GET, POST, PUT, DELETE)
+            url (str): URL do destino
+            **kwargs: Argumentos adicionais para a requisição
+
+        Returns:
+            requests.Response: Objeto de resposta
+
+        Raises:
+            asyncio.TimeoutError: Se a requisição exceder o timeout
+            aiohttp.ClientError: Para outros erros de requisição
+        """
+        await self._start()
+        state = self._state
+
+        host = urlsplit(url).hostname if self.rate_limit is not None else None
+        server_name = await self._select_server(state, host)
+        self.logger.sampled("Usando servidor: %s", server_name, relay=server_name)
+
+        timeout = kwargs.pop('timeout', self.timeout)
+        payload = build_payload(method, url, data=kwargs.get('data'), params=kwargs.get('params'))
+
+        self.logger.debug("Fazendo requisição %s para %s", method, url)
+
+        try:
+            async with state.semaphores[server_name]:
+                started = time.monotonic()
+                relay_url, status, content = await self._post(state, server_name, payload, timeout)
+                elapsed = time.monotonic() - started
+
+            # Extrair a resposta real do wrapper do servidor
+            if status == 200:
+                try:
+                    new_response = build_response(json.loads(content), url)
+                    self.strategy.record_success(server_name, elapsed)
+                    self._record(server_name, elapsed, timing=new_response.timing)
+                    self.logger.sampled("Requisição completada: Status %s", new_response.status_code,
+                                        relay=server_name, latency=round(elapsed, 4),
+                                        status=new_response.status_code)
+                    if self.rate_limit is not None and new_response.status_code in (429, 503):
+                        self.rate_limit.feedback(server_name, host, status, new_response.status_code,
+                                                 new_response.headers.get('retry-after'))
+                    return new_response
+                except Exception as e:
+                    self.strategy.record_failure(server_name, elapsed)
+                    challenge = is_challenge_page(content)
+                    self._record(server_name, elapsed, error=True, challenge=challenge)
+                    if challenge:
+                        self.logger.error("Servidor %s retornou a página de desafio", server_name)
+                    else:
+                        self.logger.error("Erro ao processar resposta: %s", e)
+                    return build_raw_response(status, content, relay_url)
+
+            self.strategy.record_failure(server_name, elapsed)
+            self._record(server_name, elapsed, error=True)
+            self.logger.warning("Servidor retornou status %s", status)
+            if self.rate_limit is not None:
+                self.rate_limit.feedback(server_name, host, status)
+            return build_raw_response(status, content, relay_url)
+
+        except Exception as e:
+            self.strategy.record_failure(server_name)
+            self._record(server_name, None, error=True, timeout=isinstance(e, asyncio.TimeoutError))
+            self.logger.error("Erro na requisição: %s", e)
+            raise
+
+    async def _select_server(self, state: _AsyncState, host: Optional[str]) -> str:
+        """
+        Escolhe o servidor da requisição, respeitando os limites de taxa.
+
+        Sem saldo em nenhum servidor, espera na fila do RateLimiter em uma thread,
+        sem bloquear o event loop.
+
+        Args:
+            state (_AsyncState): Estado em uso pela requisição
+            host (str, optional): Host de destino, para os limites por host
+
+        Returns:
+            str: Nome do servidor escolhido
+
+        Raises:
+            RateLimitTimeout: Se a espera na fila exceder o max_wait do RateLimiter
+        """
+        if self.rate_limit is None:
+            return self.strategy.select(state.table.names)
+        candidates = self.strategy.available(state.table.names)
+        server_name = self.rate_limit.try_acquire(candidates, host, self.strategy.select)
+        if server_name is None:
+            server_name = await asyncio.get_running_loop().run_in_executor(
+                None, self.rate_limit.acquire, candidates, host, self.strategy.select)
+        return server_name
+
+    async def _post(self, state: _AsyncState, server_name: str, payload: Dict[str, Any],
+                    timeout: Union[float, tuple]) -> Tuple[str, int, bytes]:
+        """
+        Envia o envelope ao api.php do servidor em um dos seus espelhos.
+
+        Os espelhos são usados em rodízio; se a conexão com um deles falhar (conexão
+        recusada, DNS ou timeout antes de conectar), ele sai do rodízio e o envelope vai
+        para o próximo. Timeouts depois da conexão não trocam de espelho, porque o
+        envelope pode já ter sido executado.
+
+        Args:
+            state (_AsyncState): Estado em uso pela requisição
+            server_name (str): Nome do servidor
+            payload (dict): Envelope da requisição
+            timeout (float, tuple): Timeout da requisição
+
+        Returns:
+            tuple: (URL usada, status, corpo)
+        """
+        mirrors = state.mirrors[server_name]
+        candidates = mirrors.candidates()
+        for index, relay_url in enumerate(candidates):
+            attempt = {'connected': False}
+            try:
+                async with state.sessions[server_name].post(
+                    relay_url,
+                    json=payload,
+                    headers=state.headers[server_name],
+                    timeout=self._client_timeout(timeout),
+                    trace_request_ctx=attempt
+                ) as response:
+                    content = await response.read()
+                    status = response.status
+            except (aiohttp.ClientConnectorError, asyncio.TimeoutError) as e:
+                # ServerTimeoutError também é um asyncio.TimeoutError
+                if not isinstance(e, aiohttp.ClientConnectorError) and attempt['connected']:
+                    raise
+                mirrors.failed(relay_url)
+                if index == len(candidates) - 1:
+                    raise
+                self.logger.warning("Espelho %s do servidor %s inacessível (%s); usando %s",
+                                    relay_url, server_name, e, candidates[index + 1], relay=server_name)
+                continue
+            mirrors.succeeded(relay_url)
+            return relay_url, status, content
+
+    def _record(self, server_name: str, elapsed: Optional[float], **kwargs):
+        """Registra as métricas de uma chamada ao servidor (veja Metrics.record)."""
+        if self.metrics is not None:
+            self.metrics.record(server_name, elapsed, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna as métricas e o estado de cada servidor, no mesmo formato de ShadowReq.stats().
+
+        Returns:
+            dict: {'relays': {nome: {...}}} e, com limites de taxa, 'rate_limit'
+        """
+        relays = {name: {} for name in self.server_names}
+        for name, values in (self.metrics.snapshot() if self.metrics is not None else {}).items():
+            relays.setdefault(name, {}).update(values)
+        for name, values in self.strategy.snapshot().items():
+            relay = relays.setdefault(name, {})
+            relay['state'] = values['state']
+            relay['ewma_latency'] = values['latency']
+            relay['error_rate'] = values['error_rate']
+        stats = {'relays': relays}
+        if self.rate_limit is not None:
+            stats['rate_limit'] = self.rate_limit.snapshot()
+        return stats
+
+    async def get(self, url: str, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição GET através do servidor.
+
+        Args:
+            url (str): URL do destino
+            timeout (float, tuple, optional): Timeout específico para esta requisição
+            **kwargs: Argumentos adicionais para a requisição
+
+        Returns:
+            requests.Response: Objeto de resposta
+        """
+        if timeout:
+            kwargs['timeout'] = timeout
+        return await self._make_request('GET', url, **kwargs)
+
+    async def post(self, url: str, data: Optional[Dict[str, Any]] = None, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição POST através do servidor.
+
+        Args:
+            url (str): URL do destino
+            data (dict, optional): Dados a serem enviados no corpo da requisição
+            timeout (float, tuple, optional): Timeout específico para esta requisição
+            **kwargs: Argumentos adicionais para a requisição
+
+        Returns:
+            requests.Response: Objeto de resposta
+        """
+        if timeout:
+            kwargs['timeout'] = timeout
+        return await self._make_request('POST', url, data=data, **kwargs)
+
+    async def put(self, url: str, data: Optional[Dict[str, Any]] = None, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição PUT através do servidor.
+
+        Args:
+            url (str): URL do destino
+            data (dict, optional): Dados a serem enviados no corpo da requisição
+            timeout (float, tuple, optional): Timeout específico para esta requisição
+            **kwargs: Argumentos adicionais para a requisição
+
+        Returns:
+            requests.Response: Objeto de resposta
+        """
+        if timeout:
+            kwargs['timeout'] = timeout
+        return await self._make_request('PUT', url, data=data, **kwargs)
+
+    async def delete(self, url: str, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição DELETE através do servidor.
+
+        Args:
+            url (str): URL do destino
+            timeout (float, tuple, optional): Timeout específico para esta requisição
+            **kwargs: Argumentos adicionais para a requisição
+
+        Returns:
+            requests.Response: Objeto de resposta
+        """
+        if timeout:
+            kwargs['timeout'] = timeout
+        return await self._make_request('DELETE', url, **kwargs)
@@ -0,0 +1,207 @@
+"""
+Execução de grandes volumes de requisições para o comando 'shadowreq fetch'.
+
+A entrada (URLs ou especificações JSON, uma por linha) é lida aos poucos e os
+resultados são gravados em JSONL à medida que terminam, então o uso de memória
+não depende do tamanho da entrada. O checkpoint guarda a menor linha ainda não
+concluída e as linhas concluídas acima dela, o que basta para retomar uma
+execução interrompida sem repetir requisições já gravadas.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Optional, Dict, Any, IO, Iterator, Set
+from .client import ShadowReq, RequestResult
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Interpreta uma linha da entrada.
+
+    Args:
+        line (str): URL ou objeto JSON com 'url' e, opcionalmente, 'method', 'data', 'params' e 'id'
+
+    Returns:
+        dict: Especificação da requisição, ou None para linhas vazias e comentários (#)
+
+    Raises:
+        ValueError: Se a linha JSON for inválida
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        spec = json.loads(line)
+        if not isinstance(spec, dict):
+            raise ValueError("Especificação JSON deve ser um objeto")
+        return spec
+    return {'url': line}
+
+
+class Checkpoint:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Inicializa o checkpoint de uma execução.
+
+        Args:
+            path (str, optional): Arquivo do checkpoint. Se None, nada é gravado
+        """
+        self.path = path
+        self.watermark = 0  # Todas as linhas abaixo desta foram concluídas
+        self.done: Set[int] = set()  # Linhas concluídas a partir do watermark
+        self.pending: Set[int] = set()  # Linhas enviadas e ainda não concluídas
+        self.next_line = 0  # Próxima linha a ler
+        self.completed = 0
+        self.errors = 0
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                state = json.load(f)
+            self.watermark = state.get('watermark', 0)
+            self.done = set(state.get('done', []))
+            self.completed = state.get('completed', 0)
+            self.errors = state.get('errors', 0)
+
+    def should_skip(self, line_number: int) -> bool:
+        """Verifica se a linha já foi concluída em uma execução anterior."""
+        return line_number < self.watermark or line_number in self.done
+
+    def submitted(self, line_number: int):
+        self.pending.add(line_number)
+        self.next_line = line_number + 1
+
+    def finished(self, line_number: int, error: bool):
+        self.pending.discard(line_number)
+        self.done.add(line_number)
+        self.completed += 1
+        if error:
+            self.errors += 1
+
+    def _advance(self):
+        # Move o watermark até a primeira linha ainda pendente (ou ainda não lida)
+        limit = min(self.pending) if self.pending else max(self.next_line, self.watermark)
+        self.done = {line for line in self.done if line >= limit}
+        self.watermark = max(self.watermark, limit)
+
+    def save(self):
+        """Descarta as linhas abaixo do watermark e grava o checkpoint de forma atômica."""
+        self._advance()
+        if not self.path:
+            return
+
+        state = {
+            'watermark': self.watermark,
+            'done': sorted(self.done),
+            'completed': self.completed,
+            'errors': self.errors,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+def _result_record(result: RequestResult, include_body: bool) -> Dict[str, Any]:
+    spec = result.request
+    record = {
+        'line': spec['line'],
+        'url': spec.get('url'),
+        'method': spec.get('method', 'GET').upper(),
+    }
+    if 'id' in spec:
+        record['id'] = spec['id']
+
+    if 'invalid' in spec:
+        record['status'] = None
+        record['error'] = f"Linha inválida: {spec['invalid']}"
+        return record
+
+    if result.error is not None:
+        record['status'] = None
+        record['error'] = f"{type(result.error).__name__}: {result.error}"
+        return record
+
+    response = result.response
+    record['status'] = response.status_code
+    record['error'] = None if response.status_code < 400 else (response.reason or f"HTTP {response.status_code}")
+    if include_body:
+        record['body'] = response.text
+    return record
+
+
+def fetch(shadow: ShadowReq, source: IO[str], output: IO[str],
+          workers: int = 10, checkpoint: Optional[Checkpoint] = None,
+          include_body: bool = True, progress: Optional[IO[str]] = sys.stderr,
+          checkpoint_interval: float = 1.0) -> Checkpoint:
+    """
+    Executa as requisições da entrada e grava os resultados em JSONL.
+
+    Args:
+        shadow (ShadowReq): Cliente usado nas requisições
+        source (file): Entrada com uma URL ou especificação JSON por linha
+        output (file): Saída JSONL, uma linha por resultado na ordem de conclusão
+        workers (int): Número de requisições simultâneas
+        checkpoint (Checkpoint, optional): Checkpoint para retomar e registrar o progresso
+        include_body (bool): Se True, inclui o corpo da resposta em 'body'
+        progress (file, optional): Onde mostrar a linha de progresso. Se None, não mostra
+        checkpoint_interval (float): Intervalo mínimo entre gravações do checkpoint em segundos
+
+    Returns:
+        Checkpoint: Estado final da execução
+    """
+    checkpoint = checkpoint or Checkpoint()
+
+    def specs() -> Iterator[Dict[str, Any]]:
+        for line_number, line in enumerate(source):
+            if checkpoint.should_skip(line_number):
+                continue
+            try:
+                spec = parse_line(line)
+            except ValueError as e:
+                spec = {'url': None, 'invalid': str(e)}
+            if spec is None:
+                continue
+            spec['line'] = line_number
+            checkpoint.submitted(line_number)
+            yield spec
+
+    started = time.monotonic()
+    last_save = last_progress = started
+    session_completed = 0
+
+    def show_progress(final=False):
+        elapsed = time.monotonic() - started
+        rate = session_completed / elapsed if elapsed else 0.0
+        progress.write(f"\r{checkpoint.completed} concluídas, {checkpoint.errors} erros, "
+                       f"{rate:.1f} req/s, {len(checkpoint.pending)} em andamento")
+        if final:
+            progress.write('\n')
+        progress.flush()
+
+    try:
+        for result in shadow.imap_unordered(specs(), workers=workers):
+            record = _result_record(result, include_body)
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            checkpoint.finished(record['line'], record['error'] is not None)
+            session_completed += 1
+
+            now = time.monotonic()
+            if now - last_save >= checkpoint_interval:
+                # A saída é gravada antes do checkpoint: no pior caso uma linha se repete, nunca se perde
+                output.flush()
+                checkpoint.save()
+                last_save = now
+            if progress is not None and now - last_progress >= 0.5:
+                show_progress()
+                last_progress = now
+    finally:
+        output.flush()
+        checkpoint.save()
+        if progress is not None:
+            show_progress(final=True)
+
+    return checkpoint
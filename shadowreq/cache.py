@@ -0,0 +1,465 @@
+"""
+Cache local de respostas do ShadowReq.
+
+Mantém as respostas em memória (LRU com limite de bytes) e, opcionalmente, em
+disco (com limite de bytes, removendo as gravações mais antigas). O tempo de vida segue os headers Cache-Control/Expires do destino quando
+o servidor intermediário os repassa. Requisições idênticas simultâneas são
+agrupadas em uma única chamada ao servidor.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable, Iterable, Tuple
+import requests
+from requests.structures import CaseInsensitiveDict
+from .logger import ShadowLogger
+
+# Função que faz a requisição e indica se a resposta pode ser guardada
+Loader = Callable[[], Tuple[requests.Response, bool]]
+
+# Status que podem ser guardados no cache
+CACHEABLE_STATUS = (200, 203, 300, 301, 404, 410)
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Interpreta o header Cache-Control.
+
+    Args:
+        value (str, optional): Valor do header
+
+    Returns:
+        dict: Diretivas em minúsculas, com o valor ou None
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition('=')
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    """Resposta guardada no cache."""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], url: Optional[str],
+                 expires_at: float, stale_until: float):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+    @property
+    def size(self) -> int:
+        """Tamanho aproximado da entrada em bytes."""
+        return len(self.content) + sum(len(k) + len(v) for k, v in self.headers.items()) + 200
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.stale_until
+
+    def to_response(self) -> requests.Response:
+        """Cria um novo objeto Response com o conteúdo da entrada."""
+        response = requests.Response()
+        response.status_code = self.status_code
+        response._content = self.content
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.url = self.url
+        response.from_cache = True
+        return response
+
+
+class _MemoEntry:
+    """Resultado de uma função decorada com memoize(), guardado no mesmo LRU das respostas."""
+
+    def __init__(self, value: Any, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+        # Tamanho aproximado: o do objeto, mais o corpo quando é uma resposta
+        content = getattr(value, '_content', None)
+        self.size = sys.getsizeof(value) + (len(content) if isinstance(content, bytes) else 0) + 200
+
+
+class _Flight:
+    """Requisição em andamento compartilhada entre chamadas idênticas."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.response = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 300.0,
+                 disk_dir: Optional[str] = None,
+                 max_disk_bytes: Optional[int] = 1024 * 1024 * 1024,
+                 stale_while_revalidate: float = 0.0,
+                 honour_headers: bool = True,
+                 methods: Iterable[str] = ('GET',),
+                 cacheable_status: Iterable[int] = CACHEABLE_STATUS,
+                 shared: bool = False):
+        """
+        Inicializa o cache de respostas.
+
+        Args:
+            max_bytes (int): Limite de memória das respostas guardadas em bytes
+            ttl (float): Tempo de vida padrão das respostas em segundos
+            disk_dir (str, optional): Diretório do cache em disco. Se None, usa só a memória
+            max_disk_bytes (int, optional): Limite do cache em disco em bytes; ao gravar, remove os
+                                            arquivos gravados há mais tempo até caber. Se None, sem limite
+            stale_while_revalidate (float): Segundos após a expiração em que a resposta
+                                            antiga ainda é usada enquanto é atualizada em segundo plano
+            honour_headers (bool): Se True, usa Cache-Control/Expires do destino quando presentes
+            methods (iterable): Métodos HTTP cujas respostas podem ser guardadas
+            cacheable_status (iterable): Status que podem ser guardados
+            shared (bool): Se True, o cache atende vários clientes (como no servidor do
+                           'shadowreq serve') e não guarda respostas com Cache-Control: private
+                           nem com Set-Cookie
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.stale_while_revalidate = stale_while_revalidate
+        self.honour_headers = honour_headers
+        self.methods = frozenset(m.upper() for m in methods)
+        self.cacheable_status = frozenset(cacheable_status)
+        self.shared = shared
+        self.logger = ShadowLogger()
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        # Arquivos do disco por ordem de gravação: chave -> tamanho
+        self._disk_files = OrderedDict()
+        self._disk_size = 0
+        self._disk_lock = threading.Lock()
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def allows(self, method: str) -> bool:
+        """Verifica se respostas do método podem ser guardadas."""
+        return method.upper() in self.methods
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Calcula a chave do cache de uma requisição.
+
+        Args:
+            method (str): Método HTTP
+            url (str): URL do destino
+            params (dict, optional): Parâmetros da requisição
+
+        Returns:
+            str: Hash SHA-256 de método, URL e parâmetros
+        """
+        raw = json.dumps([method.upper(), url, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def fetch(self, key: str, loader: Loader) -> requests.Response:
+        """
+        Retorna a resposta do cache ou a obtém com o loader.
+
+        Chamadas simultâneas com a mesma chave compartilham uma única execução do loader.
+
+        Args:
+            key (str): Chave do cache (veja make_key)
+            loader (callable): Função que faz a requisição de verdade e retorna
+                               (resposta, pode_ser_guardada)
+
+        Returns:
+            requests.Response: Resposta do cache ou do loader
+        """
+        now = time.time()
+        entry = self.get(key)
+
+        if entry is not None:
+            if entry.is_fresh(now):
+                self.logger.debug("Cache hit: %s", entry.url)
+                return entry.to_response()
+            if entry.is_usable(now):
+                # Usa a resposta antiga e atualiza em segundo plano
+                self.logger.debug("Cache stale, revalidando: %s", entry.url)
+                threading.Thread(target=self._revalidate, args=(key, loader), daemon=True).start()
+                return entry.to_response()
+
+        return self._load(key, loader)
+
+    def _revalidate(self, key: str, loader: Loader):
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            self.logger.warning("Erro ao revalidar cache: %s", e)
+
+    def _load(self, key: str, loader: Loader) -> requests.Response:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry.to_response() if flight.entry is not None else flight.response
+
+        try:
+            response, cacheable = loader()
+            flight.response = response
+            if cacheable:
+                flight.entry = self.store(key, response)
+            return response
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Busca uma entrada na memória e, se não houver, no disco.
+
+        Args:
+            key (str): Chave do cache
+
+        Returns:
+            CacheEntry: Entrada encontrada ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.disk_dir:
+            return None
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            if entry.is_usable(time.time()):
+                self._put_memory(key, entry)
+            else:
+                self._delete_disk(key)
+                entry = None
+        return entry
+
+    def store(self, key: str, response: requests.Response) -> Optional[CacheEntry]:
+        """
+        Guarda a resposta se ela puder ser guardada.
+
+        Args:
+            key (str): Chave do cache
+            response (requests.Response): Resposta a guardar
+
+        Returns:
+            CacheEntry: Entrada criada ou None se a resposta não foi guardada
+        """
+        if response.status_code not in self.cacheable_status:
+            return None
+
+        ttl, stale = self._lifetime(response.headers)
+        if ttl is None:
+            return None
+
+        now = time.time()
+        entry = CacheEntry(response.status_code, response.content, dict(response.headers),
+                           response.url, now + ttl, now + ttl + stale)
+        if entry.stale_until <= now:
+            return None
+
+        self._put_memory(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+        return entry
+
+    def _lifetime(self, headers: CaseInsensitiveDict):
+        """Calcula (ttl, stale-while-revalidate) de uma resposta; ttl None se não puder ser guardada."""
+        ttl = self.ttl
+        stale = self.stale_while_revalidate
+        if self.shared and headers:
+            # Respostas de um cliente não podem ser entregues a outro
+            if 'private' in parse_cache_control(headers.get('cache-control')) or 'set-cookie' in headers:
+                return None, 0
+        if not self.honour_headers or not headers:
+            return ttl, stale
+
+        directives = parse_cache_control(headers.get('cache-control'))
+        if 'no-store' in directives or 'no-cache' in directives:
+            return None, 0
+
+        try:
+            if directives.get('s-maxage') is not None:
+                ttl = float(directives['s-maxage'])
+            elif directives.get('max-age') is not None:
+                ttl = float(directives['max-age'])
+            elif headers.get('expires'):
+                expires = parsedate_to_datetime(headers['expires']).timestamp()
+                date = parsedate_to_datetime(headers['date']).timestamp() if headers.get('date') else time.time()
+                ttl = max(0.0, expires - date)
+            if directives.get('stale-while-revalidate') is not None:
+                stale = float(directives['stale-while-revalidate'])
+        except (TypeError, ValueError):
+            pass
+
+        return ttl, stale
+
+    def _put_memory(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[key] = entry
+            self._size += entry.size
+
+            # Remove as entradas menos usadas até caber no limite
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + '.cache')
+
+    def _scan_disk(self):
+        """Carrega o índice dos arquivos já gravados no diretório, do mais antigo ao mais novo."""
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith('.cache'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, name[:-len('.cache')], stat.st_size))
+
+        with self._disk_lock:
+            for _, key, size in sorted(files):
+                self._disk_files[key] = size
+                self._disk_size += size
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove os arquivos gravados há mais tempo até o disco caber em max_disk_bytes."""
+        if self.max_disk_bytes is None:
+            return
+        evicted = []
+        with self._disk_lock:
+            while self._disk_size > self.max_disk_bytes and self._disk_files:
+                key, size = self._disk_files.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(key)
+        for key in evicted:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning("Erro ao ler cache em disco: %s", e)
+            return None
+
+    def _write_disk(self, key: str, entry: CacheEntry):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning("Erro ao gravar cache em disco: %s", e)
+            return
+
+        with self._disk_lock:
+            self._disk_size += size - self._disk_files.pop(key, 0)
+            self._disk_files[key] = size
+        self._prune_disk()
+
+    def _delete_disk(self, key: str):
+        with self._disk_lock:
+            self._disk_size -= self._disk_files.pop(key, 0)
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove todas as entradas da memória (o disco é mantido)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def memoize(self, ttl: Optional[float] = None):
+        """
+        Decorador que guarda em memória o resultado de uma função pelos seus argumentos.
+
+        Os resultados ficam no mesmo LRU das respostas e contam para max_bytes; resultados
+        expirados são descartados ao serem consultados.
+
+        Args:
+            ttl (float, optional): Tempo de vida dos resultados em segundos. Se None, usa o ttl do cache
+
+        Returns:
+            callable: Decorador
+        """
+        lifetime = self.ttl if ttl is None else ttl
+
+        def decorator(func):
+            # Identifica a função nas chaves, que dividem o dicionário com as respostas
+            namespace = object()
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (namespace, args, tuple(sorted(kwargs.items())))
+                now = time.time()
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        if now < entry.expires_at:
+                            self._entries.move_to_end(key)
+                            return entry.value
+                        del self._entries[key]
+                        self._size -= entry.size
+
+                result = func(*args, **kwargs)
+                self._put_memory(key, _MemoEntry(result, now + lifetime))
+                return result
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,268 @@
+"""
+Resolução do desafio JavaScript do InfinityFree sem navegador.
+
+A página de desafio carrega o slowAES (/aes.js) e define o cookie __test com
+toHex(slowAES.decrypt(c, 2, a, b)), ou seja, o texto cifrado c decifrado com
+AES-CBC usando a chave a e o IV b. Este módulo refaz essa conta em Python puro.
+"""
+
+import re
+from typing import Optional, List, Tuple
+import requests
+from .protocol import is_challenge_page
+
+# User-Agent usado nas requisições do resolvedor
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36')
+
+_NUMBERS_RE = re.compile(r'toNumbers\(\s*["\']([0-9a-fA-F]+)["\']\s*\)')
+_REDIRECT_RE = re.compile(r'location\.href\s*=\s*["\']([^"\']+)["\']')
+
+
+class ChallengeError(Exception):
+    """Erro ao interpretar ou resolver a página de desafio."""
+
+
+def _build_tables():
+    # Tabelas exp/log de GF(2^8) com gerador 3, usadas para calcular a S-box
+    exp = [0] * 512
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x ^= (x << 1) ^ (0x11B if x & 0x80 else 0)
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+
+    sbox = [0] * 256
+    inv_sbox = [0] * 256
+    for i in range(256):
+        inverse = 0 if i == 0 else exp[255 - log[i]]
+        s = inverse
+        for shift in range(1, 5):
+            s ^= ((inverse << shift) | (inverse >> (8 - shift))) & 0xFF
+        s ^= 0x63
+        sbox[i] = s
+        inv_sbox[s] = i
+
+    def mul(a, b):
+        return 0 if a == 0 or b == 0 else exp[log[a] + log[b]]
+
+    mul_tables = {n: [mul(i, n) for i in range(256)] for n in (2, 3, 9, 11, 13, 14)}
+    return sbox, inv_sbox, mul_tables
+
+
+_SBOX, _INV_SBOX, _MUL = _build_tables()
+
+
+def _expand_key(key: bytes) -> List[List[int]]:
+    """Gera as chaves de cada rodada (AES-128, 192 ou 256)."""
+    if len(key) not in (16, 24, 32):
+        raise ChallengeError(f"Tamanho de chave AES inválido: {len(key)}")
+
+    nk = len(key) // 4
+    rounds = nk + 6
+    words = [list(key[4 * i:4 * i + 4]) for i in range(nk)]
+    rcon = 1
+
+    for i in range(nk, 4 * (rounds + 1)):
+        word = list(words[i - 1])
+        if i % nk == 0:
+            word = [_SBOX[b] for b in word[1:] + word[:1]]
+            word[0] ^= rcon
+            rcon = _MUL[2][rcon]
+        elif nk > 6 and i % nk == 4:
+            word = [_SBOX[b] for b in word]
+        words.append([a ^ b for a, b in zip(words[i - nk], word)])
+
+    return [sum(words[4 * r:4 * r + 4], []) for r in range(rounds + 1)]
+
+
+def _encrypt_block(block: List[int], round_keys: List[List[int]]) -> List[int]:
+    state = [b ^ k for b, k in zip(block, round_keys[0])]
+    last = len(round_keys) - 1
+
+    for rnd in range(1, last + 1):
+        # SubBytes + ShiftRows (estado em ordem de colunas: índice = linha + 4 * coluna)
+        state = [_SBOX[state[r + 4 * ((c + r) % 4)]] for c in range(4) for r in range(4)]
+        if rnd != last:
+            mixed = []
+            for c in range(4):
+                a0, a1, a2, a3 = state[4 * c:4 * c + 4]
+                mixed += [
+                    _MUL[2][a0] ^ _MUL[3][a1] ^ a2 ^ a3,
+                    a0 ^ _MUL[2][a1] ^ _MUL[3][a2] ^ a3,
+                    a0 ^ a1 ^ _MUL[2][a2] ^ _MUL[3][a3],
+                    _MUL[3][a0] ^ a1 ^ a2 ^ _MUL[2][a3],
+                ]
+            state = mixed
+        state = [b ^ k for b, k in zip(state, round_keys[rnd])]
+
+    return state
+
+
+def _decrypt_block(block: List[int], round_keys: List[List[int]]) -> List[int]:
+    last = len(round_keys) - 1
+    state = [b ^ k for b, k in zip(block, round_keys[last])]
+
+    for rnd in range(last - 1, -1, -1):
+        # InvShiftRows + InvSubBytes
+        state = [_INV_SBOX[state[r + 4 * ((c - r) % 4)]] for c in range(4) for r in range(4)]
+        state = [b ^ k for b, k in zip(state, round_keys[rnd])]
+        if rnd != 0:
+            mixed = []
+            for c in range(4):
+                a0, a1, a2, a3 = state[4 * c:4 * c + 4]
+                mixed += [
+                    _MUL[14][a0] ^ _MUL[11][a1] ^ _MUL[13][a2] ^ _MUL[9][a3],
+                    _MUL[9][a0] ^ _MUL[14][a1] ^ _MUL[11][a2] ^ _MUL[13][a3],
+                    _MUL[13][a0] ^ _MUL[9][a1] ^ _MUL[14][a2] ^ _MUL[11][a3],
+                    _MUL[11][a0] ^ _MUL[13][a1] ^ _MUL[9][a2] ^ _MUL[14][a3],
+                ]
+            state = mixed
+
+    return state
+
+
+def aes_cbc_encrypt(plaintext: bytes, key: bytes, iv: bytes) -> bytes:
+    """
+    Cifra com AES-CBC, sem padding (o tamanho deve ser múltiplo de 16).
+
+    Args:
+        plaintext (bytes): Texto a cifrar
+        key (bytes): Chave de 16, 24 ou 32 bytes
+        iv (bytes): Vetor de inicialização de 16 bytes
+
+    Returns:
+        bytes: Texto cifrado
+    """
+    if len(plaintext) % 16:
+        raise ChallengeError("O texto deve ter tamanho múltiplo de 16 bytes")
+
+    round_keys = _expand_key(key)
+    previous = list(iv)
+    output = []
+    for i in range(0, len(plaintext), 16):
+        block = [b ^ p for b, p in zip(plaintext[i:i + 16], previous)]
+        previous = _encrypt_block(block, round_keys)
+        output += previous
+    return bytes(output)
+
+
+def aes_cbc_decrypt(ciphertext: bytes, key: bytes, iv: bytes) -> bytes:
+    """
+    Decifra com AES-CBC, como o slowAES.decrypt no modo CBC.
+
+    Assim como o slowAES, só remove o padding quando há mais de um bloco.
+
+    Args:
+        ciphertext (bytes): Texto cifrado (múltiplo de 16 bytes)
+        key (bytes): Chave de 16, 24 ou 32 bytes
+        iv (bytes): Vetor de inicialização de 16 bytes
+
+    Returns:
+        bytes: Texto decifrado
+    """
+    if not ciphertext or len(ciphertext) % 16:
+        raise ChallengeError("O texto cifrado deve ter tamanho múltiplo de 16 bytes")
+
+    round_keys = _expand_key(key)
+    previous = list(iv)
+    output = []
+    for i in range(0, len(ciphertext), 16):
+        block = list(ciphertext[i:i + 16])
+        output += [b ^ p for b, p in zip(_decrypt_block(block, round_keys), previous)]
+        previous = block
+
+    if len(output) > 16:
+        pad = output[-1]
+        if 0 < pad <= 16 and output[-pad:] == [pad] * pad:
+            output = output[:-pad]
+    return bytes(output)
+
+
+def parse_challenge(html: str) -> Tuple[bytes, bytes, bytes, Optional[str]]:
+    """
+    Extrai chave, IV, texto cifrado e URL de redirecionamento da página de desafio.
+
+    Args:
+        html (str): Conteúdo da página de desafio
+
+    Returns:
+        tuple: (chave, iv, texto cifrado, URL de redirecionamento ou None)
+
+    Raises:
+        ChallengeError: Se a página não tiver os valores do desafio
+    """
+    numbers = _NUMBERS_RE.findall(html)
+    if len(numbers) < 3:
+        raise ChallengeError("Valores do desafio não encontrados na página")
+
+    key, iv, ciphertext = (bytes.fromhex(value) for value in numbers[:3])
+    redirect = _REDIRECT_RE.search(html)
+    return key, iv, ciphertext, redirect.group(1) if redirect else None
+
+
+def solve_challenge(html: str) -> str:
+    """
+    Calcula o valor do cookie __test a partir da página de desafio.
+
+    Args:
+        html (str): Conteúdo da página de desafio
+
+    Returns:
+        str: Valor do cookie em hexadecimal
+
+    Raises:
+        ChallengeError: Se a página não puder ser resolvida
+    """
+    key, iv, ciphertext, _ = parse_challenge(html)
+    return aes_cbc_decrypt(ciphertext, key, iv).hex()
+
+
+def fetch_cookie(url: str, user_agent: str = DEFAULT_USER_AGENT,
+                 timeout: Optional[float] = 10.0,
+                 session: Optional[requests.Session] = None) -> Tuple[Optional[str], str]:
+    """
+    Obtém o cookie __test de um servidor apenas com requisições HTTP.
+
+    Busca a página de desafio, calcula o cookie, segue o redirecionamento e
+    confirma que o servidor aceitou o cookie.
+
+    Args:
+        url (str): URL da página protegida (ex.: http://servidor/api.php)
+        user_agent (str): User-Agent usado nas requisições
+        timeout (float, optional): Timeout de cada requisição em segundos
+        session (requests.Session, optional): Sessão a usar. Se None, cria uma
+
+    Returns:
+        tuple: (cookie, user_agent). cookie é None se o servidor não pediu o desafio
+
+    Raises:
+        ChallengeError: Se o desafio não puder ser resolvido ou o cookie for recusado
+        requests.exceptions.RequestException: Para erros de requisição
+    """
+    own_session = session is None
+    session = session or requests.Session()
+    session.headers['user-agent'] = user_agent
+
+    try:
+        response = session.get(url, timeout=timeout)
+        if not is_challenge_page(response.content):
+            return session.cookies.get('__test'), user_agent
+
+        cookie = solve_challenge(response.text)
+        _, _, _, redirect = parse_challenge(response.text)
+
+        host = requests.utils.urlparse(response.url).hostname
+        session.cookies.set('__test', cookie, domain=host, path='/')
+
+        confirmation = session.get(requests.compat.urljoin(response.url, redirect or url), timeout=timeout)
+        if is_challenge_page(confirmation.content):
+            raise ChallengeError(f"Cookie recusado por {host}")
+
+        return cookie, user_agent
+    finally:
+        if own_session:
+            session.close()
@@ -3,9 +3,14 @@ Interface de linha de comando para o ShadowReq.
 """
 
 import argparse
+import json
 import os
+import sys
+import requests
 from .cookie_updater import CookieUpdater
 from .logger import ShadowLogger
+from .metrics import format_stats
+from .retry import RetryPolicy
 
 def update_cookies(args):
     """Atualiza os cookies dos servidores."""
@@ -14,15 +19,23 @@ def update_cookies(args):
     # Configurar logging
     logger = ShadowLogger()
     logger.setup(enabled=args.enable_logging, log_file=args.log_file)
-    logger.info(f"Usando arquivo de configuração: {config_path}")
+    logger.info("Usando arquivo de configuração: %s", config_path)
     
     if not os.path.exists(config_path):
-        logger.error(f"Erro: Arquivo {config_path} não encontrado")
+        logger.error("Erro: Arquivo %s não encontrado", config_path)
         print(f"Erro: Arquivo {config_path} não encontrado")
         return
     
+    updater = CookieUpdater(config_path, enable_logging=args.enable_logging, log_file=args.log_file,
+                            browser_fallback=not args.no_browser, workers=args.workers, timeout=args.timeout,
+                            snapshot_file=args.snapshot)
     try:
-        updater = CookieUpdater(config_path, enable_logging=args.enable_logging, log_file=args.log_file)
+        if args.daemon:
+            logger.info("Atualizando cookies a cada %s segundos...", args.interval)
+            print(f"Atualizando cookies a cada {args.interval} segundos (Ctrl+C para sair)...")
+            updater.run_forever(args.interval)
+            return
+
         logger.info("Iniciando atualização de cookies...")
         print("Iniciando atualização de cookies...")
         
@@ -31,10 +44,98 @@ def update_cookies(args):
         logger.info("Cookies atualizados com sucesso!")
         print("Cookies atualizados com sucesso!")
         
+    except KeyboardInterrupt:
+        print("Encerrando...")
     except Exception as e:
         error_msg = f"Erro ao atualizar cookies: {str(e)}"
         logger.error(error_msg)
         print(error_msg)
+    finally:
+        updater.close()
+
+def show_stats(args):
+    """Mostra as métricas de um processo que chamou ShadowReq.serve_metrics()."""
+    base_url = args.url.rstrip('/')
+    try:
+        if args.format == 'prometheus':
+            response = requests.get(f"{base_url}/metrics", timeout=args.timeout)
+            response.raise_for_status()
+            print(response.text, end='')
+            return
+
+        response = requests.get(f"{base_url}/stats", timeout=args.timeout)
+        response.raise_for_status()
+        stats = response.json()
+    except Exception as e:
+        print(f"Erro ao obter métricas de {base_url}: {str(e)}")
+        return
+
+    if args.format == 'json':
+        print(json.dumps(stats, indent=2))
+    else:
+        print(format_stats(stats))
+
+def fetch_urls(args):
+    """Faz as requisições listadas na entrada e grava os resultados em JSONL."""
+    # Importado aqui para não carregar o cliente nos demais comandos
+    from .client import ShadowReq
+    from .bulk import Checkpoint, fetch
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    retry = RetryPolicy(max_attempts=args.retries) if args.retries > 1 else None
+    timeout = (min(5.0, args.timeout), args.timeout)
+
+    try:
+        with ShadowReq(os.path.abspath(args.config), timeout=timeout, enable_logging=args.enable_logging,
+                       log_file=args.log_file, pool_size=args.workers, retry=retry,
+                       passthrough=args.passthrough) as shadow:
+            checkpoint = fetch(shadow, source, output, workers=args.workers,
+                               checkpoint=Checkpoint(args.checkpoint), include_body=not args.no_body,
+                               progress=None if args.quiet else sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrompido; use o mesmo --checkpoint para continuar", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    if checkpoint.errors:
+        sys.exit(1)
+
+def serve_relay(args):
+    """Inicia o servidor intermediário em Python, compatível com o api.php."""
+    # Importado aqui para não exigir o aiohttp nos demais comandos
+    from .cache import ResponseCache
+    from .relay import RelayServer
+
+    logger = ShadowLogger()
+    logger.setup(enabled=args.enable_logging, log_file=args.log_file)
+
+    token = args.token or os.environ.get('SHADOWREQ_TOKEN')
+    if not token and args.host not in ('127.0.0.1', 'localhost', '::1'):
+        print("Aviso: servidor acessível pela rede sem token; use --token ou SHADOWREQ_TOKEN", file=sys.stderr)
+
+    cache = None
+    if args.cache_size > 0:
+        cache = ResponseCache(max_bytes=int(args.cache_size * 1024 * 1024), ttl=args.cache_ttl,
+                              shared=True)
+
+    try:
+        server = RelayServer(host=args.host, port=args.port, token=token, max_concurrency=args.max_concurrency,
+                             max_per_host=args.max_per_host, timeout=args.timeout, cache=cache,
+                             gzip=not args.no_gzip)
+    except ImportError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    print(f"Servidor intermediário em http://{args.host}:{args.port} (Ctrl+C para sair)")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        print("Encerrando...")
 
 def main():
     """Função principal da interface de linha de comando."""
@@ -46,11 +147,65 @@ def main():
     update_parser.add_argument('--config', default='servers.json', help='Arquivo de configuração dos servidores')
     update_parser.add_argument('--enable-logging', action='store_true', help='Ativa o logging para arquivo')
     update_parser.add_argument('--log-file', help='Caminho para o arquivo de log')
+    update_parser.add_argument('--workers', type=int, default=4, help='Servidores atualizados em paralelo')
+    update_parser.add_argument('--timeout', type=float, default=30.0, help='Timeout por servidor em segundos')
+    update_parser.add_argument('--no-browser', action='store_true', help='Não usa o Chrome headless como alternativa')
+    update_parser.add_argument('--snapshot', help='Snapshot binário da configuração a regravar a cada atualização')
+    update_parser.add_argument('--daemon', action='store_true', help='Continua atualizando periodicamente')
+    update_parser.add_argument('--interval', type=float, default=3600.0,
+                               help='Intervalo entre atualizações no modo --daemon em segundos')
+
+    # Comando fetch
+    fetch_parser = subparsers.add_parser('fetch', help='Faz as requisições de um arquivo e grava os resultados em JSONL')
+    fetch_parser.add_argument('input', nargs='?', default='-',
+                              help='Arquivo com uma URL ou especificação JSON por linha (- para stdin)')
+    fetch_parser.add_argument('--output', '-o', default='-', help='Arquivo JSONL de saída, gravado em modo append (- para stdout)')
+    fetch_parser.add_argument('--config', default='servers.json', help='Arquivo de configuração dos servidores')
+    fetch_parser.add_argument('--workers', '-w', type=int, default=10, help='Requisições simultâneas')
+    fetch_parser.add_argument('--timeout', type=float, default=30.0, help='Timeout de leitura em segundos')
+    fetch_parser.add_argument('--retries', type=int, default=1, help='Tentativas por requisição')
+    fetch_parser.add_argument('--passthrough', action='store_true', help='Usa o modo raw do api.php')
+    fetch_parser.add_argument('--checkpoint', help='Arquivo de checkpoint para retomar uma execução interrompida')
+    fetch_parser.add_argument('--no-body', action='store_true', help='Não inclui o corpo das respostas')
+    fetch_parser.add_argument('--quiet', '-q', action='store_true', help='Não mostra a linha de progresso')
+    fetch_parser.add_argument('--enable-logging', action='store_true', help='Ativa o logging para arquivo')
+    fetch_parser.add_argument('--log-file', help='Caminho para o arquivo de log')
+
+    # Comando stats
+    stats_parser = subparsers.add_parser('stats', help='Mostra as métricas de um processo com serve_metrics()')
+    stats_parser.add_argument('--url', default='http://127.0.0.1:9100', help='Endereço do servidor de métricas')
+    stats_parser.add_argument('--format', choices=['table', 'json', 'prometheus'], default='table',
+                              help='Formato da saída')
+    stats_parser.add_argument('--timeout', type=float, default=5.0, help='Timeout em segundos')
+
+    # Comando serve
+    serve_parser = subparsers.add_parser('serve', help='Inicia um servidor intermediário compatível com o api.php')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta (0.0.0.0 para todas as interfaces)')
+    serve_parser.add_argument('--port', type=int, default=8080, help='Porta de escuta')
+    serve_parser.add_argument('--token', help='Token exigido no header X-Shadow-Token (default: variável SHADOWREQ_TOKEN)')
+    serve_parser.add_argument('--max-concurrency', type=int, default=100,
+                              help='Requisições simultâneas aos destinos; as demais esperam na fila')
+    serve_parser.add_argument('--max-per-host', type=int, default=0,
+                              help='Conexões simultâneas com um mesmo destino (0 para sem limite)')
+    serve_parser.add_argument('--timeout', type=float, default=60.0, help='Timeout de leitura dos destinos em segundos')
+    serve_parser.add_argument('--cache-size', type=float, default=0.0,
+                              help='Memória do cache de respostas GET em MB (0 desativa)')
+    serve_parser.add_argument('--cache-ttl', type=float, default=300.0,
+                              help='Tempo de vida das respostas sem Cache-Control em segundos')
+    serve_parser.add_argument('--no-gzip', action='store_true', help='Não comprime as respostas')
+    serve_parser.add_argument('--enable-logging', action='store_true', help='Ativa o logging para arquivo')
+    serve_parser.add_argument('--log-file', help='Caminho para o arquivo de log')
 
     args = parser.parse_args()
 
     if args.command == 'update-cookies':
         update_cookies(args)
+    elif args.command == 'fetch':
+        fetch_urls(args)
+    elif args.command == 'stats':
+        show_stats(args)
+    elif args.command == 'serve':
+        serve_relay(args)
     else:
         parser.print_help()
 
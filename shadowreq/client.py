@@ -1,18 +1,71 @@
+import copy
+import itertools
 import requests
-import json
-import random
-from typing import Optional, Dict, Any, Union
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, Union, List, Iterable, Iterator, Tuple, NamedTuple, Callable, Set
+from urllib.parse import urlsplit
 import urllib3
+from requests.adapters import HTTPAdapter
 from .logger import ShadowLogger
+from .protocol import (build_payload, build_response, build_batch_response, build_passthrough_response,
+                       build_error_response, normalize_request, is_challenge_page, encode_payload,
+                       build_body, encode_stream_payload, StreamingBody)
+from .selection import SelectionStrategy, get_strategy
+from .retry import RetryPolicy, HedgePolicy
+from .cache import ResponseCache
+from .ratelimit import RateLimiter
+from .connections import DnsCache, CachedDNSAdapter, MirrorSet, ConnectionWarmer, is_connect_error
+from .cookie_updater import CookieUpdater
+from .metrics import Metrics, MetricsServer
+from .config import ServerEntry, ServerTable, load_config, start_watcher
 
 # Desabilitar avisos de SSL não verificado
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Identificadores das requisições nos logs
+_request_ids = itertools.count(1)
+
+
+class RequestResult(NamedTuple):
+    """Resultado de uma requisição feita por map() ou imap_unordered()."""
+    index: int  # Posição da requisição na entrada
+    request: Union[str, Dict[str, Any]]  # Requisição como foi recebida
+    response: Optional[requests.Response]  # Resposta, ou None se houve erro
+    error: Optional[Exception]  # Exceção da requisição, ou None
+
+
+class _ClientState(NamedTuple):
+    """Tabela de servidores, sessões e espelhos em uso; trocada inteira quando a configuração muda."""
+    table: ServerTable
+    sessions: Dict[str, requests.Session]
+    mirrors: Dict[str, MirrorSet]
+
 class ShadowReq:
     def __init__(self, server_config_file: str = 'servers.json', 
                  timeout: Optional[Union[float, tuple]] = None,
-                 enable_logging: bool = False,
-                 log_file: Optional[str] = None):
+                 enable_logging: Optional[bool] = None,
+                 log_file: Optional[str] = None,
+                 pool_size: int = 10,
+                 keep_alive: bool = True,
+                 dns_ttl: Optional[float] = 300.0,
+                 mirror_cooldown: float = 30.0,
+                 prewarm: int = 0,
+                 prewarm_interval: float = 10.0,
+                 strategy: Union[str, SelectionStrategy] = 'p2c',
+                 retry: Optional[RetryPolicy] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limit: Optional[RateLimiter] = None,
+                 passthrough: bool = False,
+                 refresh_cookies: bool = True,
+                 watch_config: bool = False,
+                 watch_interval: float = 1.0,
+                 snapshot_file: Optional[str] = None,
+                 metrics: Union[bool, Metrics] = True,
+                 hooks: Optional[Dict[str, List[Callable]]] = None):
         """
         Inicializa o ShadowReq com as configurações do servidor.
         
@@ -20,40 +73,245 @@ class ShadowReq:
             server_config_file (str): Caminho para o arquivo de configuração dos servidores
             timeout (float, tuple, optional): Timeout para as requisições em segundos.
                                            Pode ser um número (timeout total) ou uma tupla (connect timeout, read timeout)
-            enable_logging (bool): Se True, ativa o logging para um arquivo
-            log_file (str, optional): Caminho para o arquivo de log
+            enable_logging (bool, optional): Se True, ativa o logging para um arquivo; se False, desativa.
+                                             Se None, mantém a configuração atual do logger,
+                                             que é compartilhado pelo processo
+            log_file (str, optional): Caminho para o arquivo de log. Se None, mantém o atual
+            pool_size (int): Número máximo de conexões mantidas por servidor.
+                             Pode ser sobrescrito por servidor com a chave 'pool_size'
+            keep_alive (bool): Se True, reutiliza as conexões com os servidores.
+                               Pode ser sobrescrito por servidor com a chave 'keep_alive'
+            dns_ttl (float, optional): Tempo em segundos que os endereços dos servidores ficam em cache.
+                                       Se None, resolve o nome a cada nova conexão
+            mirror_cooldown (float): Tempo em segundos que uma URL de servidor ('urls') fica fora do
+                                     rodízio depois de recusar uma conexão
+            prewarm (int): Conexões abertas com cada URL de servidor ao iniciar e mantidas abertas
+                           nos períodos sem requisições. Se 0, não pré-aquece
+            prewarm_interval (float): Intervalo entre as rodadas de pré-aquecimento em segundos.
+                                      Deve ser menor que o keep-alive dos servidores
+            strategy (str, SelectionStrategy): Estratégia de seleção de servidores: 'p2c' (default),
+                                               'least_latency', 'round_robin', 'random' ou uma instância
+            retry (RetryPolicy, optional): Política de retentativa. Se None, faz uma única tentativa
+            hedge (HedgePolicy, optional): Política de hedging. Se None, não duplica requisições
+            cache (ResponseCache, optional): Cache local de respostas. Se None, não usa cache
+            rate_limit (RateLimiter, optional): Limites por host de destino e fila das requisições sem
+                                                saldo. Os limites por servidor vêm da chave 'rate_limit'
+                                                do servers.json; se algum servidor a tiver, um RateLimiter
+                                                é criado quando este parâmetro for None
+            passthrough (bool): Se True, usa o modo raw do api.php: o corpo, o status e os headers
+                                do destino são repassados sem conversão para JSON e o envelope é
+                                comprimido com gzip. Pode ser sobrescrito por servidor com a chave 'passthrough'
+            refresh_cookies (bool): Se True, quando um servidor responde com a página de desafio ele sai
+                                    do rodízio, seu cookie é renovado em segundo plano (sem navegador)
+                                    e a requisição é repetida em outro servidor
+            watch_config (bool): Se True, observa o arquivo de configuração (ou o snapshot) e aplica
+                                 as mudanças, como cookies renovados, sem interromper requisições em andamento
+            watch_interval (float): Intervalo entre as verificações do arquivo em segundos
+            snapshot_file (str, optional): Snapshot binário da configuração (veja shadowreq.config) a usar
+                                           no lugar do JSON. Se não existir, é criado a partir do JSON
+            metrics (bool, Metrics): Se True, registra métricas por servidor (veja stats()).
+                                     Aceita uma instância de Metrics compartilhada
+            hooks (dict, optional): Funções chamadas a cada envio a um servidor, como em add_hook:
+                                    {'request': [...], 'response': [...]}
         """
         # Configurar logging
         self.logger = ShadowLogger()
         self.logger.setup(enabled=enable_logging, log_file=log_file)
         
+        self.timeout = timeout or (5, 30)  # Default: 5s para conexão, 30s para leitura
+        self.strategy = get_strategy(strategy)
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.dns_cache = DnsCache(dns_ttl) if dns_ttl else None
+        self.mirror_cooldown = mirror_cooldown
+        self.prewarm_connections = prewarm
+        self.retry = retry
+        self.hedge = hedge
+        self.cache = cache
+        self.rate_limit = rate_limit
+        self.passthrough = passthrough
+        self.refresh_cookies = refresh_cookies
+        if isinstance(metrics, Metrics):
+            self.metrics = metrics
+        else:
+            self.metrics = Metrics() if metrics else None
+        self.hooks = {'request': [], 'response': []}
+        for event, functions in (hooks or {}).items():
+            for function in functions:
+                self.add_hook(event, function)
+        self._config_file = server_config_file
+        self._snapshot_file = snapshot_file
+        self._refreshing = set()  # Servidores fora do rodízio enquanto o cookie é renovado
+        self._refresh_lock = threading.Lock()
+        self._executor = None  # Threads das requisições duplicadas (hedging)
+
+        self._executor_lock = threading.Lock()
+        self._state = None
+        self._state_lock = threading.Lock()
+
         # Carregar configuração
         try:
-            with open(server_config_file, 'r') as file:
-                self.servers = json.load(file)
+            table = load_config(server_config_file, snapshot_file)
         except Exception as e:
-            self.logger.error(f"Erro ao carregar arquivo de configuração: {str(e)}")
+            self.logger.error("Erro ao carregar arquivo de configuração: %s", e)
             raise
-            
-        self.timeout = timeout or (5, 30)  # Default: 5s para conexão, 30s para leitura
-        self.server_names = list(self.servers.keys())
-        self._rotate_server()  # Seleciona um servidor aleatório inicial
 
-    def _rotate_server(self):
+        # Um pool de conexões por servidor, mantido entre recargas da configuração
+        self._apply_table(table)
+
+        self._watcher = None
+        if watch_config:
+            self._watcher = start_watcher(server_config_file, self._apply_table, snapshot_file, watch_interval)
+
+        self._warmer = None
+        if prewarm:
+            self._warmer = ConnectionWarmer(lambda idle: self.prewarm(idle=idle), prewarm_interval, self.dns_cache).start()
+
+    @property
+    def servers(self) -> Dict[str, Dict[str, Any]]:
+        """Configuração atual dos servidores (somente leitura)."""
+        return self._state.table.servers
+
+    @property
+    def server_names(self) -> List[str]:
+        """Nomes dos servidores da configuração atual."""
+        return self._state.table.names
+
+    @property
+    def sessions(self) -> Dict[str, requests.Session]:
+        """Sessão (pool de conexões) de cada servidor da configuração atual."""
+        return self._state.sessions
+
+    def _apply_table(self, table: ServerTable):
+        """
+        Troca a tabela de servidores em uso.
+        
+        As sessões de servidores sem mudança de URLs ou pool são reaproveitadas (com os
+        headers novos), para manter as conexões abertas. Requisições em andamento
+        continuam com a sessão que já tinham; sessões de servidores removidos são
+        descartadas sem fechar as conexões em uso.
+        
+        Args:
+            table (ServerTable): Nova tabela de servidores
+        """
+        with self._state_lock:
+            old = self._state
+            sessions = {}
+            mirrors = {}
+            for name, entry in table.entries.items():
+                previous = old.table.entries.get(name) if old else None
+                session = old.sessions.get(name) if old else None
+                if session is None or (previous.urls, previous.pool_size) != (entry.urls, entry.pool_size):
+                    session = self._create_session(name, entry)
+                elif (previous.headers, previous.keep_alive) != (entry.headers, entry.keep_alive):
+                    # Troca o dicionário inteiro para não alterar headers em uso por outras threads
+                    session.headers = self._session_headers(entry)
+                sessions[name] = session
+
+                mirror_set = old.mirrors.get(name) if old else None
+                if mirror_set is None or mirror_set.urls != entry.api_urls:
+                    mirror_set = MirrorSet(entry.api_urls, self.mirror_cooldown)
+                mirrors[name] = mirror_set
+
+            limits = {name: entry.rate_limit for name, entry in table.entries.items()}
+            if self.rate_limit is None and any(limit is not None for limit in limits.values()):
+                self.rate_limit = RateLimiter()
+            if self.rate_limit is not None:
+                self.rate_limit.configure_relays(limits)
+            self._state = _ClientState(table, sessions, mirrors)
+
+    def _session_headers(self, entry: ServerEntry) -> requests.structures.CaseInsensitiveDict:
+        """Monta os headers da sessão de um servidor."""
+        headers = requests.utils.default_headers()
+        headers.update(entry.headers)
+        if not (self.keep_alive if entry.keep_alive is None else entry.keep_alive):
+            headers['connection'] = 'close'
+        return headers
+
+    def _create_session(self, server_name: str, entry: ServerEntry) -> requests.Session:
+        """
+        Cria a sessão com pool de conexões persistentes de um servidor.
+        
+        Args:
+            server_name (str): Nome do servidor
+            entry (ServerEntry): Configuração compilada do servidor
+        
+        Returns:
+            requests.Session: Sessão configurada para o servidor
+        """
+        pool_size = self.pool_size if entry.pool_size is None else entry.pool_size
+
+        session = requests.Session()
+        if self.dns_cache is not None:
+            adapter = CachedDNSAdapter(self.dns_cache, pool_connections=len(entry.urls), pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=len(entry.urls), pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.verify = False
+        session.headers = self._session_headers(entry)
+
+        self.logger.debug("Pool do servidor %s: %s conexões, keep-alive=%s",
+                          server_name, pool_size, 'connection' not in session.headers)
+        return session
+
+    def close(self):
+        """Fecha os pools de conexões de todos os servidores."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self._warmer is not None:
+            self._warmer.stop()
+            self._warmer = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        for session in self.sessions.values():
+            session.close()
+        self.logger.debug("Pools de conexões fechados")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _rotate_server(self, exclude: Optional[Iterable[str]] = None, host: Optional[str] = None) -> str:
         """
-        Seleciona um servidor aleatório da lista de servidores disponíveis.
-        Atualiza o servidor atual e seus headers.
+        Seleciona um servidor da lista de servidores disponíveis usando a estratégia configurada.
+        
+        Não guarda estado na instância: o servidor escolhido é usado apenas pela chamada
+        que o pediu, o que permite compartilhar o ShadowReq entre threads.
+        
+        Com limites de taxa, a escolha é feita entre os servidores com saldo; se nenhum
+        tiver, a chamada espera na fila do RateLimiter.
+        
+        Args:
+            exclude (iterable, optional): Servidores a evitar nesta escolha
+            host (str, optional): Host de destino, para os limites por host
+        
+        Returns:
+            str: Nome do servidor escolhido
         """
-        server_name = random.choice(self.server_names)
-        self.current_server = self.servers[server_name]
-        self.base_url = self.current_server['urls'][0]
-        self.headers = self.current_server['headers']
-        self.logger.info(f"Usando servidor: {server_name}")
+        with self._refresh_lock:
+            exclude = set(exclude or ()) | self._refreshing
+        if self.rate_limit is None:
+            server_name = self.strategy.select(self.server_names, exclude=exclude)
+        else:
+            candidates = [name for name in self.server_names if name not in exclude] or self.server_names
+            server_name = self.rate_limit.acquire(self.strategy.available(candidates), host,
+                                                  self.strategy.select)
+        self.logger.sampled("Usando servidor: %s", server_name, relay=server_name)
+        return server_name
 
     def _make_request(self, method: str, url: str, **kwargs) -> requests.Response:
         """
         Faz a requisição através do servidor intermediário.
         
+        Com uma política de retentativa, cada nova tentativa usa um servidor diferente
+        dos que já falharam. Com uma política de hedging, a requisição é duplicada em
+        um segundo servidor se o primeiro demorar a responder.
+        
         Args:
             method (str): Método HTTP (GET, POST, PUT, DELETE)
             url (str): URL do destino
@@ -66,71 +324,705 @@ class ShadowReq:
             requests.exceptions.Timeout: Se a requisição exceder o timeout
             requests.exceptions.RequestException: Para outros erros de requisição
         """
-        # Rotacionar servidor antes de cada requisição
-        self._rotate_server()
+        # Pegar o timeout específico desta requisição ou usar o default da classe
+        timeout = kwargs.pop('timeout', self.timeout)
+
+        # Corpo repassado sem conversão (json, bytes, arquivo ou files); dicionários vão no envelope
+        body = build_body(kwargs.get('data'), kwargs.get('json'), kwargs.get('files'), kwargs.get('content_type'))
+
+        # Preparar payload conforme esperado pelo servidor PHP
+        payload = build_payload(method, url, data=kwargs.get('data') if body is None else None,
+                                params=kwargs.get('params'))
+
+        if kwargs.get('stream'):
+            payload['mode'] = 'stream'
+            response, _ = self._request(method, url, payload, timeout, stream=True, body=body)
+            return response
+
+        if self.cache is not None and self.cache.allows(method) and body is None:
+            key = self.cache.make_key(method, url, payload['params'])
+            return self.cache.fetch(key, lambda: self._request(method, url, payload, timeout))
+
+        response, _ = self._request(method, url, payload, timeout, body=body)
+        return response
+
+    def _request(self, method: str, url: str, payload: Dict[str, Any],
+                 timeout: Union[float, tuple], stream: bool = False,
+                 body: Optional[StreamingBody] = None) -> Tuple[requests.Response, bool]:
+        """
+        Envia o envelope aplicando as políticas de retentativa e hedging.
         
-        # Preparar dados para enviar ao servidor PHP
-        params = {}
+        Requisições com corpo não são duplicadas (hedging) e só são repetidas se o
+        corpo puder ser lido de novo (bytes e arquivos com seek).
         
-        # Se tiver dados no body da requisição
-        if 'data' in kwargs and kwargs['data']:
-            params.update(kwargs['data'])
+        Args:
+            method (str): Método HTTP
+            url (str): URL do destino
+            payload (dict): Envelope da requisição
+            timeout (float, tuple): Timeout da requisição
+            stream (bool): Se True, não lê o corpo da resposta (sem hedging)
+            body (StreamingBody, optional): Corpo repassado ao destino
         
-        # Se tiver query params
-        if 'params' in kwargs and kwargs['params']:
-            params.update(kwargs['params'])
+        Returns:
+            tuple: (resposta, ok). ok é False se o servidor não devolveu um envelope válido
+        """
+        replayable = body is None or body.replayable
+        retry = self.retry if self.retry and self.retry.allows(method) and replayable else None
+        hedge = self.hedge if self.hedge and self.hedge.allows(method) and not stream and body is None else None
+        attempts = retry.max_attempts if retry else 1
+        tried = set()
+        request_id = next(_request_ids)
+        host = urlsplit(url).hostname if self.rate_limit is not None else None
 
-        # Pegar o timeout específico desta requisição ou usar o default da classe
-        timeout = kwargs.pop('timeout', self.timeout)
+        self.logger.debug("Fazendo requisição %s para %s", method, url, request_id=request_id)
 
-        # Preparar payload conforme esperado pelo servidor PHP
-        payload = {
-            'url': url,
-            'method': method.upper(),
-            'params': params
-        }
+        attempt = 1
+        replays = 0
+        while True:
+            # Rotacionar servidor antes de cada tentativa
+            server_name = self._rotate_server(exclude=tried, host=host)
+            tried.add(server_name)
 
-        self.logger.debug(f"Fazendo requisição {method} para {url}")
+            if body is not None:
+                body.rewind()
+
+            try:
+                if hedge:
+                    response, ok = self._send_hedged(server_name, url, payload, timeout, tried, request_id)
+                else:
+                    response, ok = self._send(server_name, url, payload, timeout, stream=stream,
+                                              request_id=request_id, body=body)
+            except Exception as e:
+                if attempt < attempts and retry.should_retry_exception(e):
+                    self._wait_retry(retry, attempt, str(e))
+                    attempt += 1
+                    continue
+                raise
+
+            # A página de desafio não chega ao destino: repete em outro servidor sem gastar tentativas.
+            # Só repete se ainda houver um servidor não tentado fora da renovação de cookies; senão
+            # o _rotate_server voltaria a um servidor já tentado, sem backoff
+            if (not ok and self.refresh_cookies and replayable and replays < len(self.server_names)
+                    and self._untried_servers(tried) and is_challenge_page(response.content)):
+                self.logger.info("Repetindo requisição em outro servidor após desafio de %s", server_name)
+                replays += 1
+                continue
+
+            if attempt < attempts and (not ok or retry.should_retry_status(response.status_code)):
+                # Respostas montadas a partir do envelope não têm conexão a liberar
+                if response.raw is not None:
+                    response.close()
+                self._wait_retry(retry, attempt, f"status {response.status_code}")
+                attempt += 1
+                continue
+
+            return response, ok
+
+    def _untried_servers(self, tried: Set[str]) -> Set[str]:
+        """
+        Servidores que ainda não foram tentados e não estão renovando o cookie.
+        
+        Args:
+            tried (set): Servidores já tentados nesta requisição
+        
+        Returns:
+            set: Servidores disponíveis para repetir a requisição
+        """
+        with self._refresh_lock:
+            return set(self.server_names) - tried - self._refreshing
+
+    def _wait_retry(self, retry: RetryPolicy, attempt: int, reason: str):
+        """
+        Aguarda o backoff antes da próxima tentativa.
+        
+        Args:
+            retry (RetryPolicy): Política de retentativa
+            attempt (int): Número da tentativa que falhou
+            reason (str): Motivo da falha, para o log
+        """
+        delay = retry.backoff(attempt)
+        self.logger.warning("Tentativa %s falhou (%s); nova tentativa em %.2fs", attempt, reason, delay)
+        time.sleep(delay)
+
+    def _send(self, server_name: str, url: str, payload: Dict[str, Any],
+              timeout: Union[float, tuple], stream: bool = False,
+              request_id: Optional[int] = None,
+              body: Optional[StreamingBody] = None) -> Tuple[requests.Response, bool]:
+        """
+        Envia o envelope a um servidor específico.
+        
+        Args:
+            server_name (str): Nome do servidor
+            url (str): URL do destino
+            payload (dict): Envelope da requisição
+            timeout (float, tuple): Timeout da requisição
+            stream (bool): Se True, o corpo é lido sob demanda da conexão com o servidor
+            request_id (int, optional): Identificador da requisição nos logs
+            body (StreamingBody, optional): Corpo repassado ao destino, enviado em partes depois do envelope
+        
+        Returns:
+            tuple: (resposta, ok). ok é False se o servidor não devolveu um envelope válido
         
+        Raises:
+            requests.exceptions.RequestException: Para erros de requisição
+        """
+        state = self._state
+        entry = state.table.entries.get(server_name)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"Servidor {server_name} removido da configuração")
+        passthrough = stream or (self.passthrough if entry.passthrough is None else entry.passthrough)
+        if passthrough and 'mode' not in payload:
+            payload = dict(payload, mode='raw')
+        if body is not None:
+            data, headers = encode_stream_payload(payload, body)
+        else:
+            data, headers = encode_payload(payload, compress=passthrough)
+        if self.hooks['request']:
+            self._run_hooks('request', server_name, payload)
+
+        started = time.monotonic()
+        response = None
         try:
-            # Fazer requisição para o servidor PHP
-            response = requests.post(
-                f"{self.base_url}/api.php",
-                headers=self.headers,
-                json=payload,
-                verify=False,
-                timeout=timeout
-            )
+            # Fazer requisição para o servidor PHP reaproveitando o pool do servidor
+            response = self._post(state, server_name, data=data, headers=headers, timeout=timeout, stream=stream)
 
             # Extrair a resposta real do wrapper do servidor
             if response.status_code == 200:
                 try:
-                    result = response.json()
-                    # Criar um novo objeto Response com os dados do servidor
-                    new_response = requests.Response()
-                    new_response.status_code = result.get('status', 500)
-                    if 'response' in result:
-                        new_response._content = json.dumps(result['response']).encode('utf-8')
-                    self.logger.info(f"Requisição completada: Status {new_response.status_code}")
-                    return new_response
+                    if passthrough:
+                        new_response = build_passthrough_response(response, url, stream=stream)
+                        if new_response is None:
+                            raise ValueError(f"Resposta sem X-Shadow-Status: {response.text[:200]}")
+                    else:
+                        # Criar um novo objeto Response com os dados do servidor
+                        new_response = build_response(response.json(), url)
+                    elapsed = time.monotonic() - started
+                    self.strategy.record_success(server_name, elapsed)
+                    if self.hedge:
+                        self.hedge.record(elapsed)
+                    self.logger.sampled("Requisição completada: Status %s", new_response.status_code,
+                                        request_id=request_id, relay=server_name,
+                                        latency=round(elapsed, 4), status=new_response.status_code)
+                    self._record(server_name, new_response, elapsed, True, timing=new_response.timing)
+                    if self.rate_limit is not None and new_response.status_code in (429, 503):
+                        self.rate_limit.feedback(server_name, urlsplit(url).hostname, response.status_code,
+                                                 new_response.status_code, new_response.headers.get('retry-after'))
+                    return new_response, True
                 except Exception as e:
-                    self.logger.error(f"Erro ao processar resposta: {str(e)}")
-                    return response
+                    elapsed = time.monotonic() - started
+                    self.strategy.record_failure(server_name, elapsed)
+                    challenge = is_challenge_page(response.content)
+                    if challenge:
+                        self.logger.error("Servidor %s retornou a página de desafio", server_name,
+                                          request_id=request_id, relay=server_name)
+                        self._schedule_cookie_refresh(server_name)
+                    else:
+                        self.logger.error("Erro ao processar resposta: %s", e,
+                                          request_id=request_id, relay=server_name)
+                    self._record(server_name, response, elapsed, False, challenge=challenge)
+                    return response, False
             
-            self.logger.warning(f"Servidor retornou status {response.status_code}")
-            return response
+            elapsed = time.monotonic() - started
+            self.strategy.record_failure(server_name, elapsed)
+            self.logger.warning("Servidor retornou status %s", response.status_code,
+                                request_id=request_id, relay=server_name, status=response.status_code)
+            self._record(server_name, response, elapsed, False)
+            if self.rate_limit is not None:
+                self.rate_limit.feedback(server_name, urlsplit(url).hostname, response.status_code,
+                                         retry_after=response.headers.get('retry-after'))
+            return response, False
             
         except Exception as e:
-            self.logger.error(f"Erro na requisição: {str(e)}")
+            elapsed = time.monotonic() - started
+            if response is None:
+                self.strategy.record_failure(server_name, elapsed)
+                self.logger.error("Erro na requisição: %s", e, request_id=request_id, relay=server_name,
+                                  latency=round(elapsed, 4))
+                self._record(server_name, None, elapsed, False,
+                             timeout=isinstance(e, requests.exceptions.Timeout))
             raise
 
-    def get(self, url: str, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+    def _post(self, state: _ClientState, server_name: str, **kwargs) -> requests.Response:
+        """
+        Faz o POST ao api.php do servidor em um dos seus espelhos.
+        
+        Os espelhos são usados em rodízio; se a conexão com um deles falhar antes do
+        envio (DNS, conexão recusada ou timeout de conexão), ele sai do rodízio e a
+        requisição vai para o próximo.
+        
+        Args:
+            state (_ClientState): Estado em uso pela requisição
+            server_name (str): Nome do servidor
+            **kwargs: Argumentos de requests.Session.post
+        
+        Returns:
+            requests.Response: Resposta do servidor
+        
+        Raises:
+            requests.exceptions.RequestException: Se todos os espelhos falharem ou para outros erros
+        """
+        mirrors = state.mirrors[server_name]
+        candidates = mirrors.candidates()
+        for index, api_url in enumerate(candidates):
+            try:
+                response = state.sessions[server_name].post(api_url, **kwargs)
+            except Exception as e:
+                if not is_connect_error(e):
+                    raise
+                mirrors.failed(api_url)
+                if index == len(candidates) - 1:
+                    raise
+                self.logger.warning("Espelho %s do servidor %s inacessível (%s); usando %s",
+                                    api_url, server_name, e, candidates[index + 1], relay=server_name)
+                continue
+            mirrors.succeeded(api_url)
+            return response
+
+    def prewarm(self, connections: Optional[int] = None, idle: float = 0.0) -> int:
+        """
+        Abre conexões com as URLs dos servidores, para que as próximas requisições não
+        paguem DNS, TCP e TLS.
+        
+        Cada conexão é aberta com um GET ao api.php, que responde sem acessar nenhum
+        destino, e volta ao pool do servidor. Servidores renovando o cookie e sem saldo
+        no limite de taxa (veja RateLimiter.has_capacity) são ignorados; o aquecimento
+        não consome o saldo das requisições.
+        
+        Args:
+            connections (int, optional): Conexões por URL (limitado ao pool do servidor).
+                                         Se None, usa o valor de prewarm do construtor (mínimo 1)
+            idle (float): Só aquece as URLs sem uso há pelo menos este número de segundos
+        
+        Returns:
+            int: Número de conexões abertas com sucesso
+        """
+        state = self._state
+        with self._refresh_lock:
+            refreshing = set(self._refreshing)
+        count = connections or self.prewarm_connections or 1
+
+        jobs = []
+        for name, entry in state.table.entries.items():
+            if name in refreshing:
+                continue
+            pool_size = self.pool_size if entry.pool_size is None else entry.pool_size
+            if self.rate_limit is not None and not self.rate_limit.has_capacity(name):
+                continue
+            for api_url in state.mirrors[name].idle(idle):
+                jobs.extend([(name, api_url)] * max(1, min(count, pool_size)))
+        if not jobs:
+            return 0
+
+        def warm(job):
+            name, api_url = job
+            try:
+                # Reaproveita uma conexão livre do pool ou abre uma nova
+                response = state.sessions[name].get(api_url, timeout=self.timeout)
+                response.content
+            except Exception as e:
+                if is_connect_error(e):
+                    state.mirrors[name].failed(api_url)
+                self.logger.debug("Erro ao pré-aquecer %s: %s", api_url, e, relay=name)
+                return False
+            state.mirrors[name].succeeded(api_url)
+            return True
+
+        # Requisições simultâneas: cada uma ocupa uma conexão diferente do pool
+        with ThreadPoolExecutor(max_workers=min(32, len(jobs)), thread_name_prefix='shadowreq-prewarm') as executor:
+            return sum(executor.map(warm, jobs))
+
+    def _record(self, server_name: str, response: Optional[requests.Response], elapsed: float, ok: bool,
+                timeout: bool = False, challenge: bool = False, timing: Optional[Dict[str, float]] = None):
+        """
+        Registra as métricas de um envio e chama os hooks de resposta.
+        
+        Args:
+            server_name (str): Nome do servidor
+            response (requests.Response, optional): Resposta, ou None se houve exceção
+            elapsed (float): Duração do envio em segundos
+            ok (bool): Se o servidor devolveu um envelope válido
+            timeout (bool): Se o envio excedeu o timeout
+            challenge (bool): Se o servidor respondeu com a página de desafio
+            timing (dict, optional): Tempos do curl enviados pelo servidor
+        """
+        if self.metrics is not None:
+            self.metrics.record(server_name, elapsed, error=not ok, timeout=timeout,
+                                challenge=challenge, timing=timing)
+        if self.hooks['response']:
+            self._run_hooks('response', server_name, response, elapsed, ok)
+
+    def add_hook(self, event: str, function: Callable):
+        """
+        Registra uma função chamada a cada envio a um servidor.
+        
+        Eventos:
+            'request': function(relay, payload), antes do envio
+            'response': function(relay, response, elapsed, ok), depois do envio. response é
+                        None se houve exceção; ok é False se o servidor não devolveu um envelope válido
+        
+        Erros nas funções são registrados no log e não afetam a requisição.
+        
+        Args:
+            event (str): 'request' ou 'response'
+            function (callable): Função a chamar
+        
+        Raises:
+            ValueError: Se o evento não existir
+        """
+        if event not in self.hooks:
+            raise ValueError(f"Evento de hook desconhecido: {event}")
+        self.hooks[event].append(function)
+
+    def _run_hooks(self, event: str, *args):
+        for function in self.hooks[event]:
+            try:
+                function(*args)
+            except Exception as e:
+                self.logger.error("Erro no hook %s: %s", event, e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna as métricas e o estado de cada servidor.
+        
+        Returns:
+            dict: {'relays': {nome: {...}}} com os contadores e histogramas de Metrics.snapshot()
+                  e a latência média, taxa de erros e estado do circuit breaker da estratégia.
+                  Com limites de taxa, 'rate_limit' traz RateLimiter.snapshot(); com cache de DNS,
+                  'dns' traz DnsCache.snapshot(). Servidores com vários espelhos trazem o estado
+                  de cada URL em 'mirrors'
+        """
+        relays = {name: {} for name in self.server_names}
+        for name, values in (self.metrics.snapshot() if self.metrics is not None else {}).items():
+            relays.setdefault(name, {}).update(values)
+        for name, values in self.strategy.snapshot().items():
+            relay = relays.setdefault(name, {})
+            relay['state'] = values['state']
+            relay['ewma_latency'] = values['latency']
+            relay['error_rate'] = values['error_rate']
+        state = self._state
+        for name, mirror_set in state.mirrors.items():
+            if len(mirror_set.urls) > 1:
+                relays.setdefault(name, {})['mirrors'] = mirror_set.snapshot()
+        stats = {'relays': relays}
+        if self.dns_cache is not None:
+            stats['dns'] = self.dns_cache.snapshot()
+        if self.rate_limit is not None:
+            stats['rate_limit'] = self.rate_limit.snapshot()
+        return stats
+
+    def prometheus(self) -> str:
+        """
+        Retorna as métricas no formato texto do Prometheus.
+        
+        Returns:
+            str: Métricas por servidor
+        """
+        return self.metrics.to_prometheus() if self.metrics is not None else ''
+
+    def serve_metrics(self, port: int = 9100, host: str = '127.0.0.1') -> MetricsServer:
+        """
+        Inicia um servidor HTTP de métricas em uma thread de fundo.
+        
+        Serve /metrics (Prometheus) e /stats (JSON de stats()).
+        
+        Args:
+            port (int): Porta de escuta (0 escolhe uma porta livre)
+            host (str): Endereço de escuta
+        
+        Returns:
+            MetricsServer: Servidor iniciado; chame stop() para encerrar
+        """
+        return MetricsServer(self.stats, self.prometheus, host=host, port=port).start()
+
+    def _send_hedged(self, server_name: str, url: str, payload: Dict[str, Any],
+                     timeout: Union[float, tuple], tried: set,
+                     request_id: Optional[int] = None) -> Tuple[requests.Response, bool]:
+        """
+        Envia o envelope ao servidor e, se ele demorar, também a um segundo servidor.
+        
+        Retorna a primeira resposta válida; se as duas falharem, retorna o resultado
+        da última a terminar.
+        
+        Args:
+            server_name (str): Nome do primeiro servidor
+            url (str): URL do destino
+            payload (dict): Envelope da requisição
+            timeout (float, tuple): Timeout da requisição
+            tried (set): Servidores já usados nesta requisição; recebe o segundo servidor
+            request_id (int, optional): Identificador da requisição nos logs
+        
+        Returns:
+            tuple: (resposta, ok)
+        
+        Raises:
+            requests.exceptions.RequestException: Se as duas requisições falharem com erro
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size * len(self.servers))
+
+        pending = {self._executor.submit(self._send, server_name, url, payload, timeout, False, request_id)}
+        done, _ = wait(pending, timeout=self.hedge.delay())
+
+        if not done:
+            if self.rate_limit is None:
+                second = self.strategy.select(self.server_names, exclude=tried)
+            else:
+                # Sem saldo, não duplica: a duplicata não pode atrasar outras requisições
+                candidates = [name for name in self.server_names if name not in tried]
+                second = self.rate_limit.try_acquire(self.strategy.available(candidates), urlsplit(url).hostname,
+                                                     self.strategy.select) if candidates else None
+            if second is not None and second not in tried:
+                tried.add(second)
+                self.logger.info("Servidor %s demorou; duplicando requisição em %s", server_name, second,
+                                 request_id=request_id, relay=second)
+                pending.add(self._executor.submit(self._send, second, url, payload, timeout, False, request_id))
+
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result()[1]:
+                    return future.result()
+            if not pending:
+                return done.pop().result()
+
+    def _schedule_cookie_refresh(self, server_name: str):
+        """
+        Tira o servidor do rodízio e renova seu cookie em segundo plano.
+        
+        Só há uma renovação em andamento por servidor.
+        
+        Args:
+            server_name (str): Nome do servidor que respondeu com a página de desafio
+        """
+        if not self.refresh_cookies:
+            return
+
+        with self._refresh_lock:
+            if server_name in self._refreshing:
+                return
+            self._refreshing.add(server_name)
+
+        threading.Thread(target=self._refresh_cookie, args=(server_name,),
+                         name=f"shadowreq-cookie-{server_name}", daemon=True).start()
+
+    def _refresh_cookie(self, server_name: str):
+        """
+        Renova o cookie de um servidor e o devolve ao rodízio.
+        
+        Args:
+            server_name (str): Nome do servidor
+        """
+        try:
+            # Sem enable_logging: mantém a configuração do logger, que é compartilhado com este cliente
+            updater = CookieUpdater(self._config_file, browser_fallback=False,
+                                    snapshot_file=self._snapshot_file)
+            # Cópia: a configuração da tabela em uso não é alterada
+            headers = updater.refresh_server(server_name, copy.deepcopy(self.servers[server_name]))
+            session = self.sessions.get(server_name)
+            if headers and session is not None:
+                # Troca o dicionário inteiro para não alterar headers em uso por outras threads
+                new_headers = session.headers.copy()
+                new_headers.update(headers)
+                session.headers = new_headers
+                self.logger.info("Cookie do servidor %s renovado", server_name)
+            else:
+                self.logger.warning("Não foi possível renovar o cookie do servidor %s", server_name)
+                self.strategy.record_failure(server_name)
+        except Exception as e:
+            self.logger.error("Erro ao renovar cookie do servidor %s: %s", server_name, e)
+            self.strategy.record_failure(server_name)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(server_name)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Faz uma requisição com qualquer método através do servidor.
+        
+        Args:
+            method (str): Método HTTP (GET, POST, PUT, DELETE)
+            url (str): URL do destino
+            **kwargs: Argumentos adicionais para a requisição (data, json, files, content_type,
+                      params, timeout, stream)
+        
+        Returns:
+            requests.Response: Objeto de resposta
+        """
+        return self._make_request(method.upper(), url, **kwargs)
+
+    def _run_request(self, index: int, spec: Union[str, Dict[str, Any]]) -> RequestResult:
+        """
+        Executa uma requisição de map()/imap_unordered(), capturando o erro.
+        
+        Args:
+            index (int): Posição da requisição na entrada
+            spec (str, dict): URL ou dicionário da requisição
+        
+        Returns:
+            RequestResult: Resultado da requisição
+        """
+        try:
+            normalized = normalize_request(spec)
+            response = self.request(normalized['method'], normalized['url'],
+                                    data=normalized['data'], params=normalized['params'])
+            return RequestResult(index, spec, response, None)
+        except Exception as e:
+            return RequestResult(index, spec, None, e)
+
+    def imap_unordered(self, requests_iter: Iterable[Union[str, Dict[str, Any]]],
+                       workers: int = 10) -> Iterator[RequestResult]:
+        """
+        Faz as requisições em paralelo e retorna os resultados à medida que terminam.
+        
+        A entrada é consumida aos poucos (no máximo 2 * workers requisições pendentes),
+        então pode ser um gerador arbitrariamente grande. Erros de uma requisição
+        aparecem no resultado dela, sem interromper as demais.
+        
+        Args:
+            requests_iter (iterable): URLs (requisições GET) ou dicionários com as chaves
+                                      'url' e, opcionalmente, 'method', 'data' e 'params'
+            workers (int): Número de threads
+        
+        Yields:
+            RequestResult: Resultado de cada requisição, na ordem em que terminam
+        """
+        iterator = enumerate(requests_iter)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shadowreq') as executor:
+            pending = set()
+            exhausted = False
+
+            while True:
+                while not exhausted and len(pending) < 2 * workers:
+                    try:
+                        index, spec = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(self._run_request, index, spec))
+
+                if not pending:
+                    return
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def map(self, requests_iter: Iterable[Union[str, Dict[str, Any]]],
+            workers: int = 10) -> Iterator[RequestResult]:
+        """
+        Faz as requisições em paralelo e retorna os resultados na ordem da entrada.
+        
+        Args:
+            requests_iter (iterable): URLs (requisições GET) ou dicionários com as chaves
+                                      'url' e, opcionalmente, 'method', 'data' e 'params'
+            workers (int): Número de threads
+        
+        Yields:
+            RequestResult: Resultado de cada requisição, na ordem da entrada
+        """
+        buffered = {}
+        next_index = 0
+        for result in self.imap_unordered(requests_iter, workers=workers):
+            buffered[result.index] = result
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+
+    def batch(self, requests_list: List[Union[str, Dict[str, Any]]],
+              timeout: Optional[Union[float, tuple]] = None,
+              chunk_size: int = 20) -> List[requests.Response]:
+        """
+        Faz várias requisições através do servidor usando o modo lote do api.php.
+
+        As requisições são divididas em blocos de até chunk_size itens; cada bloco
+        é enviado em uma única chamada ao servidor, que as executa em paralelo.
+
+        Args:
+            requests_list (list): URLs (requisições GET) ou dicionários com as chaves
+                                  'url' e, opcionalmente, 'method', 'data' e 'params'
+            timeout (float, tuple, optional): Timeout específico para cada bloco
+            chunk_size (int): Número máximo de requisições por chamada ao servidor
+
+        Returns:
+            list: Um requests.Response por requisição, na mesma ordem. Requisições que
+                  falharam recebem status 502 e a descrição do erro em 'reason'
+        """
+        specs = [normalize_request(spec) for spec in requests_list]
+        timeout = timeout or self.timeout
+        responses = []
+
+        for start in range(0, len(specs), chunk_size):
+            chunk = specs[start:start + chunk_size]
+            responses.extend(self._send_batch(chunk, timeout))
+
+        return responses
+
+    def _send_batch(self, chunk: List[Dict[str, Any]], timeout: Union[float, tuple]) -> List[requests.Response]:
+        """
+        Envia um bloco de requisições em uma única chamada ao servidor.
+
+        Args:
+            chunk (list): Requisições normalizadas
+            timeout (float, tuple): Timeout da chamada
+
+        Returns:
+            list: Um requests.Response por requisição do bloco
+        """
+        server_name = self._rotate_server()
+        state = self._state
+
+        payload = {
+            'batch': [build_payload(spec['method'], spec['url'], data=spec['data'], params=spec['params'])
+                      for spec in chunk]
+        }
+
+        self.logger.debug("Enviando lote com %s requisições", len(chunk))
+
+        response = None
+        started = time.monotonic()
+        try:
+            response = self._post(state, server_name, json=payload, timeout=timeout)
+
+            if response.status_code != 200:
+                self.logger.warning("Servidor retornou status %s", response.status_code)
+                error = f"Servidor retornou status {response.status_code}"
+            else:
+                result = response.json()
+                items = result.get('batch')
+                if isinstance(items, list) and len(items) == len(chunk):
+                    elapsed = time.monotonic() - started
+                    self.strategy.record_success(server_name, elapsed)
+                    self._record(server_name, response, elapsed, True)
+                    self.logger.info("Lote completado: %s requisições", len(items))
+                    return [build_batch_response(item, spec['url']) for item, spec in zip(items, chunk)]
+                error = result.get('error', 'Resposta de lote inválida')
+                self.logger.error("Erro ao processar lote: %s", error)
+
+        except Exception as e:
+            self.logger.error("Erro na requisição do lote: %s", e)
+            error = str(e)
+            timeout_error = isinstance(e, requests.exceptions.Timeout)
+            challenge = response is not None and is_challenge_page(response.content)
+            if challenge:
+                self._schedule_cookie_refresh(server_name)
+        else:
+            timeout_error = challenge = False
+
+        elapsed = time.monotonic() - started
+        self.strategy.record_failure(server_name, elapsed)
+        self._record(server_name, response, elapsed, False, timeout=timeout_error, challenge=challenge)
+        return [build_error_response(error, spec['url']) for spec in chunk]
+
+    def get(self, url: str, timeout: Optional[Union[float, tuple]] = None, stream: bool = False, **kwargs) -> requests.Response:
         """
         Faz uma requisição GET através do servidor.
         
         Args:
             url (str): URL do destino
             timeout (float, tuple, optional): Timeout específico para esta requisição
+            stream (bool): Se True, o corpo não é carregado na memória; use iter_content()
+                           ou raw para lê-lo em partes e feche a resposta ao terminar
             **kwargs: Argumentos adicionais para a requisição
         
         Returns:
@@ -138,41 +1030,107 @@ class ShadowReq:
         """
         if timeout:
             kwargs['timeout'] = timeout
-        return self._make_request('GET', url, **kwargs)
+        return self._make_request('GET', url, stream=stream, **kwargs)
 
-    def post(self, url: str, data: Optional[Dict[str, Any]] = None, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+    def download(self, url: str, path: str, chunk_size: int = 64 * 1024,
+                 timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+        """
+        Baixa o conteúdo da URL para um arquivo usando memória constante.
+        
+        O conteúdo é gravado em 'path.part' e renomeado para path ao terminar.
+        
+        Args:
+            url (str): URL do destino
+            path (str): Caminho do arquivo de destino
+            chunk_size (int): Tamanho das partes lidas em bytes
+            timeout (float, tuple, optional): Timeout específico para esta requisição
+            **kwargs: Argumentos adicionais para a requisição (params)
+        
+        Returns:
+            requests.Response: Resposta do destino (com o corpo já consumido)
+        
+        Raises:
+            requests.exceptions.HTTPError: Se o destino responder com status de erro (4xx/5xx)
+            requests.exceptions.RequestException: Se o servidor não devolver a resposta do destino
+                                                  (página de desafio, erro do servidor) ou para outros erros
+        """
+        payload = build_payload('GET', url, params=kwargs.get('params'))
+        payload['mode'] = 'stream'
+        part_path = path + '.part'
+        response, ok = self._request('GET', url, payload, timeout or self.timeout, stream=True)
+        try:
+            try:
+                if not ok:
+                    raise requests.exceptions.RequestException(
+                        f"Servidor intermediário não devolveu a resposta do destino (status {response.status_code})",
+                        response=response)
+                response.raise_for_status()
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+            finally:
+                # Respostas montadas a partir do envelope não têm conexão a liberar
+                if response.raw is not None:
+                    response.close()
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        os.replace(part_path, path)
+        self.logger.info("Download concluído: %s -> %s", url, path)
+        return response
+
+    def post(self, url: str, data: Any = None, timeout: Optional[Union[float, tuple]] = None,
+             json: Any = None, files: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
         """
         Faz uma requisição POST através do servidor.
         
+        Dicionários em data são enviados como formulário. bytes, str, arquivos e
+        iteráveis de bytes em data, json e files são repassados ao destino com o
+        Content-Type original, lidos e enviados em partes.
+        
         Args:
             url (str): URL do destino
-            data (dict, optional): Dados a serem enviados no corpo da requisição
+            data (dict, bytes, str, file, iterable, optional): Dados a serem enviados no corpo da requisição
             timeout (float, tuple, optional): Timeout específico para esta requisição
-            **kwargs: Argumentos adicionais para a requisição
+            json (optional): Objeto enviado como JSON (application/json)
+            files (dict, optional): Arquivos enviados como multipart/form-data, como no requests:
+                                    {'campo': arquivo} ou {'campo': (nome, arquivo, content_type)}.
+                                    Dicionários em data viram campos do formulário
+            **kwargs: Argumentos adicionais para a requisição (content_type, params, stream)
         
         Returns:
             requests.Response: Objeto de resposta
         """
         if timeout:
             kwargs['timeout'] = timeout
-        return self._make_request('POST', url, data=data, **kwargs)
+        return self._make_request('POST', url, data=data, json=json, files=files, **kwargs)
 
-    def put(self, url: str, data: Optional[Dict[str, Any]] = None, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
+    def put(self, url: str, data: Any = None, timeout: Optional[Union[float, tuple]] = None,
+             json: Any = None, files: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
         """
         Faz uma requisição PUT através do servidor.
         
+        Dicionários em data são enviados como formulário. bytes, str, arquivos e
+        iteráveis de bytes em data, json e files são repassados ao destino com o
+        Content-Type original, lidos e enviados em partes.
+        
         Args:
             url (str): URL do destino
-            data (dict, optional): Dados a serem enviados no corpo da requisição
+            data (dict, bytes, str, file, iterable, optional): Dados a serem enviados no corpo da requisição
             timeout (float, tuple, optional): Timeout específico para esta requisição
-            **kwargs: Argumentos adicionais para a requisição
+            json (optional): Objeto enviado como JSON (application/json)
+            files (dict, optional): Arquivos enviados como multipart/form-data, como no requests:
+                                    {'campo': arquivo} ou {'campo': (nome, arquivo, content_type)}.
+                                    Dicionários em data viram campos do formulário
+            **kwargs: Argumentos adicionais para a requisição (content_type, params, stream)
         
         Returns:
             requests.Response: Objeto de resposta
         """
         if timeout:
             kwargs['timeout'] = timeout
-        return self._make_request('PUT', url, data=data, **kwargs)
+        return self._make_request('PUT', url, data=data, json=json, files=files, **kwargs)
 
     def delete(self, url: str, timeout: Optional[Union[float, tuple]] = None, **kwargs) -> requests.Response:
         """
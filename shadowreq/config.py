@@ -0,0 +1,305 @@
+"""
+Carregamento e recarga da configuração dos servidores.
+
+O servers.json é compilado em uma ServerTable imutável (URLs da API e headers
+já prontos). O ConfigWatcher observa o arquivo em uma thread de fundo e entrega
+uma nova tabela quando ele muda, sem custo no caminho das requisições.
+
+Para muitos processos lendo a mesma configuração, a tabela compilada pode ser
+gravada em um snapshot binário (marshal) lido com mmap: cada processo só
+verifica o stat do arquivo e, quando ele muda, carrega o snapshot sem
+interpretar o JSON de novo.
+"""
+
+import json
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Optional, Dict, Any, Callable, NamedTuple, Tuple
+from .logger import ShadowLogger
+from .ratelimit import parse_limit
+
+# Cabeçalho do snapshot: assinatura, versão do formato, geração e tamanho dos dados
+SNAPSHOT_MAGIC = b'SHRQSNAP'
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct('<8sHQI')
+
+
+class ServerEntry(NamedTuple):
+    """Configuração compilada de um servidor."""
+    name: str
+    urls: Tuple[str, ...]  # URLs base do servidor
+    api_url: str  # URL do api.php da primeira URL
+    api_urls: Tuple[str, ...]  # URL do api.php de cada espelho, na ordem de 'urls'
+    headers: Dict[str, str]  # Headers enviados ao servidor (somente leitura)
+    pool_size: Optional[int]  # None usa o valor do cliente
+    keep_alive: Optional[bool]  # None usa o valor do cliente
+    passthrough: Optional[bool]  # None usa o valor do cliente
+    rate_limit: Any  # Requisições por segundo ou {'rate': ..., 'burst': ...}; None sem limite
+    config: Dict[str, Any]  # Configuração original do servidor (somente leitura)
+
+
+class ServerTable:
+    """Tabela imutável de servidores; substituída inteira a cada recarga."""
+
+    def __init__(self, entries: Dict[str, ServerEntry], generation: int = 0):
+        self.entries = entries
+        self.names = list(entries)
+        self.servers = {name: entry.config for name, entry in entries.items()}
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def api_url(base_url: str) -> str:
+    """Monta a URL do api.php a partir da URL base do servidor."""
+    return base_url if base_url.endswith('api.php') else f"{base_url.rstrip('/')}/api.php"
+
+
+def compile_config(config: Dict[str, Any], generation: int = 0) -> ServerTable:
+    """
+    Compila o conteúdo do servers.json em uma ServerTable.
+
+    Args:
+        config (dict): Configuração dos servidores
+        generation (int): Número da versão da configuração
+
+    Returns:
+        ServerTable: Tabela compilada
+
+    Raises:
+        ValueError: Se algum servidor não tiver URLs ou tiver um 'rate_limit' inválido
+    """
+    entries = {}
+    for name, server in config.items():
+        if not isinstance(server, dict) or not server.get('urls'):
+            raise ValueError(f"Servidor {name} sem 'urls' na configuração")
+        urls = tuple(server['urls'])
+        rate_limit = server.get('rate_limit')
+        if rate_limit is not None:
+            parse_limit(rate_limit)
+        entries[name] = ServerEntry(
+            name=name,
+            urls=urls,
+            api_url=api_url(urls[0]),
+            api_urls=tuple(api_url(url) for url in urls),
+            headers=dict(server.get('headers') or {}),
+            pool_size=server.get('pool_size'),
+            keep_alive=server.get('keep_alive'),
+            passthrough=server.get('passthrough'),
+            rate_limit=rate_limit,
+            config=server,
+        )
+    return ServerTable(entries, generation)
+
+
+def load_table(path: str) -> ServerTable:
+    """
+    Lê e compila o servers.json.
+
+    Args:
+        path (str): Caminho do arquivo de configuração
+
+    Returns:
+        ServerTable: Tabela compilada; a geração é o mtime do arquivo em nanossegundos
+    """
+    with open(path, 'r') as f:
+        generation = os.fstat(f.fileno()).st_mtime_ns
+        config = json.load(f)
+    return compile_config(config, generation)
+
+
+def write_snapshot(table: ServerTable, path: str):
+    """
+    Grava a tabela compilada em um snapshot binário de forma atômica.
+
+    Args:
+        table (ServerTable): Tabela a gravar
+        path (str): Caminho do snapshot
+    """
+    data = marshal.dumps({
+        name: (entry.urls, entry.api_url, entry.api_urls, entry.headers, entry.pool_size,
+               entry.keep_alive, entry.passthrough, entry.rate_limit, entry.config)
+        for name, entry in table.entries.items()
+    })
+    header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, table.generation, len(data))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_snapshot(path: str) -> ServerTable:
+    """
+    Carrega um snapshot gravado por write_snapshot.
+
+    Args:
+        path (str): Caminho do snapshot
+
+    Returns:
+        ServerTable: Tabela compilada
+
+    Raises:
+        ValueError: Se o arquivo não for um snapshot válido
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < _SNAPSHOT_HEADER.size:
+                raise ValueError(f"Snapshot inválido: {path}")
+            magic, version, generation, length = _SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"Snapshot inválido ou de outra versão: {path}")
+            if len(mm) < _SNAPSHOT_HEADER.size + length:
+                raise ValueError(f"Snapshot incompleto: {path}")
+            raw = marshal.loads(mm[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + length])
+
+    entries = {name: ServerEntry(name, *fields) for name, fields in raw.items()}
+    return ServerTable(entries, generation)
+
+
+def build_snapshot(config_file: str, snapshot_file: str) -> ServerTable:
+    """
+    Compila o servers.json e grava o snapshot correspondente.
+
+    Args:
+        config_file (str): Caminho do servers.json
+        snapshot_file (str): Caminho do snapshot
+
+    Returns:
+        ServerTable: Tabela gravada
+    """
+    table = load_table(config_file)
+    write_snapshot(table, snapshot_file)
+    return table
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identifica a versão do arquivo por inode, mtime e tamanho; None se não existir."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class ConfigWatcher:
+    def __init__(self, path: str, on_change: Callable[[ServerTable], None],
+                 loader: Callable[[str], ServerTable] = load_table,
+                 interval: float = 1.0):
+        """
+        Inicializa o observador do arquivo de configuração.
+
+        Uma thread de fundo verifica o stat do arquivo a cada intervalo e, se ele
+        mudou (o CookieUpdater troca o arquivo com rename), carrega a nova tabela e
+        chama on_change. Se o arquivo estiver inválido, a tabela atual é mantida e
+        a leitura é tentada de novo no próximo intervalo.
+
+        Args:
+            path (str): Arquivo observado (servers.json ou snapshot)
+            on_change (callable): Função chamada com a nova ServerTable
+            loader (callable): Função que carrega a tabela do arquivo
+            interval (float): Intervalo entre verificações em segundos
+        """
+        self.path = path
+        self.on_change = on_change
+        self.loader = loader
+        self.interval = interval
+        self.logger = ShadowLogger()
+        self._version = _file_version(path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'ConfigWatcher':
+        """Inicia a thread de verificação."""
+        self._thread = threading.Thread(target=self._run, name='shadowreq-config-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Encerra a thread de verificação."""
+        self._stop.set()
+
+    def check(self) -> bool:
+        """
+        Verifica o arquivo uma vez e aplica a nova tabela se ele mudou.
+
+        Returns:
+            bool: True se uma nova tabela foi aplicada
+        """
+        version = _file_version(self.path)
+        if version is None or version == self._version:
+            return False
+
+        try:
+            table = self.loader(self.path)
+        except Exception as e:
+            self.logger.warning("Erro ao recarregar %s: %s", self.path, e)
+            return False
+
+        self._version = version
+        self.on_change(table)
+        self.logger.info("Configuração recarregada de %s: %s servidores", self.path, len(table))
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error("Erro ao aplicar configuração recarregada: %s", e)
+
+
+def load_config(config_file: str, snapshot_file: Optional[str] = None) -> ServerTable:
+    """
+    Carrega a configuração usada pelos clientes (ShadowReq e AsyncShadowReq).
+
+    Args:
+        config_file (str): Caminho do servers.json
+        snapshot_file (str, optional): Snapshot a usar no lugar do JSON. Se ainda não
+                                       existir, é criado a partir do servers.json
+
+    Returns:
+        ServerTable: Tabela compilada
+    """
+    if not snapshot_file:
+        return load_table(config_file)
+    try:
+        return load_snapshot(snapshot_file)
+    except FileNotFoundError:
+        return build_snapshot(config_file, snapshot_file)
+
+
+def start_watcher(config_file: str, on_change: Callable[[ServerTable], None],
+                 snapshot_file: Optional[str] = None, interval: float = 1.0) -> ConfigWatcher:
+    """
+    Inicia o ConfigWatcher do arquivo lido por load_config.
+
+    Args:
+        config_file (str): Caminho do servers.json
+        on_change (callable): Função chamada, na thread do observador, com a nova ServerTable
+        snapshot_file (str, optional): Se definido, observa o snapshot no lugar do JSON
+        interval (float): Intervalo entre verificações em segundos
+
+    Returns:
+        ConfigWatcher: Observador já iniciado
+    """
+    if snapshot_file:
+        return ConfigWatcher(snapshot_file, on_change, load_snapshot, interval).start()
+    return ConfigWatcher(config_file, on_change, load_table, interval).start()
@@ -0,0 +1,330 @@
+"""
+Conexões com os servidores intermediários: espelhos, cache de DNS e pré-aquecimento.
+
+Cada servidor do servers.json pode ter várias URLs ('urls'). O MirrorSet
+distribui as requisições entre elas em rodízio e tira de uso por um tempo a
+URL que recusa conexões, para que a requisição passe para a próxima.
+
+O DnsCache guarda os endereços resolvidos por um tempo (TTL) e é usado pelas
+conexões criadas pelo CachedDNSAdapter. O ConnectionWarmer abre conexões com os
+espelhos ociosos em uma thread de fundo, para que a primeira requisição depois
+de um período parado não pague DNS, TCP e TLS.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, List, Tuple
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .logger import ShadowLogger
+
+
+def is_connect_error(error: BaseException) -> bool:
+    """
+    Verifica se o erro aconteceu antes da requisição chegar ao servidor.
+
+    Nesses casos (DNS, conexão recusada, timeout de conexão) a requisição pode ser
+    enviada a outro espelho sem risco de ser executada duas vezes.
+
+    Args:
+        error (BaseException): Exceção da requisição
+
+    Returns:
+        bool: True se a conexão não chegou a ser estabelecida
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], 'reason', error.args[0])
+        return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+    return False
+
+
+class DnsCache:
+    def __init__(self, ttl: float = 300.0):
+        """
+        Inicializa o cache de DNS.
+
+        Args:
+            ttl (float): Tempo em segundos que um endereço resolvido é reaproveitado
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}  # -> (endereços, expira em)
+        self._lock = threading.Lock()
+
+    def _lookup(self, host: str, port: int) -> List[str]:
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        addresses = []
+        for info in infos:
+            address = info[4][0]
+            if address not in addresses:
+                addresses.append(address)
+        return addresses
+
+    def resolve_all(self, host: str, port: int) -> List[str]:
+        """
+        Resolve o host, usando os endereços em cache se ainda forem válidos.
+
+        Args:
+            host (str): Nome do host
+            port (int): Porta
+
+        Returns:
+            list: Endereços IP na ordem de preferência (os que falharam por último vão
+                  para o fim); só o próprio host se já for um IP
+
+        Raises:
+            socket.gaierror: Se o nome não puder ser resolvido
+        """
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+
+        addresses = self._lookup(host, port)
+        with self._lock:
+            self._entries[key] = (addresses, now + self.ttl)
+        return list(addresses)
+
+    def resolve(self, host: str, port: int) -> str:
+        """
+        Resolve o host e retorna o endereço preferido (veja resolve_all).
+
+        Returns:
+            str: Endereço IP; o próprio host se já for um IP
+
+        Raises:
+            socket.gaierror: Se o nome não puder ser resolvido
+        """
+        return self.resolve_all(host, port)[0]
+
+    def failed(self, host: str, port: int, address: str):
+        """Move o endereço que recusou a conexão para o fim da lista do host."""
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and address in entry[0] and len(entry[0]) > 1:
+                addresses = [a for a in entry[0] if a != address] + [address]
+                self._entries[(host, port)] = (addresses, entry[1])
+
+    def invalidate(self, host: str):
+        """Descarta os endereços do host, depois de uma falha de conexão."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == host]:
+                del self._entries[key]
+
+    def refresh(self, margin: float = 0.0):
+        """
+        Resolve de novo os hosts que expiram dentro de margin segundos.
+
+        Mantém o endereço antigo se a nova resolução falhar.
+
+        Args:
+            margin (float): Antecedência em segundos
+        """
+        now = time.monotonic()
+        with self._lock:
+            expiring = [key for key, (_, expires) in self._entries.items() if expires - now <= margin]
+        for host, port in expiring:
+            try:
+                addresses = self._lookup(host, port)
+            except OSError as e:
+                ShadowLogger().warning("Erro ao resolver %s de novo: %s", host, e)
+                continue
+            with self._lock:
+                self._entries[(host, port)] = (addresses, time.monotonic() + self.ttl)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna o conteúdo do cache.
+
+        Returns:
+            dict: 'hosts' (endereços e segundos até expirar por host:porta), 'hits' e 'misses'
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'hosts': {f"{host}:{port}": {'addresses': addresses, 'expires_in': round(expires - now, 1)}
+                          for (host, port), (addresses, expires) in self._entries.items()},
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class _CachedDNSConnection:
+    """Conexão do urllib3 que resolve o host pelo DnsCache."""
+
+    dns_cache = None
+
+    def _new_conn(self):
+        # O urllib3 resolve _dns_host; host (SNI e header Host) continua sendo o nome
+        host = self._dns_host
+        addresses = self.dns_cache.resolve_all(host, self.port)
+        try:
+            # Como o urllib3 sem cache: tenta os endereços em ordem até um conectar
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError):
+                    self.dns_cache.failed(host, self.port, address)
+                    if index == len(addresses) - 1:
+                        # Nenhum endereço respondeu: resolve o nome de novo na próxima conexão
+                        self.dns_cache.invalidate(host)
+                        raise
+        finally:
+            self._dns_host = host
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    def __init__(self, dns_cache: DnsCache, **kwargs):
+        """
+        Inicializa o adapter do requests que usa o cache de DNS nas novas conexões.
+
+        Args:
+            dns_cache (DnsCache): Cache de DNS
+            **kwargs: Argumentos do HTTPAdapter (pool_connections, pool_maxsize...)
+        """
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {'dns_cache': self.dns_cache}
+        http = type('CachedDNSHTTPConnection', (_CachedDNSConnection, urllib3.connection.HTTPConnection), attrs)
+        https = type('CachedDNSHTTPSConnection', (_CachedDNSConnection, urllib3.connection.HTTPSConnection), attrs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('CachedDNSHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http}),
+            'https': type('CachedDNSHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https}),
+        }
+
+
+class MirrorSet:
+    def __init__(self, urls: Tuple[str, ...], cooldown: float = 30.0):
+        """
+        Inicializa o rodízio entre as URLs de um servidor.
+
+        Args:
+            urls (tuple): URLs do api.php de cada espelho
+            cooldown (float): Tempo em segundos que um espelho fica fora do rodízio após
+                              uma falha de conexão
+        """
+        self.urls = tuple(urls)
+        self.cooldown = cooldown
+        self.last_used = {url: 0.0 for url in self.urls}
+        self._down: Dict[str, float] = {}  # URL -> fora do rodízio até
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[str]:
+        """
+        Ordem das URLs a tentar nesta requisição.
+
+        Começa na próxima URL do rodízio; as URLs fora do rodízio vão para o fim,
+        para serem usadas só se as demais também falharem.
+
+        Returns:
+            list: URLs, a primeira é a preferida
+        """
+        if len(self.urls) == 1:
+            return list(self.urls)
+        now = time.monotonic()
+        with self._lock:
+            start = self._counter % len(self.urls)
+            self._counter += 1
+            ordered = self.urls[start:] + self.urls[:start]
+            if not self._down:
+                return list(ordered)
+            up = [url for url in ordered if self._down.get(url, 0.0) <= now]
+            down = sorted((url for url in ordered if self._down.get(url, 0.0) > now), key=self._down.get)
+            return up + down
+
+    def failed(self, url: str):
+        """Tira a URL do rodízio por cooldown segundos."""
+        with self._lock:
+            self._down[url] = time.monotonic() + self.cooldown
+
+    def succeeded(self, url: str):
+        """Registra o uso bem-sucedido da URL e a devolve ao rodízio."""
+        now = time.monotonic()
+        self.last_used[url] = now
+        if url in self._down:
+            with self._lock:
+                self._down.pop(url, None)
+
+    def idle(self, seconds: float) -> List[str]:
+        """URLs sem uso bem-sucedido há pelo menos 'seconds' segundos."""
+        now = time.monotonic()
+        return [url for url in self.urls if now - self.last_used.get(url, 0.0) >= seconds]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado de cada URL: segundos desde o último uso e se está fora do rodízio."""
+        now = time.monotonic()
+        with self._lock:
+            return {url: {'idle': round(now - self.last_used[url], 1) if self.last_used[url] else None,
+                          'down_for': round(max(0.0, self._down.get(url, 0.0) - now), 1)}
+                    for url in self.urls}
+
+
+class ConnectionWarmer:
+    def __init__(self, warm: Callable[[float], int], interval: float = 10.0,
+                 dns_cache: Optional[DnsCache] = None):
+        """
+        Inicializa o pré-aquecimento periódico das conexões.
+
+        Uma thread de fundo chama warm ao iniciar e a cada intervalo, e renova as
+        entradas do cache de DNS que estão para expirar.
+
+        Args:
+            warm (callable): Função que abre conexões com os espelhos ociosos há pelo menos
+                             o número de segundos recebido (0 na primeira chamada) e retorna
+                             o número de conexões abertas
+            interval (float): Intervalo entre as rodadas em segundos. Deve ser menor que o
+                              keep-alive dos servidores, para as conexões não fecharem antes do uso
+            dns_cache (DnsCache, optional): Cache de DNS a renovar
+        """
+        self.warm = warm
+        self.interval = interval
+        self.dns_cache = dns_cache
+        self.logger = ShadowLogger()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'ConnectionWarmer':
+        """Inicia a thread de pré-aquecimento."""
+        self._thread = threading.Thread(target=self._run, name='shadowreq-warmer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Encerra a thread de pré-aquecimento."""
+        self._stop.set()
+
+    def _run(self):
+        idle = 0.0
+        while not self._stop.is_set():
+            try:
+                if self.dns_cache is not None:
+                    self.dns_cache.refresh(margin=self.interval)
+                opened = self.warm(idle)
+                if opened:
+                    self.logger.debug("Pré-aquecimento: %s conexões", opened)
+            except Exception as e:
+                self.logger.error("Erro no pré-aquecimento das conexões: %s", e)
+            idle = self.interval
+            self._stop.wait(self.interval)
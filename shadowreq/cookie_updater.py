@@ -1,130 +1,423 @@
 """
-Módulo para atualização automática de cookies usando Selenium.
+Módulo para atualização automática de cookies.
+
+O cookie __test é calculado primeiro sem navegador (veja challenge.py); o
+Selenium só é usado quando essa resolução falha. O Selenium e o
+webdriver-manager são dependências opcionais: pip install shadowreq[browser]
 """
 
+import atexit
 import json
 import os
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict
+from .challenge import fetch_cookie
+from .config import build_snapshot
 from .logger import ShadowLogger
 
+# Caminho do chromedriver resolvido pelo webdriver-manager, compartilhado no processo
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# Serializa as gravações do arquivo de configuração dentro do processo
+_config_lock = threading.Lock()
+
+
+def resolve_driver_path() -> str:
+    """
+    Resolve o caminho do chromedriver uma única vez por processo.
+
+    Returns:
+        str: Caminho do executável do chromedriver
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def write_config(path: str, config: dict):
+    """
+    Grava o arquivo de configuração de forma atômica (arquivo temporário + rename).
+
+    Quem lê o arquivo ao mesmo tempo vê a versão antiga ou a nova, nunca um arquivo pela metade.
+
+    Args:
+        path (str): Caminho do arquivo de configuração
+        config (dict): Configuração a gravar
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.servers-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BrowserPool:
+    def __init__(self, size: int = 2, page_timeout: float = 30.0):
+        """
+        Inicializa o pool de navegadores Chrome headless.
+
+        Os navegadores são criados sob demanda e reaproveitados entre as
+        atualizações até close() ser chamado.
+
+        Args:
+            size (int): Número máximo de navegadores abertos ao mesmo tempo
+            page_timeout (float): Timeout de carregamento de cada página em segundos
+        """
+        self.size = size
+        self.page_timeout = page_timeout
+        self.logger = ShadowLogger()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+        self._drivers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_driver(self):
+        # Importado aqui para que o Selenium só seja necessário quando usado
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+
+        self.logger.info("Configurando Chrome em modo headless...")
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+
+        service = Service(resolve_driver_path())
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver.set_page_load_timeout(self.page_timeout)
+
+        with self._lock:
+            if not self._drivers:
+                atexit.register(self.close)
+            self._drivers.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def driver(self):
+        """
+        Empresta um navegador do pool, criando um novo se não houver nenhum livre.
+
+        Se o uso levantar uma exceção, o navegador é fechado em vez de voltar ao pool.
+
+        Yields:
+            WebDriver: Navegador pronto para uso
+        """
+        if self._closed:
+            raise RuntimeError("Pool de navegadores encerrado")
+
+        self._slots.acquire()
+        driver = None
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._create_driver()
+            yield driver
+        except BaseException:
+            if driver is not None:
+                self._discard(driver)
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                if self._closed:
+                    self._discard(driver)
+                else:
+                    self._idle.put(driver)
+            self._slots.release()
+
+    def close(self):
+        """Fecha todos os navegadores do pool."""
+        self._closed = True
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        if drivers:
+            self.logger.info("Fechando navegadores...")
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
 class CookieUpdater:
-    def __init__(self, server_config_file: str = 'servers.json', enable_logging: bool = False, log_file: str = None):
+    def __init__(self, server_config_file: str = 'servers.json', enable_logging: Optional[bool] = None,
+                 log_file: str = None,
+                 browser_fallback: bool = True, workers: int = 4, timeout: float = 30.0,
+                 browsers: Optional[int] = None, snapshot_file: Optional[str] = None):
         """
         Inicializa o atualizador de cookies.
         
         Args:
             server_config_file (str): Caminho para o arquivo de configuração dos servidores
-            enable_logging (bool): Se True, ativa o logging para arquivo
+            enable_logging (bool, optional): Se True, ativa o logging para arquivo. Se None, mantém a
+                                             configuração atual do logger, que é compartilhado pelo processo
             log_file (str): Caminho para o arquivo de log
+            browser_fallback (bool): Se True, usa o Chrome headless quando a resolução
+                                     sem navegador falhar
+            workers (int): Número de servidores atualizados em paralelo
+            timeout (float): Timeout em segundos de cada requisição ou página ao atualizar um servidor
+            browsers (int, optional): Número máximo de navegadores abertos. Se None, usa workers
+            snapshot_file (str, optional): Se definido, regrava este snapshot da configuração
+                                           (veja shadowreq.config) a cada gravação do arquivo
         """
         self.config_file = server_config_file
-        self.driver = None
+        self.browser_fallback = browser_fallback
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.snapshot_file = snapshot_file
+        self.pool = BrowserPool(size=browsers or self.workers, page_timeout=timeout)
         
         # Configurar logging
         self.logger = ShadowLogger()
         self.logger.setup(enabled=enable_logging, log_file=log_file)
 
-    def setup_driver(self):
-        """Configura o driver do Chrome em modo headless."""
-        if self.driver is not None:
-            return
+    def close(self):
+        """Fecha os navegadores abertos."""
+        self.pool.close()
 
-        self.logger.info("Configurando Chrome em modo headless...")
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_cookie_and_useragent(self, url: str) -> tuple:
         """
         Obtém o cookie e User-Agent de um servidor.
         
+        Tenta primeiro resolver o desafio sem navegador e, se falhar, usa o Chrome headless.
+        
         Args:
             url (str): URL do servidor
             
         Returns:
             tuple: (cookie, user_agent)
         """
+        # Construir URL da API
+        if not url.endswith('api.php'):
+            if not url.endswith('/'):
+                url += '/'
+            url += 'api.php'
+
         try:
-            # Construir URL da API
-            if not url.endswith('api.php'):
-                if not url.endswith('/'):
-                    url += '/'
-                url += 'api.php'
-
-            self.logger.info(f"Acessando {url}...")
-            self.driver.get(url)
-            cookies = self.driver.get_cookies()
-            user_agent = self.driver.execute_script("return navigator.userAgent")
+            self.logger.info("Resolvendo desafio de %s sem navegador...", url)
+            cookie, user_agent = fetch_cookie(url, timeout=self.timeout)
+            if cookie:
+                self.logger.debug("Cookie obtido: %s", cookie)
+                return cookie, user_agent
+            self.logger.warning("Cookie __test não encontrado em %s", url)
+        except Exception as e:
+            self.logger.warning("Erro ao resolver desafio de %s sem navegador: %s", url, e)
+
+        if not self.browser_fallback:
+            return None, None
+
+        return self.get_cookie_with_browser(url)
+
+    def get_cookie_with_browser(self, url: str) -> tuple:
+        """
+        Obtém o cookie e User-Agent de um servidor usando o Chrome headless.
+        
+        Args:
+            url (str): URL da API do servidor
+            
+        Returns:
+            tuple: (cookie, user_agent)
+        """
+        try:
+            with self.pool.driver() as driver:
+                self.logger.info("Acessando %s...", url)
+                # O navegador é reaproveitado: limpa os cookies de servidores anteriores
+                driver.delete_all_cookies()
+                driver.get(url)
+                cookies = driver.get_cookies()
+                user_agent = driver.execute_script("return navigator.userAgent")
             
             # Procurar pelo cookie __test
             test_cookie = next((cookie['value'] for cookie in cookies if cookie['name'] == '__test'), None)
             
             if not test_cookie:
-                self.logger.warning(f"Cookie __test não encontrado em {url}")
+                self.logger.warning("Cookie __test não encontrado em %s", url)
             else:
-                self.logger.debug(f"Cookie obtido: {test_cookie}")
-                self.logger.debug(f"User-Agent: {user_agent}")
+                self.logger.debug("Cookie obtido: %s", test_cookie)
+                self.logger.debug("User-Agent: %s", user_agent)
             
             return test_cookie, user_agent
             
         except Exception as e:
-            self.logger.error(f"Erro ao obter cookie de {url}: {str(e)}")
+            self.logger.error("Erro ao obter cookie de %s: %s", url, e)
             return None, None
 
-    def update_servers_cookies(self):
-        """Atualiza os cookies e User-Agent no arquivo de configuração."""
-        try:
-            self.setup_driver()
+    def refresh_server(self, server_name: str, server_data: dict, save: bool = True) -> Optional[Dict[str, str]]:
+        """
+        Obtém um novo cookie e User-Agent para um único servidor.
+        
+        Args:
+            server_name (str): Nome do servidor
+            server_data (dict): Configuração do servidor; os headers são atualizados no lugar
+            save (bool): Se True, grava os novos headers no arquivo de configuração
             
+        Returns:
+            dict: Headers atualizados ('cookie' e 'user-agent') ou None se não foi possível obtê-los
+        """
+        self.logger.info("Processando servidor: %s", server_name)
+
+        # Os espelhos compartilham os headers do servidor: o primeiro que responder basta
+        for url in server_data['urls']:
+            cookie, user_agent = self.get_cookie_and_useragent(url)
+            if cookie and user_agent:
+                break
+            self.logger.warning("Não foi possível obter o cookie de %s", url)
+        else:
+            return None
+
+        headers = {'cookie': f"__test={cookie}", 'user-agent': user_agent}
+        server_data.setdefault('headers', {}).update(headers)
+        self.logger.info("Servidor %s atualizado com sucesso", server_name)
+
+        if save:
+            try:
+                self.save_server_headers(server_name, headers)
+            except Exception as e:
+                self.logger.error("Erro ao salvar cookie do servidor %s: %s", server_name, e)
+        return headers
+
+    def save_server_headers(self, server_name: str, headers: Dict[str, str]):
+        """
+        Grava os headers de um servidor no arquivo de configuração, mantendo os demais.
+        
+        Args:
+            server_name (str): Nome do servidor
+            headers (dict): Headers a atualizar
+        """
+        self.save_headers({server_name: headers})
+
+    def save_headers(self, updates: Dict[str, Dict[str, str]]):
+        """
+        Grava os headers de vários servidores no arquivo de configuração, mantendo o resto.
+
+        O arquivo é lido de novo antes da gravação, para não desfazer alterações feitas
+        enquanto os cookies eram obtidos.
+
+        Args:
+            updates (dict): Nome do servidor -> headers a atualizar
+        """
+        with _config_lock:
+            with open(self.config_file, 'r') as f:
+                config = json.load(f)
+
+            changed = False
+            for server_name, headers in updates.items():
+                if isinstance(config.get(server_name), dict):
+                    config[server_name].setdefault('headers', {}).update(headers)
+                    changed = True
+
+            if changed:
+                write_config(self.config_file, config)
+                if self.snapshot_file:
+                    build_snapshot(self.config_file, self.snapshot_file)
+
+    def update_servers_cookies(self) -> Dict[str, Dict[str, str]]:
+        """
+        Atualiza os cookies e User-Agent no arquivo de configuração.
+
+        Os servidores são processados em paralelo (veja workers). Os navegadores
+        abertos continuam disponíveis para a próxima atualização até close().
+
+        Returns:
+            dict: Nome do servidor -> headers atualizados, só dos servidores atualizados
+        """
+        try:
             # Carregar configuração atual
             self.logger.info("Carregando arquivo de configuração...")
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
-            
-            # Atualizar cada servidor
-            for server_name, server_data in config.items():
-                if isinstance(server_data, dict) and 'urls' in server_data:
-                    url = server_data['urls'][0]  # Usar primeira URL
-                    self.logger.info(f"Processando servidor: {server_name}")
-                    
-                    cookie, user_agent = self.get_cookie_and_useragent(url)
-                    
-                    if cookie and user_agent:
-                        # Atualizar headers
-                        if 'headers' not in server_data:
-                            server_data['headers'] = {}
-                        
-                        server_data['headers']['cookie'] = f"__test={cookie}"
-                        server_data['headers']['user-agent'] = user_agent
-                        self.logger.info(f"Servidor {server_name} atualizado com sucesso")
-            
+
+            servers = {name: data for name, data in config.items()
+                       if isinstance(data, dict) and 'urls' in data}
+
+            # Atualizar os servidores em paralelo
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(servers) or 1),
+                                    thread_name_prefix='shadowreq-cookies') as executor:
+                futures = {name: executor.submit(self.refresh_server, name, data, False)
+                           for name, data in servers.items()}
+                updates = {}
+                for name, future in futures.items():
+                    try:
+                        headers = future.result()
+                    except Exception as e:
+                        self.logger.error("Erro ao atualizar servidor %s: %s", name, e)
+                        continue
+                    if headers:
+                        updates[name] = headers
+
             # Salvar configuração atualizada
-            self.logger.info("Salvando configuração atualizada...")
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=4)
-            
+            self.logger.info("Salvando configuração atualizada (%s/%s servidores)...", len(updates), len(servers))
+            if updates:
+                self.save_headers(updates)
+
             self.logger.info("Configuração atualizada com sucesso!")
-        
+            return updates
+
         except Exception as e:
-            self.logger.error(f"Erro ao atualizar configuração: {str(e)}")
+            self.logger.error("Erro ao atualizar configuração: %s", e)
             raise
-        
-        finally:
-            if self.driver:
-                self.logger.info("Fechando navegador...")
-                self.driver.quit()
+
+    def run_forever(self, interval: float, stop_event: Optional[threading.Event] = None):
+        """
+        Atualiza os cookies periodicamente até stop_event ser definido.
+
+        Erros de uma atualização são registrados e não interrompem as seguintes.
+
+        Args:
+            interval (float): Espera entre o fim de uma atualização e o início da próxima em segundos
+            stop_event (threading.Event, optional): Evento que encerra o laço
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.update_servers_cookies()
+            except Exception:
+                pass
+            stop_event.wait(interval)
 
 def main():
     """Função principal para executar a atualização de cookies."""
-    updater = CookieUpdater(enable_logging=True)
-    updater.update_servers_cookies()
+    with CookieUpdater(enable_logging=True) as updater:
+        updater.update_servers_cookies()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,82 +1,193 @@
 """
 Módulo de logging para o ShadowReq.
+
+As mensagens recebem um template e argumentos no estilo do logging ('%s'):
+a formatação só acontece se o nível estiver ativo, e a gravação em arquivo é
+feita por uma thread de fundo (QueueHandler + QueueListener), fora da thread
+que faz a requisição.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
 from datetime import datetime
 from typing import Optional
 
+# Nível acima de qualquer nível real: nada é registrado
+_DISABLED = logging.CRITICAL + 100
+
+
+class _NonFormattingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que deixa a formatação para a thread de gravação."""
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON, com os campos passados em fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
 class ShadowLogger:
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ShadowLogger, cls).__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
+
         self.logger = None
+        self.level = _DISABLED
+        self.sample_rate = 1.0
+        # Configuração atual; setup() só altera os argumentos passados
+        self.settings = {'enabled': False, 'log_file': None, 'level': logging.INFO,
+                         'json_format': False, 'sample_rate': 1.0, 'background': True}
+        self._listener = None
         self._initialized = True
-    
-    def setup(self, enabled: bool = False, log_file: Optional[str] = None, level: int = logging.INFO):
+
+    def setup(self, enabled: Optional[bool] = None, log_file: Optional[str] = None, level: Optional[int] = None,
+              json_format: Optional[bool] = None, sample_rate: Optional[float] = None,
+              background: Optional[bool] = None):
         """
         Configura o logger.
-        
+
+        O logger é compartilhado pelo processo: argumentos None mantêm o valor atual,
+        para que um cliente criado depois não desfaça a configuração feita antes.
+
         Args:
-            enabled (bool): Se True, ativa o logging
-            log_file (str, optional): Caminho para o arquivo de log. 
-                                    Se None, usa 'shadowreq_{data}.log' no diretório atual
-            level (int): Nível de logging (default: logging.INFO)
+            enabled (bool, optional): Se True, ativa o logging (default inicial: False)
+            log_file (str, optional): Caminho para o arquivo de log.
+                                    Se nunca definido, usa 'shadowreq_{data}.log' no diretório atual
+            level (int, optional): Nível de logging (default inicial: logging.INFO)
+            json_format (bool, optional): Se True, grava uma linha JSON por registro, com campos como
+                                          request_id, relay, latency e status (default inicial: False)
+            sample_rate (float, optional): Fração (0 a 1) das mensagens INFO frequentes (uma por
+                                           requisição) que são registradas (default inicial: 1.0)
+            background (bool, optional): Se True, grava o arquivo em uma thread de fundo (default inicial: True)
         """
-        if not enabled:
+        changes = {'enabled': enabled, 'log_file': log_file, 'level': level, 'json_format': json_format,
+                   'sample_rate': sample_rate, 'background': background}
+        settings = dict(self.settings, **{key: value for key, value in changes.items() if value is not None})
+        if settings == self.settings and (self.logger is not None) == settings['enabled']:
+            # Nada mudou: não reabre o arquivo nem reinicia a thread de gravação
+            return
+        self.settings = settings
+
+        self._stop_listener()
+
+        if not settings['enabled']:
             self.logger = None
+            self.level = _DISABLED
             return
-            
+
+        log_file = settings['log_file']
+        level = settings['level']
+        json_format = settings['json_format']
+        background = settings['background']
+
         # Criar logger
         self.logger = logging.getLogger('shadowreq')
         self.logger.setLevel(level)
-        
+        self.level = level
+        self.sample_rate = settings['sample_rate']
+
         # Se já tiver handlers, limpa para não duplicar
         if self.logger.handlers:
             self.logger.handlers.clear()
-        
+
         # Definir arquivo de log padrão se não fornecido
         if not log_file:
             date_str = datetime.now().strftime('%Y%m%d')
             log_file = f'shadowreq_{date_str}.log'
-        
+
         # Criar diretório se não existir
         log_dir = os.path.dirname(log_file)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
-        
+
         # Configurar handler de arquivo
         file_handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        if json_format:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-    
-    def info(self, message: str):
+
+        if background:
+            # A thread da requisição só coloca o registro na fila
+            records = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(records, file_handler)
+            self._listener.start()
+            self.logger.addHandler(_NonFormattingQueueHandler(records))
+        else:
+            self.logger.addHandler(file_handler)
+
+    def _stop_listener(self):
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def flush(self):
+        """Espera a gravação das mensagens já registradas."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.start()
+
+    def is_enabled(self, level: int) -> bool:
+        """Verifica se mensagens do nível são registradas."""
+        return level >= self.level
+
+    def _log(self, level: int, message: str, args: tuple, fields: dict):
+        self.logger.log(level, message, *args, extra={'fields': fields} if fields else None)
+
+    def info(self, message: str, *args, **fields):
         """Registra uma mensagem de nível INFO."""
-        if self.logger:
-            self.logger.info(message)
-    
-    def error(self, message: str):
+        if logging.INFO >= self.level:
+            self._log(logging.INFO, message, args, fields)
+
+    def sampled(self, message: str, *args, **fields):
+        """Registra uma mensagem INFO frequente, respeitando a taxa de amostragem."""
+        if logging.INFO >= self.level and (self.sample_rate >= 1.0 or random.random() < self.sample_rate):
+            self._log(logging.INFO, message, args, fields)
+
+    def error(self, message: str, *args, **fields):
         """Registra uma mensagem de nível ERROR."""
-        if self.logger:
-            self.logger.error(message)
-    
-    def debug(self, message: str):
+        if logging.ERROR >= self.level:
+            self._log(logging.ERROR, message, args, fields)
+
+    def debug(self, message: str, *args, **fields):
         """Registra uma mensagem de nível DEBUG."""
-        if self.logger:
-            self.logger.debug(message)
-    
-    def warning(self, message: str):
+        if logging.DEBUG >= self.level:
+            self._log(logging.DEBUG, message, args, fields)
+
+    def warning(self, message: str, *args, **fields):
         """Registra uma mensagem de nível WARNING."""
-        if self.logger:
-            self.logger.warning(message)
+        if logging.WARNING >= self.level:
+            self._log(logging.WARNING, message, args, fields)
+
+
+# Grava as mensagens pendentes ao encerrar o processo
+atexit.register(ShadowLogger()._stop_listener)
@@ -0,0 +1,328 @@
+"""
+Métricas por servidor intermediário.
+
+Conta requisições, erros, timeouts e páginas de desafio de cada servidor e
+guarda histogramas de latência. Quando o servidor devolve os tempos do curl
+(veja 'timing' no api.php), a latência é dividida em tempo do destino e tempo
+gasto entre o cliente e o servidor intermediário.
+
+Exportação: Metrics.snapshot() (dicionário), Metrics.to_prometheus() (formato
+texto do Prometheus) e MetricsServer (endpoints HTTP /metrics e /stats).
+"""
+
+import bisect
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, Iterable, List
+
+# Limites dos baldes dos histogramas em segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Quantis incluídos em Histogram.snapshot()
+QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+# Tempos do curl devolvidos pelo servidor intermediário
+TIMING_FIELDS = ('namelookup', 'connect', 'starttransfer', 'total')
+
+
+class Histogram:
+    """Histograma cumulativo no estilo do Prometheus."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # O último balde é +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _quantile_index(self, q: float) -> Optional[int]:
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return index
+        return len(self.buckets)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estima o quantil q (0 a 1) pelo limite do balde; None se não houver amostras.
+
+        Se o quantil cair no balde +Inf, retorna o maior limite finito (veja overflows):
+        o valor continua serializável em JSON.
+        """
+        index = self._quantile_index(q)
+        if index is None:
+            return None
+        return self.buckets[min(index, len(self.buckets) - 1)]
+
+    def overflows(self, q: float) -> bool:
+        """Verifica se o quantil q cai acima do maior limite dos baldes."""
+        return self._quantile_index(q) == len(self.buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        quantiles = {name: q for name, q in QUANTILES}
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            **{name: self.quantile(q) for name, q in quantiles.items()},
+            # Quantis acima do maior balde: o valor acima é só um limite inferior
+            'overflow': [name for name, q in quantiles.items() if self.overflows(q)],
+        }
+
+
+class RelayMetrics:
+    """Contadores e histogramas de um servidor."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.challenges = 0
+        self.latency = Histogram(buckets)  # Tempo total visto pelo cliente
+        self.relay = Histogram(buckets)  # Tempo total menos o tempo do destino
+        self.upstream = {name: Histogram(buckets) for name in TIMING_FIELDS}  # Tempos do curl
+
+
+class Metrics:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        Inicializa o registro de métricas.
+
+        Args:
+            buckets (iterable): Limites dos baldes dos histogramas em segundos
+        """
+        self.buckets = tuple(buckets)
+        self.relays = {}
+        self._lock = threading.Lock()
+
+    def _get(self, relay: str) -> RelayMetrics:
+        metrics = self.relays.get(relay)
+        if metrics is None:
+            metrics = self.relays[relay] = RelayMetrics(self.buckets)
+        return metrics
+
+    def record(self, relay: str, latency: Optional[float] = None, error: bool = False,
+               timeout: bool = False, challenge: bool = False,
+               timing: Optional[Dict[str, float]] = None, requests: int = 1):
+        """
+        Registra o resultado de uma chamada a um servidor.
+
+        Args:
+            relay (str): Nome do servidor
+            latency (float, optional): Tempo total da chamada em segundos
+            error (bool): Se a chamada falhou
+            timeout (bool): Se a falha foi um timeout
+            challenge (bool): Se o servidor respondeu com a página de desafio
+            timing (dict, optional): Tempos do curl devolvidos pelo servidor (veja TIMING_FIELDS)
+            requests (int): Número de requisições da chamada (lotes contam cada item)
+        """
+        with self._lock:
+            metrics = self._get(relay)
+            metrics.requests += requests
+            if error or timeout or challenge:
+                metrics.errors += 1
+            if timeout:
+                metrics.timeouts += 1
+            if challenge:
+                metrics.challenges += 1
+            if latency is not None:
+                metrics.latency.observe(latency)
+            if timing:
+                for name, histogram in metrics.upstream.items():
+                    value = timing.get(name)
+                    if isinstance(value, (int, float)):
+                        histogram.observe(value)
+                upstream = timing.get('total')
+                if latency is not None and isinstance(upstream, (int, float)):
+                    metrics.relay.observe(max(0.0, latency - upstream))
+
+    def reset(self):
+        """Apaga todas as métricas."""
+        with self._lock:
+            self.relays = {}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna uma cópia das métricas de cada servidor.
+
+        Returns:
+            dict: Por nome de servidor: contadores, 'latency', 'relay' e 'upstream'
+                  (com count, sum, mean, p50, p95 e p99 em segundos e, em 'overflow', os
+                  quantis acima do maior balde, que valem só como limite inferior)
+        """
+        with self._lock:
+            return {
+                name: {
+                    'requests': m.requests,
+                    'errors': m.errors,
+                    'timeouts': m.timeouts,
+                    'challenges': m.challenges,
+                    'latency': m.latency.snapshot(),
+                    'relay': m.relay.snapshot(),
+                    'upstream': {phase: h.snapshot() for phase, h in m.upstream.items()},
+                }
+                for name, m in self.relays.items()
+            }
+
+    def to_prometheus(self, prefix: str = 'shadowreq') -> str:
+        """
+        Exporta as métricas no formato texto do Prometheus.
+
+        Args:
+            prefix (str): Prefixo dos nomes das métricas
+
+        Returns:
+            str: Métricas no formato de exposição do Prometheus
+        """
+        lines = []
+
+        def counter(name, help_text, attr):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for relay, m in relays:
+                lines.append(f'{prefix}_{name}{{relay="{_escape(relay)}"}} {getattr(m, attr)}')
+
+        def histogram(name, help_text, items):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for labels, h in items:
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_{name}_sum{{{labels}}} {h.sum}')
+                lines.append(f'{prefix}_{name}_count{{{labels}}} {h.count}')
+
+        with self._lock:
+            relays = sorted(self.relays.items())
+            counter('requests_total', 'Requisições enviadas ao servidor intermediário', 'requests')
+            counter('errors_total', 'Requisições que falharam', 'errors')
+            counter('timeouts_total', 'Requisições que excederam o timeout', 'timeouts')
+            counter('challenges_total', 'Respostas com a página de desafio', 'challenges')
+            histogram('request_duration_seconds', 'Tempo total da requisição visto pelo cliente',
+                      [(f'relay="{_escape(relay)}"', m.latency) for relay, m in relays])
+            histogram('relay_overhead_seconds', 'Tempo total menos o tempo do destino',
+                      [(f'relay="{_escape(relay)}"', m.relay) for relay, m in relays])
+            histogram('upstream_duration_seconds', 'Tempos do curl no servidor intermediário',
+                      [(f'relay="{_escape(relay)}",phase="{phase}"', h)
+                       for relay, m in relays for phase, h in m.upstream.items()])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsServer:
+    def __init__(self, stats, prometheus, host: str = '127.0.0.1', port: int = 9100):
+        """
+        Inicializa o servidor HTTP de métricas.
+
+        Args:
+            stats (callable): Função que retorna o dicionário servido em /stats
+            prometheus (callable): Função que retorna o texto servido em /metrics
+            host (str): Endereço de escuta
+            port (int): Porta de escuta (0 escolhe uma porta livre)
+        """
+        self.stats = stats
+        self.prometheus = prometheus
+        self._server = ThreadingHTTPServer((host, port), self._make_handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL base do servidor."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MetricsServer':
+        """Inicia o servidor em uma thread de fundo."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='shadowreq-metrics', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Encerra o servidor."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler_class(self):
+        server = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = server.prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/stats':
+                    # allow_nan=False: Infinity e NaN não são JSON válido para outros parsers
+                    body = json.dumps(server.stats(), default=str, allow_nan=False).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetricsRequestHandler
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """
+    Formata o resultado de stats() como uma tabela de texto.
+
+    Args:
+        stats (dict): Resultado de ShadowReq.stats()
+
+    Returns:
+        str: Tabela com uma linha por servidor
+    """
+    def ms(histogram, name):
+        value = histogram.get(name)
+        if value is None:
+            return '-'
+        # Acima do maior balde: mostra o limite como '>30000'
+        prefix = '>' if name in histogram.get('overflow', ()) else ''
+        return f'{prefix}{value * 1000:.0f}'
+
+    header = ('servidor', 'estado', 'reqs', 'erros', 'timeouts', 'desafios',
+              'p50 ms', 'p95 ms', 'destino p50', 'relay p50')
+    rows: List[tuple] = [header]
+    for name, relay in sorted(stats.get('relays', {}).items()):
+        rows.append((
+            name,
+            relay.get('state') or '-',
+            relay.get('requests', 0),
+            relay.get('errors', 0),
+            relay.get('timeouts', 0),
+            relay.get('challenges', 0),
+            ms(relay.get('latency', {}), 'p50'),
+            ms(relay.get('latency', {}), 'p95'),
+            ms(relay.get('upstream', {}).get('total', {}), 'p50'),
+            ms(relay.get('relay', {}), 'p50'),
+        ))
+
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip()
+                     for row in rows)
@@ -0,0 +1,497 @@
+"""
+Protocolo de envelope usado entre o cliente e o servidor intermediário (api.php).
+"""
+
+import gzip
+import io
+import json
+import os
+import uuid
+from typing import Optional, Dict, Any, Union, Tuple, List, Iterator
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Tamanho mínimo do envelope para comprimir com gzip
+COMPRESS_MIN_SIZE = 1024
+
+# Content-Type das requisições com corpo: uma linha com o envelope em JSON seguida do corpo
+STREAM_CONTENT_TYPE = 'application/x-shadowreq-stream'
+
+# Tamanho das partes lidas de arquivos e enviadas ao servidor
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Número máximo de requisições em um lote (mesmo limite do api.php)
+MAX_BATCH_SIZE = 50
+
+# Headers do destino que não são repassados no modo raw (mesma lista do api.php)
+SKIPPED_HEADERS = ('connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length',
+                   'proxy-authenticate', 'proxy-authorization', 'te', 'trailer', 'upgrade')
+
+
+def build_payload(method: str, url: str,
+                  data: Optional[Dict[str, Any]] = None,
+                  params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Monta o envelope JSON esperado pelo servidor intermediário.
+
+    Args:
+        method (str): Método HTTP (GET, POST, PUT, DELETE)
+        url (str): URL do destino
+        data (dict, optional): Dados do corpo da requisição
+        params (dict, optional): Query params da requisição
+
+    Returns:
+        dict: Envelope com as chaves 'url', 'method' e 'params'
+    """
+    merged = {}
+
+    # Se tiver dados no body da requisição
+    if data:
+        merged.update(data)
+
+    # Se tiver query params
+    if params:
+        merged.update(params)
+
+    return {
+        'url': url,
+        'method': method.upper(),
+        'params': merged
+    }
+
+
+class StreamingBody:
+    """
+    Corpo de requisição lido em partes, sem ser carregado inteiro na memória.
+
+    As partes podem ser bytes, arquivos (objetos com read) ou iteráveis de bytes.
+    O requests envia o corpo com Content-Length quando o tamanho é conhecido
+    (bytes e arquivos) e com Transfer-Encoding: chunked quando não é (iteráveis).
+    """
+
+    def __init__(self, parts: List[Any], content_type: Optional[str] = None):
+        """
+        Inicializa o corpo.
+
+        Args:
+            parts (list): Partes do corpo, na ordem
+            content_type (str, optional): Content-Type do corpo repassado ao destino
+        """
+        self.parts = parts
+        self.content_type = content_type
+        # Posição inicial dos arquivos, para rewind()
+        self._positions = [part.tell() if _is_file(part) and _seekable(part) else None for part in parts]
+        self.length = self._compute_length()
+        self._chunks = None
+        self._buffer = b''
+
+    def _compute_length(self) -> Optional[int]:
+        total = 0
+        for part, position in zip(self.parts, self._positions):
+            if isinstance(part, bytes):
+                total += len(part)
+            elif _is_file(part):
+                size = _file_size(part)
+                if size is None or position is None:
+                    return None
+                total += size - position
+            else:
+                return None
+        return total
+
+    @property
+    def replayable(self) -> bool:
+        """Se o corpo pode ser enviado de novo (sem iteráveis nem arquivos sem seek)."""
+        return all(isinstance(part, bytes) or position is not None
+                   for part, position in zip(self.parts, self._positions))
+
+    def rewind(self) -> bool:
+        """
+        Volta ao início do corpo para um novo envio.
+
+        Returns:
+            bool: False se o corpo não puder ser enviado de novo
+        """
+        if not self.replayable:
+            return False
+        for part, position in zip(self.parts, self._positions):
+            if position is not None:
+                part.seek(position)
+        self._chunks = None
+        self._buffer = b''
+        return True
+
+    def with_prefix(self, prefix: bytes) -> 'StreamingBody':
+        """Retorna um corpo com prefix antes das partes deste (compartilhando os arquivos)."""
+        return StreamingBody([prefix] + self.parts, self.content_type)
+
+    def _iter_chunks(self) -> Iterator[bytes]:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                if part:
+                    yield part
+            elif _is_file(part):
+                while True:
+                    chunk = part.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            else:
+                for chunk in part:
+                    if chunk:
+                        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """Lê até size bytes do corpo; retorna b'' no fim."""
+        if self._chunks is None:
+            self._chunks = self._iter_chunks()
+        if size is None or size < 0:
+            data = self._buffer + b''.join(self._chunks)
+            self._buffer = b''
+            return data
+        if not self._buffer:
+            self._buffer = next(self._chunks, b'')
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def __len__(self) -> int:
+        # O requests usa len() para o Content-Length; 0 faz o envio ser chunked
+        return self.length or 0
+
+    def __bool__(self) -> bool:
+        # O requests troca dados "falsos" por {}; o corpo é enviado mesmo quando len() é 0
+        return True
+
+
+def _is_file(part: Any) -> bool:
+    return hasattr(part, 'read')
+
+
+def _seekable(part: Any) -> bool:
+    try:
+        return part.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _file_size(part: Any) -> Optional[int]:
+    try:
+        return os.fstat(part.fileno()).st_size
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        pass
+    if not _seekable(part):
+        return None
+    position = part.tell()
+    size = part.seek(0, os.SEEK_END)
+    part.seek(position)
+    return size
+
+
+def _multipart_part_header(boundary: str, name: str, filename: Optional[str] = None,
+                           content_type: Optional[str] = None) -> bytes:
+    def quote(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\r', '%0D').replace('\n', '%0A')
+
+    disposition = f'form-data; name="{quote(name)}"'
+    if filename is not None:
+        disposition += f'; filename="{quote(filename)}"'
+    header = f'--{boundary}\r\nContent-Disposition: {disposition}\r\n'
+    if content_type:
+        header += f'Content-Type: {content_type}\r\n'
+    return (header + '\r\n').encode('utf-8')
+
+
+def build_multipart(files: Dict[str, Any], fields: Optional[Dict[str, Any]] = None) -> StreamingBody:
+    """
+    Monta um corpo multipart/form-data sem ler os arquivos para a memória.
+
+    Args:
+        files (dict): Campo -> arquivo, bytes ou tupla (nome do arquivo, arquivo ou bytes[, Content-Type]),
+                      como no parâmetro files do requests
+        fields (dict, optional): Campos de texto do formulário
+
+    Returns:
+        StreamingBody: Corpo com Content-Type multipart/form-data e boundary
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in (fields or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            parts.append(_multipart_part_header(boundary, str(name)))
+            parts.append(item if isinstance(item, bytes) else str(item).encode('utf-8'))
+            parts.append(b'\r\n')
+
+    for name, value in files.items():
+        content_type = None
+        if isinstance(value, (list, tuple)):
+            filename, content = value[0], value[1]
+            if len(value) > 2:
+                content_type = value[2]
+        else:
+            content = value
+            filename = os.path.basename(getattr(value, 'name', '') or '') or str(name)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        parts.append(_multipart_part_header(boundary, str(name), filename,
+                                            content_type or 'application/octet-stream'))
+        parts.append(content)
+        parts.append(b'\r\n')
+
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return StreamingBody(parts, f'multipart/form-data; boundary={boundary}')
+
+
+def build_body(data: Any = None, json_data: Any = None, files: Optional[Dict[str, Any]] = None,
+               content_type: Optional[str] = None) -> Optional[StreamingBody]:
+    """
+    Monta o corpo repassado sem conversão ao destino.
+
+    Dicionários em data continuam no envelope (veja build_payload), exceto junto
+    com files, quando viram campos do formulário multipart.
+
+    Args:
+        data: bytes, str, arquivo ou iterável de bytes enviados como estão
+        json_data: Objeto serializado como JSON
+        files (dict, optional): Arquivos enviados como multipart/form-data (veja build_multipart)
+        content_type (str, optional): Content-Type do corpo. O default depende do tipo do corpo
+
+    Returns:
+        StreamingBody: Corpo da requisição, ou None se não houver corpo a repassar
+    """
+    if files:
+        return build_multipart(files, data if isinstance(data, dict) else None)
+    if json_data is not None:
+        return StreamingBody([json.dumps(json_data).encode('utf-8')], content_type or 'application/json')
+    if data is None or isinstance(data, dict):
+        return None
+    if isinstance(data, str):
+        return StreamingBody([data.encode('utf-8')], content_type or 'text/plain; charset=utf-8')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+    return StreamingBody([data], content_type or 'application/octet-stream')
+
+
+def encode_stream_payload(payload: Dict[str, Any], body: StreamingBody) -> Tuple[StreamingBody, Dict[str, str]]:
+    """
+    Monta a requisição ao servidor de um envelope com corpo.
+
+    O corpo enviado ao servidor é uma linha com o envelope em JSON (com 'body':
+    Content-Type e tamanho) seguida do corpo da requisição, lido em partes.
+
+    Args:
+        payload (dict): Envelope da requisição
+        body (StreamingBody): Corpo da requisição
+
+    Returns:
+        tuple: (corpo, headers da requisição ao servidor)
+    """
+    payload = dict(payload, body={'content_type': body.content_type, 'length': body.length})
+    prefix = json.dumps(payload).encode('utf-8') + b'\n'
+    return body.with_prefix(prefix), {'content-type': STREAM_CONTENT_TYPE}
+
+
+def build_response(result: Dict[str, Any], url: Optional[str] = None) -> requests.Response:
+    """
+    Cria um objeto Response a partir do envelope retornado pelo servidor.
+
+    Args:
+        result (dict): Envelope decodificado com as chaves 'status' e 'response'
+        url (str, optional): URL do destino original
+
+    Returns:
+        requests.Response: Resposta equivalente à do servidor de destino; o atributo
+                           timing tem os tempos do curl enviados pelo servidor (ou None)
+    """
+    response = requests.Response()
+    response.status_code = result.get('status', 500)
+    response.url = url
+    response.timing = result.get('timing')
+    if 'response' in result:
+        response._content = json.dumps(result['response']).encode('utf-8')
+    return response
+
+
+def parse_timing(value: Optional[str]) -> Optional[Dict[str, float]]:
+    """
+    Interpreta o header X-Shadow-Timing dos modos raw e stream.
+
+    Args:
+        value (str, optional): Valor do header (JSON com os tempos do curl em segundos)
+
+    Returns:
+        dict: Tempos do curl ou None se o header não existir ou for inválido
+    """
+    if not value:
+        return None
+    try:
+        timing = json.loads(value)
+    except ValueError:
+        return None
+    return timing if isinstance(timing, dict) else None
+
+
+def encode_payload(payload: Dict[str, Any], compress: bool = False) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serializa o envelope, comprimindo com gzip se for grande o suficiente.
+
+    Args:
+        payload (dict): Envelope da requisição
+        compress (bool): Se True, comprime envelopes a partir de COMPRESS_MIN_SIZE bytes
+
+    Returns:
+        tuple: (corpo, headers da requisição ao servidor)
+    """
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'content-type': 'application/json'}
+    if compress and len(body) >= COMPRESS_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=5)
+        headers['content-encoding'] = 'gzip'
+    return body, headers
+
+
+def build_passthrough_response(relay_response: requests.Response, url: Optional[str] = None,
+                               stream: bool = False) -> Optional[requests.Response]:
+    """
+    Cria um objeto Response a partir da resposta do modo raw ou stream do servidor.
+
+    Nesses modos o corpo é o corpo do destino, sem conversão; o status e os headers
+    do destino vêm nos headers X-Shadow-Status e X-Shadow-Headers.
+
+    Args:
+        relay_response (requests.Response): Resposta do servidor intermediário
+        url (str, optional): URL do destino original
+        stream (bool): Se True, o corpo não é lido; iter_content() e raw leem
+                       direto da conexão com o servidor
+
+    Returns:
+        requests.Response: Resposta equivalente à do servidor de destino, ou None
+                           se o servidor não respondeu no modo raw. O atributo timing
+                           tem os tempos do curl do header X-Shadow-Timing (ou None)
+    """
+    status = relay_response.headers.get('x-shadow-status')
+    if status is None:
+        return None
+
+    headers = CaseInsensitiveDict(json.loads(relay_response.headers.get('x-shadow-headers') or '{}'))
+
+    response = requests.Response()
+    response.status_code = int(status)
+    response.headers = headers
+    response.encoding = get_encoding_from_headers(headers)
+    response.url = url
+    response.timing = parse_timing(relay_response.headers.get('x-shadow-timing'))
+    if stream:
+        response.raw = relay_response.raw
+    else:
+        response._content = relay_response.content
+    return response
+
+
+def build_raw_response(status_code: int, content: bytes, url: Optional[str] = None) -> requests.Response:
+    """
+    Cria um objeto Response com o conteúdo bruto retornado pelo servidor.
+
+    Usado quando o servidor intermediário não devolve um envelope válido.
+
+    Args:
+        status_code (int): Status HTTP retornado pelo servidor intermediário
+        content (bytes): Corpo retornado pelo servidor intermediário
+        url (str, optional): URL do servidor intermediário
+
+    Returns:
+        requests.Response: Resposta com o conteúdo bruto
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response._content = content
+    return response
+
+
+def normalize_request(spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Normaliza a descrição de uma requisição usada nas operações em lote.
+
+    Args:
+        spec (str, dict): URL (requisição GET) ou dicionário com as chaves
+                          'url' e, opcionalmente, 'method', 'data' e 'params'
+
+    Returns:
+        dict: Dicionário com as chaves 'method', 'url', 'data' e 'params'
+
+    Raises:
+        ValueError: Se a requisição não tiver URL
+    """
+    if isinstance(spec, str):
+        return {'method': 'GET', 'url': spec, 'data': None, 'params': None}
+
+    if not spec.get('url'):
+        raise ValueError("Requisição sem URL")
+
+    return {
+        'method': spec.get('method', 'GET').upper(),
+        'url': spec['url'],
+        'data': spec.get('data'),
+        'params': spec.get('params')
+    }
+
+
+def build_error_response(message: str, url: Optional[str] = None, status_code: int = 502) -> requests.Response:
+    """
+    Cria um objeto Response representando uma falha de uma requisição do lote.
+
+    Args:
+        message (str): Descrição do erro
+        url (str, optional): URL do destino original
+        status_code (int): Status HTTP atribuído ao erro (default: 502)
+
+    Returns:
+        requests.Response: Resposta de erro, com a mensagem em 'reason'
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.reason = message
+    response._content = b''
+    return response
+
+
+def build_batch_response(item: Dict[str, Any], url: Optional[str] = None) -> requests.Response:
+    """
+    Cria um objeto Response a partir de um item do envelope de lote.
+
+    Args:
+        item (dict): Resultado de uma requisição do lote ('status' e 'response' ou 'error')
+        url (str, optional): URL do destino original
+
+    Returns:
+        requests.Response: Resposta equivalente à do servidor de destino
+    """
+    if 'error' in item:
+        return build_error_response(item['error'], url, item.get('status') or 502)
+    return build_response(item, url)
+
+
+def is_challenge_page(content: bytes) -> bool:
+    """
+    Verifica se o conteúdo é a página de desafio JavaScript do InfinityFree.
+
+    A página é retornada com status 200 no lugar do envelope quando o cookie
+    __test do servidor expira.
+
+    Args:
+        content (bytes): Corpo retornado pelo servidor intermediário
+
+    Returns:
+        bool: True se o conteúdo for a página de desafio
+    """
+    return b'slowAES' in content or (b'/aes.js' in content and b'__test' in content)
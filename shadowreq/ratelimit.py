@@ -0,0 +1,374 @@
+"""
+Limites de taxa por servidor intermediário e por host de destino.
+
+Cada limite é um token bucket: 'rate' requisições por segundo com rajadas de
+até 'burst' requisições. O RateLimiter escolhe, entre os servidores com saldo,
+o servidor da requisição (pela estratégia de seleção) e, se nenhum tiver saldo,
+coloca a requisição em uma fila por ordem de chegada até o próximo token, em
+vez de bloquear em um servidor específico.
+
+Respostas 429 (ou 503 com Retry-After) reduzem os limites: do servidor, quando
+é ele quem responde 429, ou do par servidor/destino, quando é o destino, já que
+o destino limita o IP do servidor e os outros servidores continuam livres.
+"""
+
+import email.utils
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Callable, List, Union, Tuple
+import requests
+
+# Limite: requisições por segundo ou {'rate': ..., 'burst': ...}
+LimitSpec = Union[float, int, Dict[str, float]]
+
+
+class RateLimitTimeout(requests.exceptions.RequestException):
+    """Nenhum servidor teve saldo para a requisição dentro do tempo máximo de espera."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Inicializa o token bucket, cheio.
+
+        Args:
+            rate (float): Tokens repostos por segundo
+            burst (float, optional): Capacidade do bucket. Se None, usa max(1, rate)
+        """
+        if rate <= 0:
+            raise ValueError(f"Taxa inválida: {rate}")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos até haver um token disponível (0 se já houver)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+def parse_limit(spec: LimitSpec) -> Tuple[float, Optional[float]]:
+    """
+    Interpreta a especificação de um limite.
+
+    Args:
+        spec (float, dict): Requisições por segundo ou {'rate': ..., 'burst': ...}
+
+    Returns:
+        tuple: (rate, burst)
+
+    Raises:
+        ValueError: Se a especificação for inválida
+    """
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        return float(spec), None
+    if isinstance(spec, dict) and 'rate' in spec:
+        return float(spec['rate']), spec.get('burst')
+    raise ValueError(f"Limite de taxa inválido: {spec!r}")
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Converte o header Retry-After (segundos ou data HTTP) em segundos de espera.
+
+    Args:
+        value (str, optional): Valor do header
+        now (float, optional): Horário atual (time.time()); default é o horário do sistema
+
+    Returns:
+        float: Segundos de espera, ou None se o header estiver ausente ou inválido
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment is None:
+        return None
+    return max(0.0, moment.timestamp() - (now if now is not None else time.time()))
+
+
+class RateLimiter:
+    def __init__(self, host_limits: Optional[Dict[str, LimitSpec]] = None,
+                 default_host_limit: Optional[LimitSpec] = None,
+                 max_wait: Optional[float] = None,
+                 penalty: float = 5.0):
+        """
+        Inicializa o limitador.
+
+        Os limites dos servidores vêm da chave 'rate_limit' de cada servidor no
+        servers.json (veja configure_relays); servidores sem a chave não têm limite.
+
+        Args:
+            host_limits (dict, optional): Limite por host de destino, somado entre todos os
+                                          servidores. Ex.: {'ip-api.com': {'rate': 0.75, 'burst': 45}}
+            default_host_limit (float, dict, optional): Limite dos hosts ausentes de host_limits.
+                                                        Se None, esses hosts não têm limite
+            max_wait (float, optional): Espera máxima na fila em segundos. Se None, espera sem limite
+            penalty (float): Suspensão em segundos após um 429 sem Retry-After
+        """
+        self.host_limits = {host.lower(): parse_limit(spec) for host, spec in (host_limits or {}).items()}
+        self.default_host_limit = parse_limit(default_host_limit) if default_host_limit is not None else None
+        self.max_wait = max_wait
+        self.penalty = penalty
+        self.relays: Dict[str, TokenBucket] = {}
+        self.hosts: Dict[str, TokenBucket] = {}
+        # Suspensões por 429: (servidor, None) suspende o servidor, (servidor, host) só o par
+        self._blocked: Dict[Tuple[str, Optional[str]], float] = {}
+        self._queue = deque()
+        self._tickets = 0
+        self.queued = 0  # Requisições que esperaram na fila
+        self.throttled = 0  # Respostas 429 recebidas
+        self._condition = threading.Condition()
+
+    def configure_relays(self, limits: Dict[str, Optional[LimitSpec]]):
+        """
+        Define os limites dos servidores.
+
+        Buckets de servidores com o mesmo limite são mantidos (com o saldo atual),
+        para que uma recarga da configuração não libere uma rajada.
+
+        Args:
+            limits (dict): Limite de cada servidor; None remove o limite
+        """
+        with self._condition:
+            relays = {}
+            for name, spec in limits.items():
+                if spec is None:
+                    continue
+                bucket = TokenBucket(*parse_limit(spec))
+                previous = self.relays.get(name)
+                if previous is not None and (previous.rate, previous.burst) == (bucket.rate, bucket.burst):
+                    bucket = previous
+                relays[name] = bucket
+            self.relays = relays
+            self._condition.notify_all()
+
+    def _host_bucket(self, host: str) -> Optional[TokenBucket]:
+        bucket = self.hosts.get(host)
+        if bucket is None:
+            limit = self.host_limits.get(host, self.default_host_limit)
+            if limit is None:
+                return None
+            bucket = self.hosts[host] = TokenBucket(*limit)
+        return bucket
+
+    def _relay_wait(self, name: str, host: Optional[str], now: float) -> float:
+        bucket = self.relays.get(name)
+        wait = bucket.wait_time(now) if bucket is not None else 0.0
+        for key in ((name, None), (name, host)):
+            until = self._blocked.get(key)
+            if until is not None:
+                if until <= now:
+                    del self._blocked[key]
+                else:
+                    wait = max(wait, until - now)
+        return wait
+
+    def _try_acquire(self, relays: List[str], host: Optional[str],
+                     choose: Callable[[List[str]], str], now: float) -> Tuple[Optional[str], float, bool]:
+        """
+        Escolhe e debita um servidor com saldo.
+
+        Returns:
+            tuple: (servidor ou None, espera até o próximo saldo, se o limite do host impediu)
+        """
+        host_bucket = self._host_bucket(host) if host is not None else None
+        host_wait = host_bucket.wait_time(now) if host_bucket is not None else 0.0
+
+        waits = {name: self._relay_wait(name, host, now) for name in relays}
+        available = [name for name, wait in waits.items() if wait == 0.0]
+        if host_wait or not available:
+            return None, max(host_wait, min(waits.values())), host_wait > 0.0
+
+        name = choose(available)
+        if name in self.relays:
+            self.relays[name].take(now)
+        if host_bucket is not None:
+            host_bucket.take(now)
+        return name, 0.0, False
+
+    def _may_try(self, host: Optional[str], ahead) -> bool:
+        """
+        Verifica se a requisição pode tentar antes das que estão na frente.
+
+        Só passa à frente de requisições para outros hosts que estão esperando o
+        limite do próprio host; as demais são atendidas por ordem de chegada.
+        """
+        return all(waiter[1] != host and waiter[2] for waiter in ahead)
+
+    def acquire(self, relays: List[str], host: Optional[str],
+                choose: Callable[[List[str]], str]) -> str:
+        """
+        Escolhe o servidor da requisição respeitando os limites.
+
+        Se algum servidor tiver saldo, retorna na hora; senão a requisição entra na
+        fila e é atendida por ordem de chegada quando surgir saldo. Requisições que
+        só esperam o limite do host de destino não atrasam as de outros hosts.
+
+        Args:
+            relays (list): Servidores candidatos (nunca vazia)
+            host (str, optional): Host de destino; None ignora os limites por host
+            choose (callable): Função que escolhe um servidor entre os que têm saldo
+
+        Returns:
+            str: Nome do servidor escolhido, já debitado
+
+        Raises:
+            RateLimitTimeout: Se a espera exceder max_wait
+        """
+        host = host.lower() if host else None
+        with self._condition:
+            if self._may_try(host, self._queue):
+                name, _, _ = self._try_acquire(relays, host, choose, time.monotonic())
+                if name is not None:
+                    return name
+
+            waiter = [self._tickets, host, False]  # [ordem, host, esperando só o host]
+            self._tickets += 1
+            self._queue.append(waiter)
+            self.queued += 1
+            deadline = time.monotonic() + self.max_wait if self.max_wait is not None else None
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None  # Sem vez para tentar: espera ser avisada
+                    position = self._queue.index(waiter)
+                    if self._may_try(host, itertools.islice(self._queue, position)):
+                        name, wait, host_blocked = self._try_acquire(relays, host, choose, now)
+                        if name is not None:
+                            return name
+                    else:
+                        host_bucket = self._host_bucket(host) if host is not None else None
+                        host_blocked = host_bucket is not None and host_bucket.wait_time(now) > 0.0
+                    if host_blocked != waiter[2]:
+                        waiter[2] = host_blocked
+                        self._condition.notify_all()
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise RateLimitTimeout(f"Sem saldo de requisições para {host or 'o lote'} "
+                                                   f"após {self.max_wait:.1f}s na fila")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                self._queue.remove(waiter)
+                self._condition.notify_all()
+
+    def try_acquire(self, relays: List[str], host: Optional[str],
+                    choose: Callable[[List[str]], str]) -> Optional[str]:
+        """
+        Como acquire, mas sem esperar: retorna None se não houver saldo ou houver fila.
+
+        Args:
+            relays (list): Servidores candidatos (nunca vazia)
+            host (str, optional): Host de destino
+            choose (callable): Função que escolhe um servidor entre os que têm saldo
+
+        Returns:
+            str: Nome do servidor escolhido, ou None
+        """
+        host = host.lower() if host else None
+        with self._condition:
+            if not self._may_try(host, self._queue):
+                return None
+            name, _, _ = self._try_acquire(relays, host, choose, time.monotonic())
+            return name
+
+    def has_capacity(self, relay: str) -> bool:
+        """
+        Verifica, sem debitar, se o servidor tem saldo agora.
+
+        Usado por tarefas de fundo (como o pré-aquecimento de conexões) que não devem
+        consumir o saldo das requisições nem passar à frente da fila.
+
+        Args:
+            relay (str): Nome do servidor
+
+        Returns:
+            bool: True se não houver fila e o servidor tiver saldo e não estiver suspenso
+        """
+        with self._condition:
+            return not self._queue and self._relay_wait(relay, None, time.monotonic()) == 0.0
+
+    def feedback(self, relay: str, host: Optional[str], relay_status: int,
+                 status: Optional[int] = None, retry_after: Optional[str] = None):
+        """
+        Ajusta os limites a partir da resposta.
+
+        Um 429 (ou 503 com Retry-After) do servidor suspende o servidor; do destino,
+        suspende o par servidor/destino. A suspensão dura o Retry-After ou penalty.
+
+        Args:
+            relay (str): Nome do servidor
+            host (str, optional): Host de destino
+            relay_status (int): Status HTTP da resposta do servidor
+            status (int, optional): Status do destino
+            retry_after (str, optional): Header Retry-After da resposta que tem o 429
+        """
+        relay_throttled = relay_status == 429 or (relay_status == 503 and retry_after)
+        origin_throttled = status == 429 or (status == 503 and retry_after)
+        if not (relay_throttled or origin_throttled):
+            return
+
+        delay = parse_retry_after(retry_after)
+        until = time.monotonic() + (delay if delay is not None else self.penalty)
+        with self._condition:
+            self.throttled += 1
+            if relay_throttled:
+                key = (relay, None)
+                bucket = self.relays.get(relay)
+                if bucket is not None:
+                    bucket.tokens = min(bucket.tokens, 0.0)
+            elif host:
+                key = (relay, host.lower())
+                host_bucket = self._host_bucket(host.lower())
+                if host_bucket is not None:
+                    # O destino também conta as requisições de outros servidores: esvazia o saldo
+                    host_bucket.tokens = min(host_bucket.tokens, 0.0)
+            else:
+                return
+            self._blocked[key] = max(self._blocked.get(key, 0.0), until)
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna o estado dos limites.
+
+        Returns:
+            dict: 'relays' e 'hosts' (rate, burst e tokens disponíveis), 'blocked' (segundos
+                  restantes de cada suspensão por 429, como 'servidor' ou 'servidor/host'),
+                  'waiting' (fila atual), 'queued' e 'throttled' (totais)
+        """
+        now = time.monotonic()
+
+        def state(bucket: TokenBucket) -> Dict[str, float]:
+            bucket._refill(now)
+            return {'rate': bucket.rate, 'burst': bucket.burst, 'tokens': round(bucket.tokens, 3)}
+
+        with self._condition:
+            return {
+                'relays': {name: state(bucket) for name, bucket in self.relays.items()},
+                'hosts': {host: state(bucket) for host, bucket in self.hosts.items()},
+                'blocked': {(f"{relay}/{host}" if host else relay): round(until - now, 3)
+                            for (relay, host), until in self._blocked.items() if until > now},
+                'waiting': len(self._queue),
+                'queued': self.queued,
+                'throttled': self.throttled,
+            }
@@ -0,0 +1,522 @@
+"""
+Servidor intermediário em Python (asyncio), compatível com o api.php.
+
+Usado pelo comando 'shadowreq serve'. Fala o mesmo protocolo do api.php
+(envelope JSON, lotes, modos raw e stream, tempos do destino e corpo enviado
+em partes), então pode entrar no servers.json ao lado dos servidores PHP.
+Diferente do api.php, mantém um pool de conexões persistentes com os destinos,
+limita as requisições simultâneas, pode guardar respostas em cache e aceita
+só clientes com o token compartilhado:
+
+    RelayServer(host='0.0.0.0', port=8080, token='segredo').run()
+
+Requer o pacote opcional aiohttp: pip install shadowreq[async]
+"""
+
+import asyncio
+import hmac
+import json
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
+from urllib.parse import urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from .cache import ResponseCache
+from .logger import ShadowLogger
+from .protocol import STREAM_CONTENT_TYPE, STREAM_CHUNK_SIZE, MAX_BATCH_SIZE, SKIPPED_HEADERS
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # pragma: no cover - dependência opcional
+    aiohttp = None
+    web = None
+
+# Header com o token compartilhado entre os clientes e o servidor
+TOKEN_HEADER = 'X-Shadow-Token'
+
+# Tamanho máximo da linha do envelope nas requisições com corpo (mesmo limite do api.php)
+MAX_ENVELOPE_SIZE = 1024 * 1024
+
+# Métodos aceitos, como no createHandle() do api.php
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+# Tempos de uma resposta servida do cache
+CACHED_TIMING = {'namelookup': 0.0, 'connect': 0.0, 'starttransfer': 0.0, 'total': 0.0}
+
+
+def http_build_query(params: Any, prefix: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Converte os params do envelope em pares (nome, valor) como o http_build_query() do PHP.
+
+    Listas e dicionários aninhados viram nome[chave]; True e False viram '1' e '0';
+    valores None são omitidos.
+
+    Args:
+        params: Dicionário (ou lista) de parâmetros
+        prefix (str, optional): Nome do parâmetro pai, nas chamadas recursivas
+
+    Returns:
+        list: Pares (nome, valor)
+    """
+    if isinstance(params, dict):
+        items = params.items()
+    elif isinstance(params, (list, tuple)):
+        items = enumerate(params)
+    else:
+        return []
+
+    pairs = []
+    for key, value in items:
+        name = f"{prefix}[{key}]" if prefix is not None else str(key)
+        if isinstance(value, (dict, list, tuple)):
+            pairs.extend(http_build_query(value, name))
+        elif value is None:
+            continue
+        elif isinstance(value, bool):
+            pairs.append((name, '1' if value else '0'))
+        else:
+            pairs.append((name, str(value)))
+    return pairs
+
+
+class _Body:
+    """Corpo de uma requisição com corpo, lido do cliente em partes durante o envio ao destino."""
+
+    def __init__(self, info: Dict[str, Any], head: bytes, content: 'aiohttp.StreamReader'):
+        self.content_type = info.get('content_type')
+        self.length = info.get('length')
+        self._head = head
+        self._content = content
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        if self._head:
+            yield self._head
+        async for chunk in self._content.iter_chunked(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+class RelayServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080,
+                 token: Optional[str] = None,
+                 max_concurrency: int = 100,
+                 max_per_host: int = 0,
+                 timeout: float = 60.0,
+                 cache: Optional[ResponseCache] = None,
+                 gzip: bool = True,
+                 gzip_min_size: int = 1024,
+                 dns_ttl: Optional[float] = 300.0,
+                 max_request_size: int = 16 * 1024 * 1024):
+        """
+        Inicializa o servidor intermediário.
+
+        Args:
+            host (str): Endereço de escuta
+            port (int): Porta de escuta (0 escolhe uma porta livre)
+            token (str, optional): Token exigido no header X-Shadow-Token. Se None, aceita qualquer cliente
+            max_concurrency (int): Número máximo de requisições simultâneas aos destinos; as demais esperam
+            max_per_host (int): Número máximo de conexões com um mesmo destino (0 para sem limite)
+            timeout (float): Timeout de leitura das respostas dos destinos em segundos
+            cache (ResponseCache, optional): Cache das respostas dos destinos, criado com shared=True
+                                             (é usado por todos os clientes). Se None, não usa cache
+            gzip (bool): Se True, comprime as respostas quando o cliente aceita gzip (exceto no modo stream)
+            gzip_min_size (int): Tamanho mínimo da resposta para comprimir em bytes
+            dns_ttl (float, optional): Tempo em segundos que os endereços dos destinos ficam em cache.
+                                       Se None, resolve o nome a cada nova conexão
+            max_request_size (int): Tamanho máximo do envelope JSON recebido em bytes
+                                    (o corpo das requisições com corpo não tem limite)
+
+        Raises:
+            ImportError: Se o aiohttp não estiver instalado
+            ValueError: Se o cache não tiver sido criado com shared=True
+        """
+        if aiohttp is None:
+            raise ImportError("RelayServer requer o pacote aiohttp: pip install shadowreq[async]")
+        if cache is not None and not cache.shared:
+            raise ValueError("O cache do RelayServer é compartilhado entre clientes: use ResponseCache(shared=True)")
+
+        self.host = host
+        self.port = port
+        self.token = token
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.gzip = gzip
+        self.gzip_min_size = gzip_min_size
+        self.dns_ttl = dns_ttl
+        self.max_request_size = max_request_size
+        self.logger = ShadowLogger()
+
+        # Criados dentro do event loop, ao iniciar
+        self._session = None
+        self._semaphore = None
+        self._runner = None
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._loop = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL base do servidor, para o servers.json."""
+        return f"http://{self.host}:{self.port}"
+
+    def write_config(self, path: str, name: str = 'relay1'):
+        """
+        Grava um servers.json que usa este servidor.
+
+        Args:
+            path (str): Caminho do arquivo
+            name (str): Nome do servidor na configuração
+        """
+        headers = {TOKEN_HEADER: self.token} if self.token else {}
+        with open(path, 'w') as f:
+            json.dump({name: {'urls': [self.url], 'headers': headers}}, f, indent=4)
+
+    def make_app(self) -> 'web.Application':
+        """Cria a aplicação aiohttp; aceita o POST do envelope em qualquer caminho (inclusive /api.php)."""
+        app = web.Application(client_max_size=self.max_request_size)
+        app.router.add_route('*', '/{path:.*}', self._handle)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_per_host,
+                                         use_dns_cache=self.dns_ttl is not None, ttl_dns_cache=self.dns_ttl)
+        trace = aiohttp.TraceConfig()
+        trace.on_dns_resolvehost_end.append(self._on_dns_end)
+        trace.on_connection_create_end.append(self._on_connect_end)
+        # Sem cookies compartilhados entre clientes e sem User-Agent próprio, como o curl do api.php
+        self._session = aiohttp.ClientSession(
+            connector=connector, trace_configs=[trace], cookie_jar=aiohttp.DummyCookieJar(),
+            skip_auto_headers=('User-Agent',),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=min(10.0, self.timeout),
+                                          sock_read=self.timeout))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _on_cleanup(self, app):
+        await self._session.close()
+
+    @staticmethod
+    async def _on_dns_end(session, context, params):
+        timing = context.trace_request_ctx
+        timing['namelookup'] = time.perf_counter() - timing['started']
+
+    @staticmethod
+    async def _on_connect_end(session, context, params):
+        timing = context.trace_request_ctx
+        timing['connect'] = time.perf_counter() - timing['started']
+
+    async def _start_site(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Com a porta 0, usa a porta escolhida pelo sistema
+        self.port = self._runner.addresses[0][1]
+        self.logger.info("Servidor intermediário em %s", self.url)
+
+    async def serve_forever(self):
+        """Atende as requisições até a tarefa ser cancelada."""
+        await self._start_site()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self._runner.cleanup()
+
+    def run(self):
+        """Atende as requisições no event loop da thread atual até Ctrl+C."""
+        asyncio.run(self.serve_forever())
+
+    def start(self) -> 'RelayServer':
+        """Inicia o servidor em uma thread de fundo (útil como servidor local em testes)."""
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_site())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='shadowreq-relay', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Encerra o servidor iniciado com start()."""
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _authorized(self, request: 'web.Request') -> bool:
+        if not self.token:
+            return True
+        return hmac.compare_digest(request.headers.get(TOKEN_HEADER, '').encode('utf-8'),
+                                   self.token.encode('utf-8'))
+
+    def _compress(self, request: 'web.Request', response: 'web.Response', size: int):
+        if self.gzip and size >= self.gzip_min_size and 'gzip' in request.headers.get('accept-encoding', ''):
+            response.enable_compression(web.ContentCoding.gzip)
+
+    def _json(self, request: 'web.Request', result: Dict[str, Any], status: int = 200) -> 'web.Response':
+        body = json.dumps(result).encode('utf-8')
+        response = web.Response(body=body, status=status, content_type='application/json')
+        self._compress(request, response, len(body))
+        return response
+
+    async def _read_stream_envelope(self, request: 'web.Request') -> Tuple[Any, Optional[_Body]]:
+        """Lê a linha do envelope de uma requisição com corpo; o resto fica para o envio ao destino."""
+        buffer = b''
+        while b'\n' not in buffer:
+            chunk = await request.content.readany()
+            if not chunk:
+                break
+            buffer += chunk
+            if len(buffer) > MAX_ENVELOPE_SIZE and b'\n' not in buffer[:MAX_ENVELOPE_SIZE]:
+                return None, None
+
+        line, _, head = buffer.partition(b'\n')
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None, None
+        if not isinstance(data, dict):
+            return None, None
+        info = data.get('body') if isinstance(data.get('body'), dict) else {}
+        return data, _Body(info, head, request.content)
+
+    async def _handle(self, request: 'web.Request') -> 'web.StreamResponse':
+        if request.method != 'POST':
+            return self._json(request, {'error': 'Invalid request method'})
+        if not self._authorized(request):
+            self.logger.warning("Requisição sem token válido de %s", request.remote)
+            return self._json(request, {'error': 'Invalid token'}, status=401)
+
+        body = None
+        if request.content_type == STREAM_CONTENT_TYPE:
+            data, body = await self._read_stream_envelope(request)
+        else:
+            # O aiohttp já descomprime envelopes enviados com Content-Encoding: gzip
+            try:
+                data = json.loads(await request.read())
+            except ValueError:
+                data = None
+
+        # Modo lote: várias requisições em uma única chamada
+        if body is None and isinstance(data, dict) and 'batch' in data:
+            return self._json(request, await self._handle_batch(data['batch']))
+
+        if not isinstance(data, dict) or 'url' not in data or 'method' not in data:
+            return self._json(request, {'error': 'URL and method are required'})
+
+        url = data['url']
+        method = str(data['method']).upper()
+        params = data.get('params') or {}
+        if method not in METHODS:
+            return self._json(request, {'error': 'Invalid HTTP method'})
+
+        mode = data.get('mode')
+        if mode == 'stream':
+            return await self._handle_stream(request, method, url, params, body)
+
+        try:
+            status, content, headers, timing = await self._fetch(method, url, params, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.logger.warning("Erro na requisição a %s: %s", url, _describe(e))
+            return self._json(request, {'status': 0, 'error': _describe(e)})
+
+        if mode == 'raw':
+            response = web.Response(body=content, content_type='application/octet-stream',
+                                    headers=_shadow_headers(status, headers, timing))
+            self._compress(request, response, len(content))
+            return response
+        return self._json(request, {'status': status, 'response': _decode_json(content), 'timing': timing})
+
+    async def _handle_batch(self, batch: Any) -> Dict[str, Any]:
+        if not isinstance(batch, list):
+            return {'error': 'Batch must be a list of requests'}
+        if len(batch) > MAX_BATCH_SIZE:
+            return {'error': f'Batch too large (max {MAX_BATCH_SIZE})'}
+        return {'batch': list(await asyncio.gather(*(self._batch_item(item) for item in batch)))}
+
+    async def _batch_item(self, item: Any) -> Dict[str, Any]:
+        if not isinstance(item, dict) or 'url' not in item or 'method' not in item:
+            return {'error': 'URL and method are required'}
+        method = str(item['method']).upper()
+        if method not in METHODS:
+            return {'error': 'Invalid HTTP method'}
+
+        try:
+            status, content, _, timing = await self._fetch(method, item['url'], item.get('params') or {})
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return {'status': 0, 'error': _describe(e)}
+        return {'status': status, 'response': _decode_json(content), 'timing': timing}
+
+    def _request_kwargs(self, method: str, url: str, params: Any, body: Optional[_Body]) -> Dict[str, Any]:
+        """Argumentos da requisição ao destino, com os params codificados como no createHandle() do api.php."""
+        pairs = http_build_query(params)
+        if body is not None:
+            # Com corpo, os params vão na query string e o corpo é repassado sem conversão
+            headers = {}
+            if body.content_type:
+                headers['Content-Type'] = body.content_type
+            if body.length is not None:
+                headers['Content-Length'] = str(body.length)
+            return {'method': method, 'url': url, 'params': pairs or None, 'data': body.chunks(),
+                    'headers': headers, 'allow_redirects': False}
+
+        kwargs = {'method': method, 'url': url, 'allow_redirects': False}
+        if method == 'GET':
+            kwargs['params'] = pairs or None
+        elif method != 'DELETE' or pairs:
+            kwargs['data'] = urlencode(pairs)
+            kwargs['headers'] = {'Content-Type': 'application/x-www-form-urlencoded'}
+        return kwargs
+
+    async def _fetch(self, method: str, url: str, params: Any,
+                     body: Optional[_Body] = None) -> Tuple[int, bytes, Dict[str, str], Dict[str, float]]:
+        """
+        Faz a requisição ao destino, usando o cache quando configurado.
+
+        Requisições idênticas simultâneas que podem ir para o cache compartilham uma única
+        requisição ao destino.
+
+        Returns:
+            tuple: (status, corpo, headers, tempos)
+        """
+        if self.cache is None or body is not None or not self.cache.allows(method):
+            return await self._fetch_upstream(method, url, params, body)
+
+        key = ResponseCache.make_key(method, url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh(time.time()):
+            self.logger.debug("Cache hit: %s", url)
+            return entry.status_code, entry.content, dict(entry.headers), dict(CACHED_TIMING)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._fetch_upstream(method, url, params)
+            status, content, headers, _ = result
+            response = requests.Response()
+            response.status_code = status
+            response._content = content
+            response.headers = CaseInsensitiveDict(headers)
+            response.url = url
+            self.cache.store(key, response)
+            flight.set_result(result)
+            return result
+        except Exception as e:
+            flight.set_exception(e)
+            # Evita o aviso de exceção não lida quando ninguém esperava pela mesma requisição
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+            if not flight.done():
+                # Cancelada (o cliente desconectou): quem esperava também é cancelado
+                flight.cancel()
+
+    async def _fetch_upstream(self, method: str, url: str, params: Any,
+                              body: Optional[_Body] = None) -> Tuple[int, bytes, Dict[str, str], Dict[str, float]]:
+        timing = {'started': time.perf_counter(), 'namelookup': 0.0, 'connect': 0.0}
+        async with self._semaphore:
+            async with self._session.request(trace_request_ctx=timing,
+                                             **self._request_kwargs(method, url, params, body)) as upstream:
+                starttransfer = time.perf_counter() - timing['started']
+                content = await upstream.read()
+                timing = _finish_timing(timing, starttransfer)
+                self.logger.debug("%s %s -> %s (%.0f ms)", method, url, upstream.status, timing['total'] * 1000)
+                return upstream.status, content, _collect_headers(upstream), timing
+
+    async def _handle_stream(self, request: 'web.Request', method: str, url: str, params: Any,
+                             body: Optional[_Body]) -> 'web.StreamResponse':
+        """Repassa o corpo do destino em partes, à medida que chega, como o makeStreamRequest() do api.php."""
+        timing = {'started': time.perf_counter(), 'namelookup': 0.0, 'connect': 0.0}
+        response = None
+        try:
+            async with self._semaphore:
+                async with self._session.request(trace_request_ctx=timing,
+                                                 **self._request_kwargs(method, url, params, body)) as upstream:
+                    starttransfer = time.perf_counter() - timing['started']
+                    async for chunk in upstream.content.iter_any():
+                        if response is None:
+                            # O corpo ainda não terminou: 'total' é o tempo até a primeira parte
+                            response = await self._start_stream(request, upstream, _finish_timing(timing, starttransfer))
+                        await response.write(chunk)
+                    if response is None:
+                        # Resposta sem corpo
+                        response = await self._start_stream(request, upstream, _finish_timing(timing, starttransfer))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.logger.warning("Erro na requisição a %s: %s", url, _describe(e))
+            if response is None:
+                return self._json(request, {'status': 0, 'error': _describe(e)})
+            # Os headers já foram enviados: fecha a conexão para o cliente ver a resposta incompleta
+            request.transport.close()
+            return response
+
+        await response.write_eof()
+        return response
+
+    async def _start_stream(self, request: 'web.Request', upstream: 'aiohttp.ClientResponse',
+                            timing: Dict[str, float]) -> 'web.StreamResponse':
+        headers = _shadow_headers(upstream.status, _collect_headers(upstream), timing)
+        headers['X-Accel-Buffering'] = 'no'
+        response = web.StreamResponse(headers=headers)
+        response.content_type = 'application/octet-stream'
+        await response.prepare(request)
+        return response
+
+
+def _finish_timing(timing: Dict[str, float], starttransfer: float) -> Dict[str, float]:
+    """Tempos no formato do curlTiming() do api.php, cumulativos desde o início da requisição."""
+    return {
+        'namelookup': timing['namelookup'],
+        'connect': timing['connect'],
+        'starttransfer': starttransfer,
+        'total': time.perf_counter() - timing['started'],
+    }
+
+
+def _collect_headers(upstream: 'aiohttp.ClientResponse') -> Dict[str, str]:
+    """Headers do destino sem os headers de conexão; valores repetidos são unidos com ', '."""
+    headers = {}
+    for name, value in upstream.headers.items():
+        name = name.lower()
+        if name not in SKIPPED_HEADERS:
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+def _shadow_headers(status: int, headers: Dict[str, str], timing: Dict[str, float]) -> Dict[str, str]:
+    return {
+        'X-Shadow-Status': str(status),
+        'X-Shadow-Headers': json.dumps(headers),
+        'X-Shadow-Timing': json.dumps(timing),
+    }
+
+
+def _decode_json(content: bytes) -> Any:
+    # Como o json_decode() do api.php: corpo que não é JSON vira null
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def _describe(error: BaseException) -> str:
+    return str(error) or type(error).__name__
@@ -0,0 +1,177 @@
+"""
+Políticas de retentativa e de requisições duplicadas (hedging) entre servidores.
+"""
+
+import functools
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional, Iterable, Tuple, Type
+import requests
+
+# Métodos que podem ser repetidos sem efeitos colaterais
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3,
+                 backoff_factor: float = 0.5,
+                 max_backoff: float = 10.0,
+                 jitter: bool = True,
+                 retry_on_status: Iterable[int] = (429, 500, 502, 503, 504),
+                 retry_on_exceptions: Tuple[Type[BaseException], ...] = (
+                     requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+                 methods: Optional[Iterable[str]] = IDEMPOTENT_METHODS):
+        """
+        Inicializa a política de retentativa.
+
+        Cada nova tentativa é feita em um servidor diferente dos que já falharam.
+
+        Args:
+            max_attempts (int): Número máximo de tentativas (incluindo a primeira)
+            backoff_factor (float): Espera base em segundos; dobra a cada tentativa
+            max_backoff (float): Espera máxima entre tentativas em segundos
+            jitter (bool): Se True, sorteia a espera entre 0 e o valor calculado
+            retry_on_status (iterable): Status do destino que provocam nova tentativa
+            retry_on_exceptions (tuple): Exceções que provocam nova tentativa
+            methods (iterable, optional): Métodos que podem ser repetidos. Se None, todos
+        """
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on_status = frozenset(retry_on_status)
+        self.retry_on_exceptions = tuple(retry_on_exceptions)
+        self.methods = frozenset(m.upper() for m in methods) if methods is not None else None
+
+    def allows(self, method: str) -> bool:
+        """Verifica se requisições com o método podem ser repetidas."""
+        return self.methods is None or method.upper() in self.methods
+
+    def should_retry_status(self, status_code: int) -> bool:
+        """Verifica se o status do destino justifica uma nova tentativa."""
+        return status_code in self.retry_on_status
+
+    def should_retry_exception(self, error: BaseException) -> bool:
+        """Verifica se a exceção justifica uma nova tentativa."""
+        return isinstance(error, self.retry_on_exceptions)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Calcula a espera antes da próxima tentativa (backoff exponencial).
+
+        Args:
+            attempt (int): Número da tentativa que acabou de falhar (começa em 1)
+
+        Returns:
+            float: Espera em segundos
+        """
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class HedgePolicy:
+    def __init__(self, percentile: float = 95.0,
+                 min_delay: float = 0.05,
+                 max_delay: Optional[float] = None,
+                 initial_delay: float = 1.0,
+                 window: int = 200,
+                 methods: Iterable[str] = IDEMPOTENT_METHODS):
+        """
+        Inicializa a política de hedging.
+
+        Se o primeiro servidor não responder dentro do percentil de latência
+        configurado, a mesma requisição é enviada a um segundo servidor e a
+        primeira resposta válida é usada.
+
+        Args:
+            percentile (float): Percentil das latências recentes usado como espera (0 a 100)
+            min_delay (float): Espera mínima antes da segunda requisição em segundos
+            max_delay (float, optional): Espera máxima antes da segunda requisição em segundos
+            initial_delay (float): Espera usada enquanto não há latências suficientes
+            window (int): Número de latências recentes consideradas
+            methods (iterable): Métodos que podem ser duplicados
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.methods = frozenset(m.upper() for m in methods)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allows(self, method: str) -> bool:
+        """Verifica se requisições com o método podem ser duplicadas."""
+        return method.upper() in self.methods
+
+    def record(self, latency: float):
+        """
+        Registra a latência de uma requisição bem-sucedida.
+
+        Args:
+            latency (float): Duração da requisição em segundos
+        """
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self) -> float:
+        """
+        Calcula a espera antes de enviar a segunda requisição.
+
+        Returns:
+            float: Espera em segundos
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+
+        if len(samples) < 10:
+            delay = self.initial_delay
+        else:
+            index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+            delay = samples[index]
+
+        delay = max(self.min_delay, delay)
+        if self.max_delay is not None:
+            delay = min(self.max_delay, delay)
+        return delay
+
+
+def retry(policy: Optional[RetryPolicy] = None):
+    """
+    Decorador que repete a função conforme a política de retentativa.
+
+    Repete quando a função levanta uma das exceções da política ou retorna um
+    requests.Response com um dos status da política.
+
+    Args:
+        policy (RetryPolicy, optional): Política de retentativa. Se None, usa a padrão
+
+    Returns:
+        callable: Decorador
+    """
+    policy = policy or RetryPolicy()
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, policy.max_attempts + 1):
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if attempt < policy.max_attempts and policy.should_retry_exception(e):
+                        time.sleep(policy.backoff(attempt))
+                        continue
+                    raise
+
+                if (attempt < policy.max_attempts and isinstance(result, requests.Response)
+                        and policy.should_retry_status(result.status_code)):
+                    time.sleep(policy.backoff(attempt))
+                    continue
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,280 @@
+"""
+Estratégias de seleção de servidores intermediários.
+
+Cada estratégia mantém estatísticas por servidor (latência e taxa de erros com
+média móvel exponencial) e um circuit breaker que tira de rodízio os servidores
+que falham seguidamente, testando-os de novo depois de um tempo (half-open).
+"""
+
+import random
+import threading
+import time
+from typing import Optional, Dict, List, Iterable, Union
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ServerStats:
+    """Estatísticas e estado do circuit breaker de um servidor."""
+
+    def __init__(self):
+        self.latency = None  # Latência média (EWMA) em segundos
+        self.error_rate = 0.0  # Taxa de erros (EWMA) entre 0 e 1
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+
+class SelectionStrategy:
+    """
+    Classe base das estratégias de seleção.
+
+    As subclasses implementam apenas _choose; o registro de estatísticas e o
+    circuit breaker são comuns a todas.
+    """
+
+    name = None
+
+    def __init__(self, alpha: float = 0.3, failure_threshold: int = 5, recovery_time: float = 30.0):
+        """
+        Inicializa a estratégia.
+
+        Args:
+            alpha (float): Peso da amostra mais recente nas médias móveis (0 a 1)
+            failure_threshold (int): Falhas seguidas que abrem o circuit breaker
+            recovery_time (float): Segundos até testar de novo um servidor com o circuito aberto
+        """
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, server_name: str) -> ServerStats:
+        stats = self.stats.get(server_name)
+        if stats is None:
+            stats = self.stats[server_name] = ServerStats()
+        return stats
+
+    def select(self, server_names: List[str], exclude: Optional[Iterable[str]] = None) -> str:
+        """
+        Escolhe o servidor para a próxima requisição.
+
+        Servidores com o circuito aberto são ignorados, exceto para uma requisição
+        de teste depois de recovery_time. Se nenhum servidor estiver disponível,
+        escolhe entre todos para não interromper as requisições.
+
+        Args:
+            server_names (list): Nomes dos servidores configurados
+            exclude (iterable, optional): Servidores a evitar nesta escolha
+
+        Returns:
+            str: Nome do servidor escolhido
+        """
+        exclude = set(exclude or ())
+        now = time.monotonic()
+
+        with self._lock:
+            candidates = [name for name in server_names if name not in exclude] or list(server_names)
+            available = []
+
+            for name in candidates:
+                stats = self._get_stats(name)
+                if stats.state == OPEN and now - stats.opened_at >= self.recovery_time:
+                    stats.state = HALF_OPEN
+                    stats.probing = False
+
+                if stats.state == CLOSED:
+                    available.append(name)
+                elif stats.state == HALF_OPEN and not stats.probing:
+                    # Envia uma única requisição de teste ao servidor em recuperação
+                    stats.probing = True
+                    return name
+
+            return self._choose(available or candidates)
+
+    def available(self, server_names: List[str]) -> List[str]:
+        """
+        Filtra os servidores que podem receber requisições agora.
+
+        Args:
+            server_names (list): Nomes dos servidores
+
+        Returns:
+            list: Servidores com o circuito fechado ou prontos para o teste de recuperação;
+                  todos, se nenhum estiver
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = []
+            for name in server_names:
+                stats = self.stats.get(name)
+                if (stats is None or stats.state == CLOSED
+                        or (stats.state == OPEN and now - stats.opened_at >= self.recovery_time)
+                        or (stats.state == HALF_OPEN and not stats.probing)):
+                    available.append(name)
+            return available or list(server_names)
+
+    def _choose(self, candidates: List[str]) -> str:
+        """
+        Escolhe um servidor entre os candidatos disponíveis.
+
+        Args:
+            candidates (list): Servidores disponíveis (nunca vazia)
+
+        Returns:
+            str: Nome do servidor escolhido
+        """
+        raise NotImplementedError
+
+    def record_success(self, server_name: str, latency: float):
+        """
+        Registra uma requisição bem-sucedida.
+
+        Args:
+            server_name (str): Nome do servidor
+            latency (float): Duração da requisição em segundos
+        """
+        with self._lock:
+            stats = self._get_stats(server_name)
+            stats.requests += 1
+            stats.latency = latency if stats.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * stats.latency)
+            stats.error_rate = (1 - self.alpha) * stats.error_rate
+            stats.consecutive_failures = 0
+            stats.state = CLOSED
+            stats.probing = False
+
+    def record_failure(self, server_name: str, latency: Optional[float] = None):
+        """
+        Registra uma requisição que falhou (erro de rede, timeout ou resposta inválida).
+
+        Args:
+            server_name (str): Nome do servidor
+            latency (float, optional): Duração da requisição em segundos
+        """
+        with self._lock:
+            stats = self._get_stats(server_name)
+            stats.requests += 1
+            stats.failures += 1
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * stats.latency)
+            stats.error_rate = self.alpha + (1 - self.alpha) * stats.error_rate
+            stats.consecutive_failures += 1
+            stats.probing = False
+
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+                stats.state = OPEN
+                stats.opened_at = time.monotonic()
+
+    def score(self, server_name: str) -> float:
+        """
+        Custo estimado de usar o servidor (menor é melhor).
+
+        Args:
+            server_name (str): Nome do servidor
+
+        Returns:
+            float: Latência média penalizada pela taxa de erros
+        """
+        stats = self._get_stats(server_name)
+        latency = stats.latency or 0.0
+        return latency * (1 + 10 * stats.error_rate) + stats.error_rate
+
+    def snapshot(self) -> Dict[str, Dict[str, Union[float, int, str, None]]]:
+        """
+        Retorna uma cópia das estatísticas de cada servidor.
+
+        Returns:
+            dict: Estatísticas por nome de servidor
+        """
+        with self._lock:
+            return {
+                name: {
+                    'latency': stats.latency,
+                    'error_rate': stats.error_rate,
+                    'requests': stats.requests,
+                    'failures': stats.failures,
+                    'state': stats.state,
+                }
+                for name, stats in self.stats.items()
+            }
+
+
+class RandomStrategy(SelectionStrategy):
+    """Escolhe um servidor aleatório."""
+
+    name = 'random'
+
+    def _choose(self, candidates: List[str]) -> str:
+        return random.choice(candidates)
+
+
+class RoundRobinStrategy(SelectionStrategy):
+    """Percorre os servidores em ordem."""
+
+    name = 'round_robin'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter = 0
+
+    def _choose(self, candidates: List[str]) -> str:
+        name = candidates[self._counter % len(candidates)]
+        self._counter += 1
+        return name
+
+
+class PowerOfTwoStrategy(SelectionStrategy):
+    """Sorteia dois servidores e usa o de menor custo (power of two choices)."""
+
+    name = 'p2c'
+
+    def _choose(self, candidates: List[str]) -> str:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if self.score(first) <= self.score(second) else second
+
+
+class LeastLatencyStrategy(SelectionStrategy):
+    """Sorteia um servidor com peso inversamente proporcional ao custo."""
+
+    name = 'least_latency'
+
+    def _choose(self, candidates: List[str]) -> str:
+        weights = [1.0 / (self.score(name) + 0.001) for name in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (RandomStrategy, RoundRobinStrategy, PowerOfTwoStrategy, LeastLatencyStrategy)
+}
+
+
+def get_strategy(strategy: Union[str, SelectionStrategy]) -> SelectionStrategy:
+    """
+    Obtém a estratégia de seleção a partir do nome ou de uma instância.
+
+    Args:
+        strategy (str, SelectionStrategy): Nome ('random', 'round_robin', 'p2c',
+                                           'least_latency') ou instância
+
+    Returns:
+        SelectionStrategy: Estratégia pronta para uso
+
+    Raises:
+        ValueError: Se o nome não corresponder a uma estratégia conhecida
+    """
+    if isinstance(strategy, SelectionStrategy):
+        return strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia desconhecida: {strategy}. Opções: {', '.join(STRATEGIES)}")
+    return STRATEGIES[strategy]()
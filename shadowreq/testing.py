@@ -0,0 +1,369 @@
+"""
+Servidor intermediário local para testes, compatível com o protocolo do api.php.
+
+Permite testar o ShadowReq sem acesso à rede:
+
+    with RelayStub(handler=lambda method, url, params: (200, b'{"ok": true}')) as relay:
+        relay.write_config('servers_test.json')
+        shadow = ShadowReq('servers_test.json')
+"""
+
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, Callable, Tuple
+import requests
+from .challenge import aes_cbc_encrypt
+from .protocol import STREAM_CONTENT_TYPE, MAX_BATCH_SIZE, SKIPPED_HEADERS
+
+# O handler retorna (status, corpo) ou (status, corpo, headers).
+# No modo stream o corpo também pode ser um iterável de partes (bytes).
+# Requisições com corpo (json, bytes, arquivos) chamam o handler com os argumentos
+# nomeados body (bytes) e content_type
+Handler = Callable[..., tuple]
+
+
+def forward_request(method: str, url: str, params: Dict[str, Any], body: Optional[bytes] = None,
+                    content_type: Optional[str] = None) -> Tuple[int, bytes, Dict[str, str]]:
+    """
+    Faz a requisição ao servidor de destino como o api.php faz com o curl.
+
+    Args:
+        method (str): Método HTTP (GET, POST, PUT, DELETE)
+        url (str): URL do destino
+        params (dict): Parâmetros da requisição
+        body (bytes, optional): Corpo repassado sem conversão; params vão na query string
+        content_type (str, optional): Content-Type do corpo
+
+    Returns:
+        tuple: (status, corpo da resposta, headers da resposta)
+    """
+    if body is not None:
+        headers = {'content-type': content_type} if content_type else None
+        response = requests.request(method, url, params=params or None, data=body, headers=headers)
+    elif method == 'GET':
+        response = requests.get(url, params=params or None)
+    else:
+        response = requests.request(method, url, data=params or None)
+    return response.status_code, response.content, dict(response.headers)
+
+
+CHALLENGE_TEMPLATE = (
+    '<html><body><script type="text/javascript" src="/aes.js" ></script>'
+    '<script>function toNumbers(d){{var e=[];d.replace(/(..)/g,function(d){{e.push(parseInt(d,16))}});return e}}'
+    'function toHex(){{for(var d=[],d=1==arguments.length&&arguments[0].constructor==Array?arguments[0]:arguments,'
+    'e="",f=0;f<d.length;f++)e+=(16>d[f]?"0":"")+d[f].toString(16);return e.toLowerCase()}}'
+    'var a=toNumbers("{key}"),b=toNumbers("{iv}"),c=toNumbers("{ciphertext}");'
+    'document.cookie="__test="+toHex(slowAES.decrypt(c,2,a,b))+"; expires=Thu, 31-Dec-37 23:55:55 GMT; path=/"; '
+    'location.href="{redirect}";</script>'
+    '<noscript>This site requires Javascript to work, please enable Javascript in your browser '
+    'or use a browser with Javascript support</noscript></body></html>'
+)
+
+
+def make_challenge_page(cookie: str, redirect: str = '/api.php?i=1') -> str:
+    """
+    Gera uma página de desafio no formato do InfinityFree.
+
+    Args:
+        cookie (str): Valor do cookie __test esperado (32 caracteres hexadecimais)
+        redirect (str): URL para onde a página redireciona depois de definir o cookie
+
+    Returns:
+        str: HTML da página de desafio
+    """
+    key, iv = os.urandom(16), os.urandom(16)
+    ciphertext = aes_cbc_encrypt(bytes.fromhex(cookie), key, iv)
+    return CHALLENGE_TEMPLATE.format(key=key.hex(), iv=iv.hex(), ciphertext=ciphertext.hex(), redirect=redirect)
+
+
+def make_timing(elapsed: float) -> Dict[str, float]:
+    """
+    Monta os tempos no formato do curlTiming() do api.php.
+
+    O handler não tem DNS nem conexão próprios: todo o tempo conta como transferência.
+
+    Args:
+        elapsed (float): Duração da chamada ao handler em segundos
+
+    Returns:
+        dict: Tempos 'namelookup', 'connect', 'starttransfer' e 'total'
+    """
+    return {'namelookup': 0.0, 'connect': 0.0, 'starttransfer': elapsed, 'total': elapsed}
+
+
+class RelayStub:
+    def __init__(self, handler: Optional[Handler] = None, host: str = '127.0.0.1', port: int = 0,
+                 challenge_cookie: Optional[str] = None):
+        """
+        Inicializa o servidor intermediário local.
+
+        Args:
+            handler (callable, optional): Função (method, url, params) -> (status, corpo) ou
+                                          (status, corpo, headers) que substitui a requisição ao destino.
+                                          Se None, repassa a requisição de verdade
+            host (str): Endereço de escuta
+            port (int): Porta de escuta (0 escolhe uma porta livre)
+            challenge_cookie (str, optional): Se definido, responde com a página de desafio
+                                              do InfinityFree a toda requisição sem o cookie
+                                              __test com este valor
+        """
+        self.handler = handler or forward_request
+        self.challenge_cookie = challenge_cookie
+        self.challenges = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_BATCH_SIZE)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL base do servidor, no formato usado em 'urls' do servers.json."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'RelayStub':
+        """Inicia o servidor em uma thread de fundo."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Encerra o servidor."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def write_config(self, path: str, servers: int = 1, headers: Optional[Dict[str, str]] = None):
+        """
+        Grava um servers.json apontando todos os servidores para este servidor local.
+
+        Args:
+            path (str): Caminho do arquivo de configuração
+            servers (int): Número de servidores a declarar
+            headers (dict, optional): Headers de cada servidor
+        """
+        config = {
+            f"server{i + 1}": {'urls': [self.url], 'headers': dict(headers or {})}
+            for i in range(servers)
+        }
+        with open(path, 'w') as f:
+            json.dump(config, f, indent=4)
+
+    def call_handler(self, item: Dict[str, Any]) -> Tuple[int, bytes, Dict[str, str]]:
+        """
+        Chama o handler e normaliza o retorno.
+
+        Args:
+            item (dict): Envelope com as chaves 'url', 'method' e 'params'
+
+        Returns:
+            tuple: (status, corpo, headers)
+        """
+        if 'content' in item:
+            result = self.handler(item['method'].upper(), item['url'], item.get('params') or {},
+                                  body=item['content'], content_type=item['body'].get('content_type'))
+        else:
+            result = self.handler(item['method'].upper(), item['url'], item.get('params') or {})
+        if len(result) == 2:
+            return result[0], result[1], {}
+        return result
+
+    def execute(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Executa uma requisição do envelope.
+
+        Args:
+            item (dict): Envelope com as chaves 'url', 'method' e 'params'
+
+        Returns:
+            dict: Resultado no formato do api.php
+        """
+        if not isinstance(item, dict) or 'url' not in item or 'method' not in item:
+            return {'error': 'URL and method are required'}
+
+        method = item['method'].upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            return {'error': 'Invalid HTTP method'}
+
+        started = time.perf_counter()
+        try:
+            status, body, _ = self.call_handler(item)
+        except Exception as e:
+            return {'status': 0, 'error': str(e)}
+        timing = make_timing(time.perf_counter() - started)
+
+        try:
+            response = json.loads(body)
+        except ValueError:
+            response = None
+        return {'status': status, 'response': response, 'timing': timing}
+
+    def handle_envelope(self, data: Any) -> Dict[str, Any]:
+        """
+        Processa o envelope recebido, individual ou em lote.
+
+        Args:
+            data: Envelope decodificado
+
+        Returns:
+            dict: Resposta no formato do api.php
+        """
+        with self._lock:
+            self.calls += 1
+
+        if isinstance(data, dict) and 'batch' in data:
+            if not isinstance(data['batch'], list):
+                return {'error': 'Batch must be a list of requests'}
+            if len(data['batch']) > MAX_BATCH_SIZE:
+                return {'error': f'Batch too large (max {MAX_BATCH_SIZE})'}
+            return {'batch': list(self._executor.map(self.execute, data['batch']))}
+
+        if not isinstance(data, dict) or 'url' not in data or 'method' not in data:
+            return {'error': 'URL and method are required'}
+        return self.execute(data)
+
+    def _make_handler_class(self):
+        relay = self
+
+        class RelayRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Evita o atraso do algoritmo de Nagle entre headers e corpo
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _challenge(self):
+                # Responde com a página de desafio se o cookie __test não for o esperado
+                if not relay.challenge_cookie:
+                    return False
+                if f"__test={relay.challenge_cookie}" in self.headers.get('cookie', ''):
+                    return False
+                with relay._lock:
+                    relay.challenges += 1
+                body = make_challenge_page(relay.challenge_cookie).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return True
+
+            def _read_request_body(self):
+                if 'chunked' not in self.headers.get('transfer-encoding', '').lower():
+                    return self.rfile.read(int(self.headers.get('content-length', 0)))
+                parts = []
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                    if size == 0:
+                        # Trailers até a linha vazia
+                        while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                            pass
+                        return b''.join(parts)
+                    parts.append(self.rfile.read(size))
+                    self.rfile.readline()
+
+            def do_POST(self):
+                raw = self._read_request_body()
+                if self._challenge():
+                    return
+                try:
+                    if self.headers.get('content-type', '').split(';')[0].strip() == STREAM_CONTENT_TYPE:
+                        # Uma linha com o envelope seguida do corpo a repassar
+                        line, _, content = raw.partition(b'\n')
+                        data = json.loads(line)
+                        if not isinstance(data, dict) or 'batch' in data:
+                            data = None
+                        else:
+                            data['content'] = content
+                    else:
+                        if self.headers.get('content-encoding', '').lower() == 'gzip':
+                            raw = gzip.decompress(raw)
+                        data = json.loads(raw)
+                except (ValueError, OSError):
+                    data = None
+
+                if isinstance(data, dict) and data.get('mode') in ('raw', 'stream') and 'batch' not in data:
+                    self._send_raw(data, stream=data['mode'] == 'stream')
+                else:
+                    self._send_json(relay.handle_envelope(data))
+
+            def do_GET(self):
+                if self._challenge():
+                    return
+                self._send_json({'error': 'Invalid request method'})
+
+            def _send_raw(self, data, stream=False):
+                with relay._lock:
+                    relay.calls += 1
+                if 'url' not in data or 'method' not in data:
+                    return self._send_json({'error': 'URL and method are required'})
+                started = time.perf_counter()
+                try:
+                    status, body, headers = relay.call_handler(data)
+                except Exception as e:
+                    return self._send_json({'status': 0, 'error': str(e)})
+
+                headers = {k.lower(): v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS}
+                shadow_headers = {
+                    'X-Shadow-Status': str(status),
+                    'X-Shadow-Headers': json.dumps(headers),
+                    'X-Shadow-Timing': json.dumps(make_timing(time.perf_counter() - started)),
+                }
+                if stream:
+                    self._send_chunked([body] if isinstance(body, bytes) else body, shadow_headers)
+                else:
+                    if not isinstance(body, bytes):
+                        body = b''.join(body)
+                    self._send_body(body, 'application/octet-stream', shadow_headers)
+
+            def _send_chunked(self, chunks, extra_headers):
+                # Como o modo stream do api.php: sem gzip, uma parte por escrita do destino
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in chunks:
+                    if chunk:
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _send_json(self, result):
+                self._send_body(json.dumps(result).encode('utf-8'), 'application/json')
+
+            def _send_body(self, body, content_type, extra_headers=None):
+                # Comprime como o ob_gzhandler do api.php
+                gzipped = 'gzip' in self.headers.get('accept-encoding', '')
+                if gzipped:
+                    body = gzip.compress(body, compresslevel=5)
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                if gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return RelayRequestHandler
@@ -0,0 +1,105 @@
+"""
+Testes do cliente assíncrono com o servidor intermediário local.
+"""
+
+import asyncio
+import json
+import os
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from shadowreq import AsyncShadowReq
+from shadowreq.config import build_snapshot
+from shadowreq.protocol import build_payload, build_response
+from shadowreq.testing import RelayStub
+
+
+def handler(method, url, params):
+    return 200, json.dumps({'url': url, 'params': params}).encode('utf-8')
+
+
+@pytest.fixture
+def relay():
+    with RelayStub(handler=handler) as relay:
+        yield relay
+
+
+def write_servers(path, servers):
+    with open(path, 'w') as f:
+        json.dump(servers, f)
+
+
+def test_build_payload_merges_data_and_params():
+    payload = build_payload('post', 'http://origin/x', data={'a': 1, 'b': 2}, params={'b': 3})
+
+    assert payload == {'url': 'http://origin/x', 'method': 'POST', 'params': {'a': 1, 'b': 3}}
+
+
+def test_build_response_from_envelope():
+    response = build_response({'status': 404, 'response': {'erro': 'x'}}, 'http://origin/x')
+
+    assert response.status_code == 404
+    assert response.json() == {'erro': 'x'}
+    assert response.url == 'http://origin/x'
+    assert build_response({}).status_code == 500
+
+
+def test_invalid_config_is_rejected(tmp_path):
+    config = str(tmp_path / 'servers.json')
+    write_servers(config, {'server1': {'headers': {}}})
+
+    with pytest.raises(ValueError):
+        AsyncShadowReq(config)
+
+
+def test_per_server_pool_size_and_rate_limit(relay, tmp_path):
+    config = str(tmp_path / 'servers.json')
+    write_servers(config, {
+        'server1': {'urls': [relay.url], 'headers': {}, 'pool_size': 3, 'rate_limit': {'rate': 100, 'burst': 2}},
+        'server2': {'urls': [relay.url], 'headers': {}, 'max_concurrency': 4, 'pool_size': 1},
+    })
+
+    async def main():
+        async with AsyncShadowReq(config, strategy='round_robin') as shadow:
+            responses = await asyncio.gather(*(shadow.get(f'http://origin/{i}') for i in range(6)))
+            return shadow, responses, shadow.stats()
+
+    shadow, responses, stats = asyncio.run(main())
+    assert [r.json()['url'] for r in responses] == [f'http://origin/{i}' for i in range(6)]
+    assert shadow._limit(shadow._table.entries['server1']) == 3
+    assert shadow._limit(shadow._table.entries['server2']) == 4
+    assert stats['rate_limit']['relays']['server1']['burst'] == 2.0
+
+
+def test_snapshot_and_hot_reload(relay, tmp_path):
+    config = str(tmp_path / 'servers.json')
+    snapshot = str(tmp_path / 'servers.snap')
+    write_servers(config, {'server1': {'urls': [relay.url], 'headers': {}}})
+
+    async def main():
+        shadow = AsyncShadowReq(config, snapshot_file=snapshot, watch_config=True, watch_interval=0.05)
+        try:
+            assert os.path.exists(snapshot)
+            await shadow.get('http://origin/a')
+            first = shadow.sessions['server1']
+
+            # Outro processo troca a configuração e regrava o snapshot
+            write_servers(config, {
+                'server1': {'urls': [relay.url], 'headers': {'x-test': '1'}},
+                'server2': {'urls': [relay.url], 'headers': {}},
+            })
+            build_snapshot(config, snapshot)
+            for _ in range(100):
+                if 'server2' in shadow.sessions:
+                    break
+                await asyncio.sleep(0.02)
+
+            assert shadow.server_names == ['server1', 'server2']
+            assert shadow.sessions['server1'] is first
+            assert shadow._state.headers['server1'] == {'x-test': '1'}
+            assert (await shadow.get('http://origin/b')).status_code == 200
+        finally:
+            await shadow.close()
+
+    asyncio.run(main())
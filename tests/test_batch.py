@@ -0,0 +1,77 @@
+"""
+Testes do modo lote (batch) usando o servidor intermediário local.
+"""
+
+import json
+import pytest
+from shadowreq import ShadowReq
+from shadowreq.protocol import MAX_BATCH_SIZE
+from shadowreq.testing import RelayStub
+
+
+def handler(method, url, params):
+    """Responde com o método, a URL e os params recebidos; /fail levanta um erro."""
+    if url.endswith('/fail'):
+        raise RuntimeError('origem indisponível')
+    return 200, json.dumps({'method': method, 'url': url, 'params': params}).encode('utf-8')
+
+
+@pytest.fixture
+def relay():
+    with RelayStub(handler=handler) as relay:
+        yield relay
+
+
+@pytest.fixture
+def shadow(relay, tmp_path):
+    config = str(tmp_path / 'servers.json')
+    relay.write_config(config)
+    shadow = ShadowReq(config)
+    yield shadow
+    shadow.close()
+
+
+def test_batch_returns_one_response_per_item_in_order(shadow, relay):
+    responses = shadow.batch([
+        'http://origin/a',
+        {'url': 'http://origin/b', 'method': 'post', 'data': {'x': 1}},
+        {'url': 'http://origin/c', 'params': {'q': 'y'}},
+    ])
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert [r.url for r in responses] == ['http://origin/a', 'http://origin/b', 'http://origin/c']
+    assert responses[1].json() == {'method': 'POST', 'url': 'http://origin/b', 'params': {'x': 1}}
+    assert responses[2].json()['params'] == {'q': 'y'}
+    assert relay.calls == 1
+
+
+def test_batch_is_split_in_chunks(shadow, relay):
+    urls = [f'http://origin/{i}' for i in range(5)]
+    responses = shadow.batch(urls, chunk_size=2)
+
+    assert [r.json()['url'] for r in responses] == urls
+    assert relay.calls == 3
+
+
+def test_batch_item_errors_do_not_fail_the_others(shadow):
+    responses = shadow.batch([
+        'http://origin/ok',
+        'http://origin/fail',
+        {'url': 'http://origin/ok', 'method': 'PATCH'},
+    ])
+
+    assert responses[0].status_code == 200
+    assert responses[1].status_code == 502
+    assert responses[1].reason == 'origem indisponível'
+    assert responses[2].status_code == 502
+    assert responses[2].reason == 'Invalid HTTP method'
+
+
+def test_batch_envelope_limits(relay):
+    assert relay.handle_envelope({'batch': 'http://origin/a'}) == {'error': 'Batch must be a list of requests'}
+    assert 'error' in relay.handle_envelope({'batch': [{'url': 'http://origin/a', 'method': 'GET'}] * (MAX_BATCH_SIZE + 1)})
+
+
+def test_batch_without_url_raises(shadow):
+    with pytest.raises(ValueError):
+        shadow.batch([{'method': 'GET'}])
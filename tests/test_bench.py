@@ -0,0 +1,55 @@
+"""
+Testes do comando compare dos benchmarks (benchmarks/bench.py).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+BENCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'bench.py')
+
+BASE = {'name': 'get-1024b-c8', 'throughput': 1000.0, 'p50': 0.010, 'p95': 0.020, 'p99': 0.030,
+        'cpu_per_request_ms': 0.5, 'peak_rss_mb': 40.0}
+
+
+def write_results(path, *entries):
+    with open(path, 'w') as f:
+        json.dump({'meta': {}, 'results': list(entries)}, f)
+    return str(path)
+
+
+def compare(tmp_path, new_entries, threshold=None):
+    base = write_results(tmp_path / 'base.json', BASE, dict(BASE, name='post-1024b-c8'))
+    new = write_results(tmp_path / 'new.json', *new_entries)
+    command = [sys.executable, BENCH, 'compare', base, new]
+    if threshold is not None:
+        command += ['--threshold', str(threshold)]
+    return subprocess.run(command, capture_output=True, text=True, timeout=60)
+
+
+def test_compare_without_regression(tmp_path):
+    # Melhoras e pioras abaixo do limite não são regressões
+    result = compare(tmp_path, [dict(BASE, throughput=1050.0, p95=0.021), dict(BASE, name='post-1024b-c8')])
+
+    assert result.returncode == 0, result.stdout
+    assert 'Nenhuma regressão acima de 10.0%' in result.stdout
+    assert 'REGRESSÃO' not in result.stdout
+
+
+@pytest.mark.parametrize('metric, value', [('throughput', 800.0), ('p99', 0.040), ('peak_rss_mb', 50.0)])
+def test_compare_flags_regression_above_threshold(tmp_path, metric, value):
+    result = compare(tmp_path, [dict(BASE, **{metric: value}), dict(BASE, name='post-1024b-c8')])
+
+    assert result.returncode == 1
+    flagged = [line for line in result.stdout.splitlines() if 'REGRESSÃO' in line]
+    assert len(flagged) == 1 and metric in flagged[0]
+    assert '1 regressões acima de 10.0%' in result.stdout
+
+
+def test_compare_threshold_and_missing_scenarios(tmp_path):
+    result = compare(tmp_path, [dict(BASE, throughput=800.0)], threshold=25)
+
+    assert result.returncode == 0
+    assert 'post-1024b-c8            presente em apenas um dos arquivos' in result.stdout
@@ -0,0 +1,255 @@
+"""
+Testes do cache local de respostas.
+"""
+
+import os
+import threading
+import time
+import pytest
+import requests
+from shadowreq import cache as cache_module
+from shadowreq.cache import ResponseCache
+
+
+def make_response(content: bytes = b'{}', status_code: int = 200, headers=None, url: str = 'http://origin/x'):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    response.url = url
+    return response
+
+
+class Clock:
+    """Relógio controlado pelo teste no lugar de time.time."""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    return clock
+
+
+def counting_loader(response=None, cacheable=True):
+    """Loader que conta as chamadas e retorna sempre a mesma resposta."""
+    def loader():
+        loader.calls += 1
+        return response or make_response(str(loader.calls).encode()), cacheable
+    loader.calls = 0
+    return loader
+
+
+def disk_files(path):
+    return sorted(name for _, _, names in os.walk(path) for name in names if name.endswith('.cache'))
+
+
+def test_disk_tier_is_pruned_oldest_first(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), max_disk_bytes=3500)
+    keys = [ResponseCache.make_key('GET', f'http://origin/{i}') for i in range(5)]
+    for key in keys:
+        cache.store(key, make_response(b'x' * 1000))
+
+    assert disk_files(tmp_path) == sorted(key + '.cache' for key in keys[-3:])
+    assert cache._disk_size <= 3500
+
+    # Um novo cache no mesmo diretório respeita o limite a partir dos arquivos existentes,
+    # ordenados pela data de gravação
+    for age, key in enumerate(reversed(keys[-3:])):
+        os.utime(cache._disk_path(key), (1000000 - age, 1000000 - age))
+    smaller = ResponseCache(disk_dir=str(tmp_path), max_disk_bytes=2500)
+    assert disk_files(tmp_path) == sorted(key + '.cache' for key in keys[-2:])
+    assert smaller.get(keys[-1]).content == b'x' * 1000
+    assert smaller.get(keys[0]) is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(ttl=10.0)
+    loader = counting_loader()
+
+    assert cache.fetch('k', loader).content == b'1'
+    clock.now += 9.0
+    response = cache.fetch('k', loader)
+    assert (response.content, response.from_cache) == (b'1', True)
+
+    clock.now += 1.0
+    assert cache.fetch('k', loader).content == b'2'
+    assert loader.calls == 2
+
+
+def test_uncacheable_responses_are_not_stored():
+    cache = ResponseCache()
+
+    assert cache.store('k', make_response(status_code=500)) is None
+    loader = counting_loader(cacheable=False)
+    cache.fetch('k', loader)
+    cache.fetch('k', loader)
+    assert loader.calls == 2
+
+
+def test_lru_evicts_the_least_recently_used():
+    entry_size = ResponseCache().store('k', make_response(b'x' * 100)).size
+    cache = ResponseCache(max_bytes=2 * entry_size)
+    for key in ('a', 'b'):
+        cache.store(key, make_response(b'x' * 100))
+
+    cache.get('a')
+    cache.store('c', make_response(b'x' * 100))
+
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.get('b') is None
+    assert cache._size == 2 * entry_size
+
+    # Uma resposta maior que o limite não expulsa as outras
+    cache.store('big', make_response(b'x' * 1000))
+    assert cache.get('big') is None and cache.get('a') is not None
+
+
+@pytest.mark.parametrize('headers,ttl', [
+    ({'Cache-Control': 'max-age=60'}, 60.0),
+    ({'Cache-Control': 'public, max-age=60, s-maxage=120'}, 120.0),
+    ({'Expires': 'Thu, 01 Jan 2026 00:05:00 GMT', 'Date': 'Thu, 01 Jan 2026 00:00:00 GMT'}, 300.0),
+    ({'Cache-Control': 'max-age=abc'}, 10.0),
+    ({}, 10.0),
+])
+def test_cache_control_sets_the_lifetime(clock, headers, ttl):
+    cache = ResponseCache(ttl=10.0)
+    entry = cache.store('k', make_response(headers=headers))
+
+    assert entry.expires_at - clock.now == ttl
+
+
+@pytest.mark.parametrize('value', ['no-store', 'no-cache', 'max-age=0'])
+def test_cache_control_prevents_storing(value):
+    cache = ResponseCache()
+
+    assert cache.store('k', make_response(headers={'Cache-Control': value})) is None
+    assert cache.get('k') is None
+
+
+def test_headers_are_ignored_when_not_honoured(clock):
+    cache = ResponseCache(ttl=10.0, honour_headers=False)
+
+    entry = cache.store('k', make_response(headers={'Cache-Control': 'no-store, max-age=60'}))
+    assert entry.expires_at - clock.now == 10.0
+
+
+def test_stale_response_is_served_while_revalidating(clock):
+    cache = ResponseCache(ttl=10.0)
+    revalidated = threading.Event()
+    cache.fetch('k', counting_loader(make_response(b'old', headers={
+        'Cache-Control': 'max-age=10, stale-while-revalidate=30'})))
+
+    def loader():
+        revalidated.set()
+        return make_response(b'new'), True
+
+    clock.now += 20.0
+    assert cache.fetch('k', loader).content == b'old'
+    assert revalidated.wait(5)
+    for _ in range(100):
+        if cache.get('k').content == b'new':
+            break
+        time.sleep(0.01)
+    assert cache.fetch('k', loader).content == b'new'
+
+    # Depois da janela de revalidação, a resposta antiga não é mais usada
+    clock.now += 100.0
+    loader = counting_loader()
+    assert cache.fetch('k', loader).content == b'1'
+    assert loader.calls == 1
+
+
+def test_concurrent_fetches_share_one_load():
+    cache = ResponseCache()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return make_response(b'shared'), True
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch('k', loader).content))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [b'shared'] * 5
+
+
+def test_concurrent_fetches_share_the_error():
+    cache = ResponseCache()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        raise requests.exceptions.ConnectionError('down')
+
+    errors = []
+
+    def fetch():
+        try:
+            cache.fetch('k', loader)
+        except requests.exceptions.ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1 and len(errors) == 3
+    assert not cache._flights
+
+
+@pytest.mark.parametrize('headers', [{'Cache-Control': 'private, max-age=60'}, {'Set-Cookie': 'session=1'}])
+def test_shared_cache_refuses_private_responses(headers):
+    assert ResponseCache(shared=True).store('k', make_response(headers=headers)) is None
+    assert ResponseCache().store('k', make_response(headers=headers)) is not None
+
+
+def test_memoize_expires_and_counts_toward_the_limit(clock):
+    cache = ResponseCache(ttl=10.0)
+    calls = []
+
+    @cache.memoize()
+    def double(value):
+        calls.append(value)
+        return value * 2
+
+    assert (double(2), double(2), double(3)) == (4, 4, 6)
+    assert calls == [2, 3]
+    assert cache._size > 0
+
+    clock.now += 10.0
+    assert double(2) == 4
+    assert calls == [2, 3, 2]
+
+    # Os resultados dividem o LRU com as respostas
+    cache.max_bytes = cache._size
+    cache.store('k', make_response(b'x' * 100))
+    calls.clear()
+    double(3)
+    assert calls == [3]
@@ -0,0 +1,65 @@
+"""
+Testes da resolução do desafio __test sem navegador.
+"""
+
+import pytest
+from shadowreq.challenge import (ChallengeError, aes_cbc_decrypt, aes_cbc_encrypt, fetch_cookie,
+                                 parse_challenge, solve_challenge)
+from shadowreq.testing import RelayStub, make_challenge_page
+
+PLAINTEXT = bytes.fromhex('00112233445566778899aabbccddeeff')
+ZERO_IV = bytes(16)
+
+# Vetores do apêndice C do FIPS-197 (um bloco; CBC com IV zero equivale ao ECB)
+FIPS_197_VECTORS = [
+    ('000102030405060708090a0b0c0d0e0f', '69c4e0d86a7b0430d8cdb78070b4c55a'),
+    ('000102030405060708090a0b0c0d0e0f1011121314151617', 'dda97ca4864cdfe06eaf70a0ec0d7191'),
+    ('000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f', '8ea2b7ca516745bfeafc49904b496089'),
+]
+
+COOKIE = '0123456789abcdef0123456789abcdef'
+
+
+@pytest.mark.parametrize('key, ciphertext', FIPS_197_VECTORS)
+def test_aes_fips_197_vectors(key, ciphertext):
+    key = bytes.fromhex(key)
+    assert aes_cbc_encrypt(PLAINTEXT, key, ZERO_IV).hex() == ciphertext
+    assert aes_cbc_decrypt(bytes.fromhex(ciphertext), key, ZERO_IV) == PLAINTEXT
+
+
+def test_aes_cbc_chains_blocks():
+    # Vetor F.2.1 do NIST SP 800-38A (AES-128 CBC, dois blocos)
+    key = bytes.fromhex('2b7e151628aed2a6abf7158809cf4f3c')
+    iv = bytes.fromhex('000102030405060708090a0b0c0d0e0f')
+    plaintext = bytes.fromhex('6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51')
+    ciphertext = bytes.fromhex('7649abac8119b246cee98e9b12e9197d5086cb9b507219ee95db113a917678b2')
+
+    assert aes_cbc_encrypt(plaintext, key, iv) == ciphertext
+    assert aes_cbc_decrypt(ciphertext, key, iv) == plaintext
+
+
+def test_aes_rejects_partial_blocks():
+    with pytest.raises(ChallengeError):
+        aes_cbc_encrypt(b'abc', bytes(16), ZERO_IV)
+    with pytest.raises(ChallengeError):
+        aes_cbc_decrypt(b'', bytes(16), ZERO_IV)
+
+
+def test_solve_challenge_round_trip():
+    page = make_challenge_page(COOKIE, redirect='/api.php?i=2')
+
+    assert solve_challenge(page) == COOKIE
+    assert parse_challenge(page)[3] == '/api.php?i=2'
+
+
+def test_solve_challenge_without_values():
+    with pytest.raises(ChallengeError):
+        solve_challenge('<html><body>sem desafio</body></html>')
+
+
+def test_fetch_cookie_from_local_relay():
+    with RelayStub(handler=lambda method, url, params: (200, b'{}'), challenge_cookie=COOKIE) as relay:
+        cookie, _ = fetch_cookie(relay.url + '/api.php')
+
+    assert cookie == COOKIE
+    assert relay.challenges == 1
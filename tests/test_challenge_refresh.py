@@ -0,0 +1,74 @@
+"""
+Testes da detecção do desafio __test durante as requisições.
+"""
+
+import threading
+import time
+import pytest
+from shadowreq import ShadowReq
+from shadowreq.protocol import is_challenge_page
+from shadowreq.selection import SelectionStrategy
+from shadowreq.testing import RelayStub
+
+COOKIE = '0123456789abcdef0123456789abcdef'
+
+
+class FirstStrategy(SelectionStrategy):
+    """Escolhe sempre o primeiro candidato, para tornar a escolha determinística."""
+
+    def _choose(self, candidates):
+        return sorted(candidates)[0]
+
+
+@pytest.fixture
+def relay():
+    with RelayStub(handler=lambda method, url, params: (200, b'{"ok": true}'), challenge_cookie=COOKIE) as relay:
+        yield relay
+
+
+def make_client(relay, tmp_path, servers):
+    config = str(tmp_path / 'servers.json')
+    relay.write_config(config, servers=servers)
+    return ShadowReq(config, strategy=FirstStrategy())
+
+
+def test_challenge_replay_stops_when_other_servers_are_refreshing(relay, tmp_path, monkeypatch):
+    shadow = make_client(relay, tmp_path, servers=3)
+    # server2 e server3 estão renovando o cookie em outra thread e a renovação não termina
+    shadow._refreshing.update({'server2', 'server3'})
+    monkeypatch.setattr(shadow, '_schedule_cookie_refresh', lambda server_name: None)
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(shadow.get('http://origin/x')), daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive(), "a requisição ficou repetindo no mesmo servidor"
+    assert is_challenge_page(result[0].content)
+    assert relay.challenges == 1
+    shadow.close()
+
+
+def test_challenge_replays_once_per_server(relay, tmp_path, monkeypatch):
+    shadow = make_client(relay, tmp_path, servers=3)
+    monkeypatch.setattr(shadow, '_schedule_cookie_refresh', lambda server_name: None)
+
+    response = shadow.get('http://origin/x')
+
+    assert is_challenge_page(response.content)
+    assert relay.challenges == 3
+    shadow.close()
+
+
+def test_challenge_refreshes_cookie_in_background(relay, tmp_path):
+    shadow = make_client(relay, tmp_path, servers=1)
+
+    shadow.get('http://origin/x')
+    for _ in range(50):
+        with shadow._refresh_lock:
+            if not shadow._refreshing:
+                break
+        time.sleep(0.1)
+
+    assert shadow.get('http://origin/x').json() == {'ok': True}
+    shadow.close()
@@ -0,0 +1,165 @@
+"""
+Testes da compilação, do snapshot e da recarga da configuração dos servidores.
+"""
+
+import os
+import pytest
+from shadowreq import ShadowReq
+from shadowreq.config import (ConfigWatcher, build_snapshot, compile_config, load_config, load_snapshot,
+                              load_table, start_watcher, write_snapshot)
+from shadowreq.cookie_updater import write_config
+from shadowreq.testing import RelayStub
+
+CONFIG = {
+    'server1': {'urls': ['http://relay1.example/', 'http://mirror1.example/api.php'],
+                'headers': {'Cookie': '__test=abc'}, 'pool_size': 4, 'rate_limit': {'rate': 5, 'burst': 10}},
+    'server2': {'urls': ['http://relay2.example'], 'headers': {}, 'keep_alive': False, 'passthrough': True},
+}
+
+
+def test_compile_config():
+    table = compile_config(CONFIG, generation=7)
+
+    assert table.names == ['server1', 'server2'] and len(table) == 2
+    assert table.generation == 7
+    assert table.servers == CONFIG
+
+    server1, server2 = table.entries['server1'], table.entries['server2']
+    assert server1.api_url == 'http://relay1.example/api.php'
+    assert server1.api_urls == ('http://relay1.example/api.php', 'http://mirror1.example/api.php')
+    assert server1.headers == {'Cookie': '__test=abc'}
+    assert (server1.pool_size, server1.keep_alive, server1.passthrough) == (4, None, None)
+    assert server1.rate_limit == {'rate': 5, 'burst': 10}
+    assert (server2.keep_alive, server2.passthrough, server2.rate_limit) == (False, True, None)
+
+
+@pytest.mark.parametrize('config', [
+    {'server1': {'headers': {}}},
+    {'server1': {'urls': []}},
+    {'server1': 'http://relay1.example'},
+    {'server1': {'urls': ['http://relay1.example'], 'rate_limit': 'fast'}},
+    {'server1': {'urls': ['http://relay1.example'], 'rate_limit': {'burst': 10}}},
+])
+def test_compile_config_rejects_invalid_servers(config):
+    with pytest.raises(ValueError):
+        compile_config(config)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'servers.snap')
+    table = compile_config(CONFIG, generation=42)
+    write_snapshot(table, path)
+
+    loaded = load_snapshot(path)
+    assert loaded.generation == 42
+    assert loaded.names == table.names
+    assert loaded.entries == table.entries
+    assert [name for name in os.listdir(tmp_path)] == ['servers.snap']
+
+
+@pytest.mark.parametrize('content', [b'', b'not a snapshot at all', b'SHRQSNAP\x01\x00' + b'\x00' * 20])
+def test_invalid_snapshot_raises_value_error(tmp_path, content):
+    path = tmp_path / 'servers.snap'
+    path.write_bytes(content)
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_truncated_snapshot_raises_value_error(tmp_path):
+    path = tmp_path / 'servers.snap'
+    write_snapshot(compile_config(CONFIG), str(path))
+    path.write_bytes(path.read_bytes()[:-5])
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_load_config_creates_the_snapshot(tmp_path):
+    config = str(tmp_path / 'servers.json')
+    snapshot = str(tmp_path / 'servers.snap')
+    write_config(config, CONFIG)
+
+    table = load_config(config, snapshot)
+    assert os.path.exists(snapshot)
+    assert table.generation == os.stat(config).st_mtime_ns
+
+    # Depois de criado, o snapshot é lido no lugar do JSON
+    write_config(config, {'server3': {'urls': ['http://relay3.example']}})
+    assert load_config(config, snapshot).names == ['server1', 'server2']
+    assert load_config(config).names == ['server3']
+
+
+def test_watcher_applies_changes_and_keeps_the_table_on_errors(tmp_path):
+    config = str(tmp_path / 'servers.json')
+    write_config(config, CONFIG)
+    tables = []
+    watcher = ConfigWatcher(config, tables.append)
+
+    assert not watcher.check()
+
+    write_config(config, {'server3': {'urls': ['http://relay3.example']}})
+    assert watcher.check()
+    assert tables[-1].names == ['server3']
+    assert not watcher.check()
+
+    # Arquivo inválido: mantém a tabela e tenta de novo na próxima verificação
+    with open(config, 'w') as f:
+        f.write('{"server4": ')
+    assert not watcher.check()
+    write_config(config, {'server3': {'urls': ['http://relay3.example']}, 'server4': {}})
+    assert not watcher.check()
+    assert len(tables) == 1
+
+    write_config(config, {'server4': {'urls': ['http://relay4.example']}})
+    assert watcher.check()
+    assert tables[-1].names == ['server4']
+
+
+def test_watcher_follows_the_snapshot(tmp_path):
+    config = str(tmp_path / 'servers.json')
+    snapshot = str(tmp_path / 'servers.snap')
+    write_config(config, CONFIG)
+    build_snapshot(config, snapshot)
+    tables = []
+    watcher = start_watcher(config, tables.append, snapshot, interval=60)
+    try:
+        # Mudanças no JSON só valem depois de o snapshot ser regravado
+        write_config(config, {'server3': {'urls': ['http://relay3.example']}})
+        assert not watcher.check()
+
+        build_snapshot(config, snapshot)
+        assert watcher.check()
+        assert tables[-1].names == ['server3']
+        assert tables[-1].generation == load_table(config).generation
+    finally:
+        watcher.stop()
+
+
+def test_client_hot_reload(tmp_path):
+    handler = lambda method, url, params: (200, b'{}')
+    with RelayStub(handler=handler) as first, RelayStub(handler=handler) as second:
+        config = str(tmp_path / 'servers.json')
+        write_config(config, {'server1': {'urls': [first.url], 'headers': {'X-Version': '1'}}})
+
+        with ShadowReq(config, watch_config=True, watch_interval=60) as shadow:
+            session = shadow.sessions['server1']
+            shadow.get('http://origin/')
+
+            # Só os headers mudaram: a sessão (e suas conexões) é mantida
+            write_config(config, {'server1': {'urls': [first.url], 'headers': {'X-Version': '2'}}})
+            assert shadow._watcher.check()
+            assert shadow.sessions['server1'] is session
+            assert session.headers['X-Version'] == '2'
+
+            write_config(config, {'server2': {'urls': [second.url], 'headers': {}}})
+            assert shadow._watcher.check()
+            assert shadow.server_names == ['server2']
+            shadow.get('http://origin/')
+
+            # Uma configuração inválida não interrompe as requisições
+            write_config(config, {'server3': {'headers': {}}})
+            assert not shadow._watcher.check()
+            shadow.get('http://origin/')
+
+    assert (first.calls, second.calls) == (1, 2)
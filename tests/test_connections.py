@@ -0,0 +1,53 @@
+"""
+Testes dos espelhos, do cache de DNS e do pré-aquecimento de conexões.
+"""
+
+import json
+import requests
+from shadowreq import ShadowReq
+from shadowreq.connections import CachedDNSAdapter, DnsCache
+from shadowreq.ratelimit import RateLimiter
+from shadowreq.testing import RelayStub
+
+
+def handler(method, url, params):
+    return 200, b'{"ok": true}'
+
+
+def test_dns_cache_falls_back_to_the_next_address():
+    cache = DnsCache(ttl=60)
+    # O primeiro endereço recusa a conexão; o segundo é o servidor local
+    cache._lookup = lambda host, port: ['127.0.0.2', '127.0.0.1']
+    session = requests.Session()
+    session.mount('http://', CachedDNSAdapter(cache))
+
+    with RelayStub(handler=handler) as relay:
+        port = int(relay.url.rsplit(':', 1)[1])
+        response = session.post(f'http://relay.test:{port}/api.php',
+                                 json={'url': 'http://origin/x', 'method': 'GET'})
+
+    assert response.json()['response'] == {'ok': True}
+    assert cache.resolve_all('relay.test', port) == ['127.0.0.1', '127.0.0.2']
+    assert cache.misses == 1
+
+
+def test_prewarm_does_not_spend_rate_limit_tokens(tmp_path):
+    with RelayStub(handler=handler) as relay:
+        config = str(tmp_path / 'servers.json')
+        relay.write_config(config, servers=2)
+        with open(config) as f:
+            servers = json.load(f)
+        servers['server1']['rate_limit'] = {'rate': 0.01, 'burst': 2}
+        with open(config, 'w') as f:
+            json.dump(servers, f)
+
+        with ShadowReq(config, rate_limit=RateLimiter(), strategy='round_robin') as shadow:
+            assert shadow.prewarm(connections=3) == 6
+            assert shadow.rate_limit.snapshot()['relays']['server1']['tokens'] == 2.0
+
+            for i in range(4):
+                shadow.get(f'http://origin/{i}')
+            assert shadow.rate_limit.snapshot()['relays']['server1']['tokens'] < 1.0
+
+            # server1 está sem saldo: só as conexões de server2 são abertas
+            assert shadow.prewarm(connections=3) == 3
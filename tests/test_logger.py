@@ -0,0 +1,56 @@
+"""
+Testes da configuração compartilhada do ShadowLogger.
+"""
+
+import json
+import logging
+import pytest
+from shadowreq import ShadowReq
+from shadowreq.cookie_updater import CookieUpdater
+from shadowreq.logger import ShadowLogger
+
+
+@pytest.fixture
+def logger():
+    logger = ShadowLogger()
+    yield logger
+    logger.setup(enabled=False, log_file='', level=logging.INFO, json_format=False, sample_rate=1.0,
+                 background=True)
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'servers.json'
+    path.write_text(json.dumps({'server1': {'urls': ['http://127.0.0.1:9'], 'headers': {}}}))
+    return str(path)
+
+
+def test_clients_keep_the_shared_logger_settings(logger, config, tmp_path):
+    log_file = str(tmp_path / 'shadowreq.jsonl')
+    logger.setup(enabled=True, log_file=log_file, json_format=True, sample_rate=0.1)
+
+    ShadowReq(config).close()
+    CookieUpdater(config, browser_fallback=False).close()
+
+    assert logger.settings['enabled'] is True
+    assert logger.settings['json_format'] is True
+    assert logger.sample_rate == 0.1
+    logger.info("mensagem", relay='server1')
+    logger.flush()
+    with open(log_file) as f:
+        entry = json.loads(f.readlines()[-1])
+    assert entry['message'] == 'mensagem'
+    assert entry['relay'] == 'server1'
+
+
+def test_setup_only_changes_given_arguments(logger, tmp_path):
+    logger.setup(enabled=True, log_file=str(tmp_path / 'a.log'), json_format=True, sample_rate=0.5)
+    logger.setup(log_file=str(tmp_path / 'b.log'))
+
+    assert logger.settings['log_file'] == str(tmp_path / 'b.log')
+    assert logger.settings['json_format'] is True
+    assert logger.sample_rate == 0.5
+
+    logger.setup(enabled=False)
+    assert not logger.is_enabled(logging.ERROR)
+    assert logger.settings['json_format'] is True
@@ -0,0 +1,92 @@
+"""
+Testes das métricas por servidor e da exportação.
+"""
+
+import json
+import pytest
+import requests
+from shadowreq import ShadowReq
+from shadowreq.metrics import Histogram, Metrics, MetricsServer, format_stats
+from shadowreq.protocol import build_response, parse_timing
+from shadowreq.testing import RelayStub
+
+TIMING = {'namelookup': 0.0, 'connect': 0.01, 'starttransfer': 0.02, 'total': 0.03}
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.05, 0.3, 0.8):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 0.5
+    assert histogram.quantile(1.0) == 1.0
+    assert histogram.snapshot()['overflow'] == []
+    assert Histogram().quantile(0.5) is None
+
+
+def test_quantile_above_largest_bucket_is_finite():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    for _ in range(9):
+        histogram.observe(5.0)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['p95'] == 1.0
+    assert snapshot['overflow'] == ['p50', 'p95', 'p99']
+    json.dumps(snapshot, allow_nan=False)
+
+
+def test_stats_endpoint_is_strict_json_and_table_marks_overflow():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.record('server1', latency=0.05)
+    metrics.record('server1', latency=60.0, timeout=True)
+    server = MetricsServer(lambda: {'relays': metrics.snapshot()}, metrics.to_prometheus, port=0).start()
+    try:
+        response = requests.get(server.url + '/stats', timeout=5)
+        prometheus = requests.get(server.url + '/metrics', timeout=5).text
+    finally:
+        server.stop()
+
+    assert 'Infinity' not in response.text
+    stats = response.json()
+    assert stats['relays']['server1']['latency']['overflow'] == ['p95', 'p99']
+    assert 'le="+Inf"} 2' in prometheus
+
+    row = format_stats(stats).splitlines()[1].split()
+    assert row[:6] == ['server1', '-', '2', '1', '1', '0']
+    assert row[6:8] == ['100', '>1000']
+
+
+@pytest.mark.parametrize('value, expected', [
+    (json.dumps(TIMING), TIMING),
+    (None, None),
+    ('', None),
+    ('invalido', None),
+    ('[1, 2]', None),
+])
+def test_parse_timing(value, expected):
+    assert parse_timing(value) == expected
+
+
+def test_build_response_keeps_relay_timing():
+    response = build_response({'status': 201, 'response': {'id': 7}, 'timing': TIMING}, 'http://origin/x')
+
+    assert response.status_code == 201
+    assert response.json() == {'id': 7}
+    assert response.timing == TIMING
+
+
+def test_client_records_upstream_timing(tmp_path):
+    with RelayStub(handler=lambda method, url, params: (200, b'{}')) as relay:
+        config = str(tmp_path / 'servers.json')
+        relay.write_config(config)
+        with ShadowReq(config) as shadow:
+            response = shadow.get('http://origin/x')
+            stats = shadow.stats()['relays']['server1']
+
+    assert set(response.timing) == {'namelookup', 'connect', 'starttransfer', 'total'}
+    assert stats['requests'] == 1
+    assert stats['latency']['count'] == 1
+    assert stats['upstream']['total']['count'] == 1
+    assert stats['relay']['count'] == 1
@@ -0,0 +1,79 @@
+"""
+Testes do modo raw (passthrough) do envelope.
+"""
+
+import gzip
+import json
+import pytest
+import requests
+from shadowreq import ShadowReq
+from shadowreq.protocol import COMPRESS_MIN_SIZE, build_passthrough_response, build_payload, encode_payload
+from shadowreq.testing import RelayStub
+
+TIMING = {'namelookup': 0.0, 'connect': 0.01, 'starttransfer': 0.02, 'total': 0.03}
+
+
+def test_encode_payload_compresses_only_large_envelopes():
+    small = build_payload('GET', 'http://origin/x')
+    body, headers = encode_payload(small, compress=True)
+    assert json.loads(body) == small
+    assert 'content-encoding' not in headers
+
+    large = build_payload('POST', 'http://origin/x', data={'v': 'x' * COMPRESS_MIN_SIZE})
+    body, headers = encode_payload(large, compress=True)
+    assert headers == {'content-type': 'application/json', 'content-encoding': 'gzip'}
+    assert json.loads(gzip.decompress(body)) == large
+
+    body, headers = encode_payload(large)
+    assert json.loads(body) == large
+    assert 'content-encoding' not in headers
+
+
+def test_build_passthrough_response_from_headers():
+    relay_response = requests.Response()
+    relay_response.status_code = 200
+    relay_response.headers['X-Shadow-Status'] = '404'
+    relay_response.headers['X-Shadow-Headers'] = json.dumps({'Content-Type': 'text/html; charset=latin-1'})
+    relay_response.headers['X-Shadow-Timing'] = json.dumps(TIMING)
+    relay_response._content = b'<p>n\xe3o encontrado</p>'
+
+    response = build_passthrough_response(relay_response, 'http://origin/x')
+
+    assert response.status_code == 404
+    assert response.headers['content-type'] == 'text/html; charset=latin-1'
+    assert response.text == '<p>não encontrado</p>'
+    assert response.url == 'http://origin/x'
+    assert response.timing == TIMING
+
+
+def test_build_passthrough_response_without_raw_mode():
+    relay_response = requests.Response()
+    relay_response.status_code = 200
+    relay_response._content = b'{"status": 200}'
+
+    assert build_passthrough_response(relay_response) is None
+
+
+@pytest.mark.parametrize('passthrough', [False, True])
+def test_envelope_round_trip_through_relay(tmp_path, passthrough):
+    received = []
+
+    def handler(method, url, params):
+        received.append((method, url, params))
+        return 200, b'\x00binario\xff', {'content-type': 'application/octet-stream', 'x-origin': '1'}
+
+    with RelayStub(handler=handler) as relay:
+        config = str(tmp_path / 'servers.json')
+        relay.write_config(config)
+        with ShadowReq(config, passthrough=passthrough) as shadow:
+            response = shadow.post('http://origin/x', data={'v': 'x' * COMPRESS_MIN_SIZE})
+
+    assert received == [('POST', 'http://origin/x', {'v': 'x' * COMPRESS_MIN_SIZE})]
+    assert response.status_code == 200
+    if passthrough:
+        # O corpo e os headers do destino chegam sem conversão
+        assert response.content == b'\x00binario\xff'
+        assert response.headers['x-origin'] == '1'
+    else:
+        # O envelope JSON só transporta respostas JSON
+        assert response.json() is None
@@ -0,0 +1,203 @@
+"""
+Testes dos limites de taxa por servidor intermediário e por host de destino.
+"""
+
+import threading
+import time
+import pytest
+from shadowreq import ratelimit
+from shadowreq.ratelimit import RateLimiter, RateLimitTimeout, TokenBucket, parse_limit, parse_retry_after
+
+RELAYS = ['server1', 'server2']
+
+
+def first(candidates):
+    return candidates[0]
+
+
+class Clock:
+    """Relógio controlado pelo teste no lugar de time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_token_bucket_refills_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=2, burst=4)
+    for _ in range(4):
+        assert bucket.wait_time(clock.now) == 0.0
+        bucket.take(clock.now)
+
+    assert bucket.wait_time(clock.now) == 0.5
+    assert bucket.wait_time(clock.now + 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(clock.now + 100) == 0.0
+    assert bucket.tokens == 4.0
+
+    assert TokenBucket(rate=0.5).burst == 1.0
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_parse_limit():
+    assert parse_limit(3) == (3.0, None)
+    assert parse_limit({'rate': 0.75, 'burst': 45}) == (0.75, 45)
+    for spec in ('3', True, {'burst': 4}, None):
+        with pytest.raises(ValueError):
+            parse_limit(spec)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('5') == 5.0
+    assert parse_retry_after(' -3 ') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:30 GMT', now=1445412480.0) == 30.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_acquire_skips_relays_without_tokens(clock):
+    limiter = RateLimiter()
+    limiter.configure_relays({'server1': {'rate': 1, 'burst': 2}, 'server2': None})
+
+    assert [limiter.acquire(RELAYS, None, first) for _ in range(3)] == ['server1', 'server1', 'server2']
+    assert not limiter.has_capacity('server1') and limiter.has_capacity('server2')
+    assert limiter.try_acquire(['server1'], None, first) is None
+
+    clock.now += 1.0
+    assert limiter.has_capacity('server1')
+    assert limiter.try_acquire(['server1'], None, first) == 'server1'
+
+
+def test_host_limit_is_shared_between_relays(clock):
+    limiter = RateLimiter(host_limits={'API.example': 2}, default_host_limit={'rate': 1, 'burst': 1})
+
+    assert limiter.try_acquire(RELAYS, 'api.example', first) == 'server1'
+    assert limiter.try_acquire(RELAYS[1:], 'API.EXAMPLE', first) == 'server2'
+    assert limiter.try_acquire(RELAYS, 'api.example', first) is None
+
+    assert limiter.try_acquire(RELAYS, 'other.example', first) == 'server1'
+    assert limiter.try_acquire(RELAYS, 'other.example', first) is None
+    assert set(limiter.snapshot()['hosts']) == {'api.example', 'other.example'}
+
+
+def test_queue_is_served_in_arrival_order():
+    limiter = RateLimiter()
+    limiter.configure_relays({'server1': {'rate': 20, 'burst': 1}})
+    limiter.acquire(['server1'], None, first)
+
+    order = []
+    threads = []
+    for i in range(3):
+        thread = threading.Thread(target=lambda i=i: order.append((i, limiter.acquire(['server1'], None, first))))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: limiter.snapshot()['waiting'] == i + 1)
+
+    # Com fila, ninguém passa à frente, nem tarefas de fundo
+    assert not limiter.has_capacity('server1')
+    assert limiter.try_acquire(['server1'], None, first) is None
+
+    for thread in threads:
+        thread.join(5)
+    assert order == [(0, 'server1'), (1, 'server1'), (2, 'server1')]
+    assert limiter.snapshot()['queued'] == 3
+
+
+def test_host_waiters_do_not_block_other_hosts():
+    limiter = RateLimiter(host_limits={'slow.example': {'rate': 2, 'burst': 1}})
+    limiter.acquire(RELAYS, 'slow.example', first)
+
+    done = []
+    thread = threading.Thread(target=lambda: done.append(limiter.acquire(RELAYS, 'slow.example', first)))
+    thread.start()
+    wait_until(lambda: limiter._queue and limiter._queue[0][2])
+
+    assert limiter.try_acquire(RELAYS, 'fast.example', first) == 'server1'
+    assert limiter.acquire(RELAYS, 'fast.example', first) == 'server1'
+    assert not done
+
+    thread.join(5)
+    assert done == ['server1']
+
+
+def test_max_wait_raises_rate_limit_timeout():
+    limiter = RateLimiter(max_wait=0.05)
+    limiter.configure_relays({'server1': 0.1})
+    limiter.acquire(['server1'], None, first)
+
+    start = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(['server1'], None, first)
+    assert time.monotonic() - start < 1.0
+    assert limiter.snapshot()['waiting'] == 0
+
+
+def test_relay_429_suspends_the_relay(clock):
+    limiter = RateLimiter(penalty=5.0)
+    limiter.configure_relays({'server1': 10})
+
+    limiter.feedback('server1', 'api.example', 429)
+    assert not limiter.has_capacity('server1')
+    assert limiter.try_acquire(RELAYS, 'other.example', first) == 'server2'
+    assert limiter.snapshot()['blocked'] == {'server1': 5.0}
+    assert limiter.snapshot()['relays']['server1']['tokens'] == 0.0
+
+    clock.now += 5.0
+    assert limiter.try_acquire(RELAYS, 'other.example', first) == 'server1'
+
+
+def test_origin_429_suspends_only_the_relay_and_host_pair(clock):
+    limiter = RateLimiter()
+
+    limiter.feedback('server1', 'API.example', 200, status=429, retry_after='2')
+    assert limiter.snapshot()['blocked'] == {'server1/api.example': 2.0}
+    assert limiter.has_capacity('server1')
+    assert limiter.try_acquire(RELAYS, 'api.example', first) == 'server2'
+    assert limiter.try_acquire(RELAYS, 'other.example', first) == 'server1'
+
+    clock.now += 2.0
+    assert limiter.try_acquire(RELAYS, 'api.example', first) == 'server1'
+
+
+def test_feedback_ignores_other_responses(clock):
+    limiter = RateLimiter()
+    limiter.feedback('server1', 'api.example', 200, status=200)
+    limiter.feedback('server1', 'api.example', 503)
+    limiter.feedback('server1', 'api.example', 200, status=503)
+
+    assert limiter.snapshot()['throttled'] == 0
+    assert limiter.snapshot()['blocked'] == {}
+
+    limiter.feedback('server1', 'api.example', 503, retry_after='1')
+    assert limiter.snapshot()['blocked'] == {'server1': 1.0}
+
+
+def test_configure_relays_keeps_unchanged_buckets(clock):
+    limiter = RateLimiter()
+    limiter.configure_relays({'server1': {'rate': 1, 'burst': 1}, 'server2': 1})
+    limiter.acquire(['server1'], None, first)
+
+    # Recarga com o mesmo limite: o saldo gasto não volta
+    limiter.configure_relays({'server1': {'rate': 1, 'burst': 1}, 'server2': 2})
+    assert not limiter.has_capacity('server1')
+    assert limiter.relays['server2'].rate == 2.0
+
+    limiter.configure_relays({'server1': None})
+    assert limiter.relays == {}
+    assert limiter.has_capacity('server1')
@@ -0,0 +1,251 @@
+"""
+Testes do servidor intermediário em Python (RelayServer) com os mesmos envelopes do RelayStub.
+
+Os dois servidores repassam as requisições a um destino local, sem acesso à rede.
+"""
+
+import hashlib
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pytest
+import requests
+from shadowreq import ShadowReq
+from shadowreq.cache import ResponseCache
+from shadowreq.protocol import MAX_BATCH_SIZE
+from shadowreq.testing import RelayStub
+
+TIMING_KEYS = {'namelookup', 'connect', 'starttransfer', 'total'}
+
+
+class Origin:
+    """Servidor de destino local que descreve as requisições recebidas."""
+
+    def __init__(self):
+        self.hits = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler_class(self):
+        origin = self
+
+        class OriginHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self):
+                path = urlsplit(self.path).path
+                body = self.rfile.read(int(self.headers.get('content-length', 0)))
+                with origin._lock:
+                    origin.hits[path] = hits = origin.hits.get(path, 0) + 1
+
+                headers = {'Content-Type': 'application/json', 'X-Origin': 'yes'}
+                status = 200
+                if path == '/text':
+                    content = b'plain text'
+                elif path == '/missing':
+                    status, content = 404, b'{"error": "not found"}'
+                elif path in ('/cached', '/private'):
+                    content = json.dumps({'hits': hits}).encode('utf-8')
+                    headers['Cache-Control'] = 'max-age=60' if path == '/cached' else 'private, max-age=60'
+                elif path == '/stream':
+                    self.send_response(200)
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for i in range(5):
+                        chunk = b'parte %d;' % i
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                    self.wfile.write(b'0\r\n\r\n')
+                    return
+                else:
+                    content = json.dumps({
+                        'method': self.command,
+                        'path': path,
+                        'query': parse_qs(urlsplit(self.path).query),
+                        'form': parse_qs(body.decode('latin-1')) if body else {},
+                        'content_type': self.headers.get('content-type'),
+                        'sha': hashlib.sha1(body).hexdigest(),
+                    }).encode('utf-8')
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return OriginHandler
+
+
+def relay_server(**kwargs):
+    pytest.importorskip('aiohttp')
+    from shadowreq.relay import RelayServer
+    return RelayServer(port=0, **kwargs)
+
+
+@pytest.fixture(scope='module')
+def origin():
+    origin = Origin()
+    yield origin
+    origin.stop()
+
+
+@pytest.fixture(params=['stub', 'server'])
+def relay(request):
+    with (RelayStub() if request.param == 'stub' else relay_server()) as relay:
+        yield relay
+
+
+@pytest.fixture
+def shadow(relay, tmp_path):
+    config = str(tmp_path / 'servers.json')
+    relay.write_config(config)
+    shadow = ShadowReq(config)
+    yield shadow
+    shadow.close()
+
+
+def send(relay, envelope):
+    """Envia um envelope já montado e retorna a resposta JSON do servidor intermediário."""
+    return requests.post(f"{relay.url}/api.php", json=envelope, timeout=10).json()
+
+
+def test_single_envelope(relay, origin):
+    result = send(relay, {'url': f'{origin.url}/echo', 'method': 'GET', 'params': {'q': 'x'}})
+
+    assert result['status'] == 200
+    assert result['response']['method'] == 'GET'
+    assert result['response']['query'] == {'q': ['x']}
+    assert set(result['timing']) == TIMING_KEYS
+
+    result = send(relay, {'url': f'{origin.url}/echo', 'method': 'post', 'params': {'a': '1'}})
+    assert result['response']['method'] == 'POST'
+    assert result['response']['form'] == {'a': ['1']}
+    assert result['response']['content_type'] == 'application/x-www-form-urlencoded'
+
+
+def test_origin_status_and_non_json_body(relay, origin):
+    assert send(relay, {'url': f'{origin.url}/missing', 'method': 'GET'})['status'] == 404
+
+    result = send(relay, {'url': f'{origin.url}/text', 'method': 'GET'})
+    assert (result['status'], result['response']) == (200, None)
+
+
+def test_invalid_envelopes(relay, origin):
+    assert send(relay, {'method': 'GET'}) == {'error': 'URL and method are required'}
+    assert send(relay, {'url': f'{origin.url}/echo', 'method': 'PATCH'}) == {'error': 'Invalid HTTP method'}
+    assert requests.post(f"{relay.url}/api.php", data=b'{not json').json() == {'error': 'URL and method are required'}
+    assert requests.get(f"{relay.url}/api.php").json() == {'error': 'Invalid request method'}
+
+
+def test_unreachable_origin(relay):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        dead = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+
+    result = send(relay, {'url': dead, 'method': 'GET'})
+    assert result['status'] == 0
+    assert result['error']
+
+
+def test_batch(relay, origin):
+    result = send(relay, {'batch': [
+        {'url': f'{origin.url}/a', 'method': 'GET'},
+        {'url': f'{origin.url}/b', 'method': 'PATCH'},
+        {'method': 'GET'},
+        {'url': f'{origin.url}/c', 'method': 'POST', 'params': {'x': '1'}},
+    ]})['batch']
+
+    assert [item['response']['path'] for item in (result[0], result[3])] == ['/a', '/c']
+    assert result[1] == {'error': 'Invalid HTTP method'}
+    assert result[2] == {'error': 'URL and method are required'}
+    assert result[3]['response']['form'] == {'x': ['1']}
+
+    assert send(relay, {'batch': 'x'}) == {'error': 'Batch must be a list of requests'}
+    too_large = [{'url': f'{origin.url}/a', 'method': 'GET'}] * (MAX_BATCH_SIZE + 1)
+    assert send(relay, {'batch': too_large}) == {'error': f'Batch too large (max {MAX_BATCH_SIZE})'}
+
+
+def test_large_responses_are_gzipped(relay, origin):
+    response = requests.post(f"{relay.url}/api.php", timeout=10, json={'batch': [
+        {'url': f'{origin.url}/{i}', 'method': 'GET'} for i in range(8)]})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(response.json()['batch']) == 8
+
+
+def test_client_modes(shadow, relay, origin, tmp_path):
+    response = shadow.get(f'{origin.url}/echo', params={'q': 'x'})
+    assert response.json()['query'] == {'q': ['x']}
+
+    # Modo stream: corpo em partes, lido à medida que chega do destino
+    response = shadow.get(f'{origin.url}/stream', stream=True)
+    assert response.status_code == 200
+    assert b''.join(response.iter_content(None)) == b''.join(b'parte %d;' % i for i in range(5))
+
+    # Corpo repassado sem conversão (envelope seguido do corpo)
+    data = b'x' * 200000
+    response = shadow.put(f'{origin.url}/upload', data=data, params={'q': '1'})
+    assert response.json()['sha'] == hashlib.sha1(data).hexdigest()
+    assert response.json()['query'] == {'q': ['1']}
+    assert response.json()['content_type'] == 'application/octet-stream'
+
+    config = str(tmp_path / 'servers.json')
+    with ShadowReq(config, passthrough=True) as raw:
+        response = raw.get(f'{origin.url}/missing')
+        assert response.status_code == 404
+        assert response.json() == {'error': 'not found'}
+        assert response.headers['x-origin'] == 'yes'
+
+        assert raw.get(f'{origin.url}/text').content == b'plain text'
+
+
+def test_token_is_required(origin, tmp_path):
+    with relay_server(token='segredo') as relay:
+        response = requests.post(f"{relay.url}/api.php", json={'url': f'{origin.url}/echo', 'method': 'GET'})
+        assert (response.status_code, response.json()) == (401, {'error': 'Invalid token'})
+
+        response = requests.post(f"{relay.url}/api.php", json={'url': f'{origin.url}/echo', 'method': 'GET'},
+                                 headers={'X-Shadow-Token': 'errado'})
+        assert response.status_code == 401
+
+        config = str(tmp_path / 'servers.json')
+        relay.write_config(config)
+        with ShadowReq(config) as shadow:
+            assert shadow.get(f'{origin.url}/echo').json()['path'] == '/echo'
+
+
+def test_shared_cache(origin):
+    with pytest.raises(ValueError):
+        relay_server(cache=ResponseCache())
+
+    with relay_server(cache=ResponseCache(shared=True)) as relay:
+        envelope = {'url': f'{origin.url}/cached', 'method': 'GET'}
+        first, second = send(relay, envelope), send(relay, envelope)
+        assert first['response'] == second['response'] == {'hits': 1}
+        assert second['timing'] == dict.fromkeys(TIMING_KEYS, 0.0)
+
+        # Respostas privadas de um cliente não são entregues a outro
+        envelope = {'url': f'{origin.url}/private', 'method': 'GET'}
+        assert [send(relay, envelope)['response']['hits'] for _ in range(2)] == [1, 2]
+
+        # Só GET vai para o cache
+        envelope = {'url': f'{origin.url}/cached', 'method': 'POST'}
+        assert send(relay, envelope)['response'] == {'hits': 2}
@@ -0,0 +1,146 @@
+"""
+Testes das políticas de retentativa e de hedging.
+"""
+
+import json
+import random
+import threading
+import pytest
+import requests
+from shadowreq import ShadowReq, retry as retry_module
+from shadowreq.retry import HedgePolicy, RetryPolicy, retry
+from shadowreq.selection import RoundRobinStrategy
+from shadowreq.testing import RelayStub
+
+
+def write_config(path, relays):
+    config = str(path / 'servers.json')
+    with open(config, 'w') as f:
+        json.dump({name: {'urls': [relay.url], 'headers': {}} for name, relay in relays.items()}, f)
+    return config
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    policy = RetryPolicy(backoff_factor=0.5, max_backoff=3.0, jitter=False)
+
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_jitter_stays_within_the_backoff():
+    random.seed(1)
+    policy = RetryPolicy(backoff_factor=1.0, max_backoff=10.0)
+
+    delays = [policy.backoff(3) for _ in range(100)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_conditions():
+    policy = RetryPolicy()
+
+    assert policy.allows('get') and policy.allows('DELETE')
+    assert not policy.allows('POST')
+    assert RetryPolicy(methods=None).allows('POST')
+    assert policy.should_retry_status(503) and not policy.should_retry_status(404)
+    assert policy.should_retry_exception(requests.exceptions.ConnectTimeout())
+    assert not policy.should_retry_exception(ValueError())
+
+
+def test_hedge_delay_uses_the_initial_delay_without_samples():
+    policy = HedgePolicy(initial_delay=0.8)
+    for _ in range(9):
+        policy.record(0.01)
+
+    assert policy.delay() == 0.8
+
+
+def test_hedge_delay_follows_the_percentile():
+    policy = HedgePolicy(percentile=90.0, min_delay=0.0)
+    for i in range(1, 101):
+        policy.record(i / 100)
+
+    assert policy.delay() == pytest.approx(0.91)
+
+
+def test_hedge_delay_is_clamped():
+    policy = HedgePolicy(min_delay=0.2, max_delay=0.5)
+    for _ in range(10):
+        policy.record(0.01)
+    assert policy.delay() == 0.2
+
+    for _ in range(10):
+        policy.record(2.0)
+    assert policy.delay() == 0.5
+
+
+def test_hedge_window_drops_old_latencies():
+    policy = HedgePolicy(min_delay=0.0, window=10)
+    for _ in range(10):
+        policy.record(5.0)
+    for _ in range(10):
+        policy.record(0.1)
+
+    assert policy.delay() == 0.1
+    assert not policy.allows('POST')
+
+
+def test_retry_decorator(monkeypatch):
+    monkeypatch.setattr(retry_module.time, 'sleep', lambda delay: None)
+    calls = []
+
+    @retry(RetryPolicy(max_attempts=3))
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.exceptions.ConnectionError()
+        return 'ok'
+
+    assert flaky() == 'ok'
+    assert len(calls) == 3
+
+    @retry(RetryPolicy(max_attempts=2))
+    def broken():
+        calls.append(1)
+        raise ValueError()
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        broken()
+    assert len(calls) == 1
+
+
+def test_client_retries_on_another_relay(tmp_path):
+    with RelayStub(handler=lambda method, url, params: (503, b'busy')) as busy, \
+            RelayStub(handler=lambda method, url, params: (200, b'{}')) as healthy:
+        config = write_config(tmp_path, {'busy': busy, 'healthy': healthy})
+
+        policy = RetryPolicy(backoff_factor=0.0)
+        with ShadowReq(config, retry=policy, strategy=RoundRobinStrategy()) as shadow:
+            response = shadow.get('http://origin/')
+            assert response.status_code == 200
+
+            # POST não é idempotente: não é repetido
+            assert shadow.post('http://origin/', data={'a': 1}).status_code == 503
+
+    assert (busy.calls, healthy.calls) == (2, 1)
+
+
+def test_client_hedges_a_slow_relay(tmp_path):
+    release = threading.Event()
+
+    def slow(method, url, params):
+        release.wait(5)
+        return 200, b'{"relay": "slow"}'
+
+    with RelayStub(handler=slow) as slow_relay, \
+            RelayStub(handler=lambda method, url, params: (200, b'{"relay": "fast"}')) as fast_relay:
+        config = write_config(tmp_path, {'slow': slow_relay, 'fast': fast_relay})
+
+        hedge = HedgePolicy(initial_delay=0.05)
+        try:
+            with ShadowReq(config, hedge=hedge, strategy=RoundRobinStrategy()) as shadow:
+                assert shadow.get('http://origin/').json() == {'relay': 'fast'}
+        finally:
+            release.set()
+
+    assert (slow_relay.calls, fast_relay.calls) == (1, 1)
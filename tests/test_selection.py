@@ -0,0 +1,155 @@
+"""
+Testes das estratégias de seleção e do circuit breaker.
+"""
+
+import json
+import random
+import socket
+import pytest
+import requests
+from shadowreq import ShadowReq, selection
+from shadowreq.selection import (CLOSED, HALF_OPEN, OPEN, LeastLatencyStrategy, PowerOfTwoStrategy,
+                                 RoundRobinStrategy, get_strategy)
+from shadowreq.testing import RelayStub
+
+SERVERS = ['server1', 'server2', 'server3']
+
+
+class Clock:
+    """Relógio controlado pelo teste no lugar de time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(selection.time, 'monotonic', clock)
+    return clock
+
+
+def test_moving_averages():
+    strategy = RoundRobinStrategy(alpha=0.5)
+    strategy.record_success('server1', 1.0)
+    strategy.record_success('server1', 0.5)
+    strategy.record_failure('server1', 0.25)
+
+    stats = strategy.snapshot()['server1']
+    assert stats['latency'] == pytest.approx(0.5)
+    assert stats['error_rate'] == pytest.approx(0.5)
+    assert (stats['requests'], stats['failures'], stats['state']) == (3, 1, CLOSED)
+
+
+def test_round_robin_skips_excluded_servers():
+    strategy = RoundRobinStrategy()
+
+    assert [strategy.select(SERVERS) for _ in range(4)] == ['server1', 'server2', 'server3', 'server1']
+    assert strategy.select(SERVERS, exclude={'server1', 'server3'}) == 'server2'
+    # Se todos forem excluídos, escolhe entre todos para não interromper as requisições
+    assert strategy.select(SERVERS, exclude=SERVERS) in SERVERS
+
+
+def test_circuit_breaker_opens_probes_and_closes(clock):
+    strategy = RoundRobinStrategy(failure_threshold=2, recovery_time=30.0)
+    strategy.record_failure('server1')
+    assert strategy.snapshot()['server1']['state'] == CLOSED
+    strategy.record_failure('server1')
+    assert strategy.snapshot()['server1']['state'] == OPEN
+
+    assert 'server1' not in {strategy.select(SERVERS) for _ in range(6)}
+    assert strategy.available(SERVERS) == ['server2', 'server3']
+
+    # Depois de recovery_time, uma única requisição de teste vai ao servidor
+    clock.now += 30.0
+    assert strategy.select(SERVERS) == 'server1'
+    assert strategy.snapshot()['server1']['state'] == HALF_OPEN
+    assert 'server1' not in {strategy.select(SERVERS) for _ in range(6)}
+
+    strategy.record_success('server1', 0.1)
+    assert strategy.snapshot()['server1']['state'] == CLOSED
+    assert 'server1' in {strategy.select(SERVERS) for _ in range(6)}
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    strategy = RoundRobinStrategy(failure_threshold=1, recovery_time=10.0)
+    strategy.record_failure('server1')
+    clock.now += 10.0
+    assert strategy.select(['server1', 'server2']) == 'server1'
+
+    strategy.record_failure('server1')
+    assert strategy.snapshot()['server1']['state'] == OPEN
+    assert strategy.select(['server1', 'server2']) == 'server2'
+
+
+def test_all_circuits_open_falls_back_to_every_server():
+    strategy = RoundRobinStrategy(failure_threshold=1)
+    for name in SERVERS:
+        strategy.record_failure(name)
+
+    assert strategy.available(SERVERS) == SERVERS
+    assert strategy.select(SERVERS) in SERVERS
+
+
+def test_p2c_prefers_the_cheaper_server():
+    strategy = PowerOfTwoStrategy()
+    strategy.record_success('server1', 0.5)
+    strategy.record_success('server2', 0.05)
+
+    assert {strategy.select(['server1', 'server2']) for _ in range(20)} == {'server2'}
+
+
+def test_errors_raise_the_score():
+    strategy = PowerOfTwoStrategy()
+    strategy.record_success('server1', 0.1)
+    strategy.record_success('server2', 0.1)
+    strategy.record_failure('server2', 0.1)
+
+    assert strategy.score('server2') > strategy.score('server1')
+
+
+def test_least_latency_weights_by_score():
+    random.seed(1)
+    strategy = LeastLatencyStrategy()
+    strategy.record_success('server1', 1.0)
+    strategy.record_success('server2', 0.01)
+
+    picks = [strategy.select(['server1', 'server2']) for _ in range(200)]
+    assert picks.count('server2') > 150
+
+
+def test_get_strategy():
+    instance = RoundRobinStrategy()
+
+    assert get_strategy(instance) is instance
+    assert isinstance(get_strategy('p2c'), PowerOfTwoStrategy)
+    with pytest.raises(ValueError):
+        get_strategy('fastest')
+
+
+def test_client_stops_using_a_dead_relay(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        dead = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    with RelayStub(handler=lambda method, url, params: (200, b'{}')) as relay:
+        config = str(tmp_path / 'servers.json')
+        with open(config, 'w') as f:
+            json.dump({'dead': {'urls': [dead], 'headers': {}},
+                       'live': {'urls': [relay.url], 'headers': {}}}, f)
+
+        strategy = RoundRobinStrategy(failure_threshold=2)
+        with ShadowReq(config, strategy=strategy) as shadow:
+            failures = 0
+            for i in range(10):
+                try:
+                    shadow.get(f'http://origin/{i}')
+                except requests.exceptions.ConnectionError:
+                    failures += 1
+
+    assert failures == 2
+    assert strategy.snapshot()['dead']['state'] == OPEN
+    assert relay.calls == 8
@@ -0,0 +1,84 @@
+"""
+Testes do envio de corpos (json, bytes, arquivos e multipart) pelo servidor intermediário.
+"""
+
+import hashlib
+import io
+import json
+import pytest
+from shadowreq import ShadowReq
+from shadowreq.protocol import STREAM_CONTENT_TYPE, StreamingBody, build_body, build_payload, encode_stream_payload
+from shadowreq.testing import RelayStub
+
+
+def test_encode_stream_payload_frames_envelope_and_body():
+    payload = build_payload('PUT', 'http://origin/upload')
+    body = build_body(data=io.BytesIO(b'conteudo do arquivo'), content_type='text/plain')
+    stream, headers = encode_stream_payload(payload, body)
+
+    assert headers == {'content-type': STREAM_CONTENT_TYPE}
+    envelope, content = stream.read().split(b'\n', 1)
+    assert json.loads(envelope) == dict(payload, body={'content_type': 'text/plain', 'length': 19})
+    assert content == b'conteudo do arquivo'
+    assert len(stream) == len(envelope) + 1 + 19
+
+
+@pytest.mark.parametrize('kwargs, content, content_type', [
+    ({'json_data': {'a': 1}}, b'{"a": 1}', 'application/json'),
+    ({'data': 'texto'}, b'texto', 'text/plain; charset=utf-8'),
+    ({'data': bytearray(b'\x00\x01')}, b'\x00\x01', 'application/octet-stream'),
+])
+def test_build_body_types(kwargs, content, content_type):
+    body = build_body(**kwargs)
+
+    assert body.read() == content
+    assert body.content_type == content_type
+    assert body.length == len(content)
+
+
+def test_build_body_keeps_dicts_in_the_envelope():
+    assert build_body(data={'a': 1}) is None
+
+
+def test_generator_body_has_unknown_length_and_is_not_replayable():
+    body = build_body(data=(chunk for chunk in [b'a', b'b']))
+
+    assert body.length is None
+    assert bool(body)
+    assert not body.replayable
+    assert body.read() == b'ab'
+
+
+def test_file_body_rewinds():
+    body = StreamingBody([io.BytesIO(b'abc')])
+    assert body.read() == b'abc'
+    assert body.rewind()
+    assert body.read() == b'abc'
+
+
+def test_uploads_round_trip_through_relay(tmp_path):
+    received = []
+
+    def handler(method, url, params, body=None, content_type=None):
+        received.append((method, params, content_type, body))
+        return 200, json.dumps({'sha': hashlib.sha1(body or b'').hexdigest()}).encode('utf-8')
+
+    data = b'x' * 300000
+    with RelayStub(handler=handler) as relay:
+        config = str(tmp_path / 'servers.json')
+        relay.write_config(config)
+        with ShadowReq(config) as shadow:
+            raw = shadow.put('http://origin/raw', data=io.BytesIO(data), params={'q': 1})
+            chunked = shadow.post('http://origin/gen', data=(data[i:i + 1000] for i in range(0, len(data), 1000)))
+            form = shadow.post('http://origin/form', data={'campo': 'valor'},
+                               files={'arquivo': ('a.txt', io.BytesIO(b'ola'), 'text/plain')})
+
+    assert raw.json()['sha'] == chunked.json()['sha'] == hashlib.sha1(data).hexdigest()
+    assert received[0][:3] == ('PUT', {'q': 1}, 'application/octet-stream')
+
+    method, params, content_type, body = received[2]
+    assert content_type.startswith('multipart/form-data; boundary=')
+    boundary = content_type.split('boundary=')[1]
+    assert b'name="campo"\r\n\r\nvalor\r\n' in body
+    assert b'filename="a.txt"\r\nContent-Type: text/plain\r\n\r\nola\r\n' in body
+    assert body.endswith(f'--{boundary}--\r\n'.encode())